@@ -0,0 +1,243 @@
+"""
+评估流水线的阶段级 / 场景级性能剖析
+
+每个阶段和每个场景记录：
+- wall_s / cpu_s: 墙钟时间和本进程 CPU 时间；阶段还记录子进程（进程池）的 CPU 时间 children_cpu_s
+- bytes_read: 本进程通过 read 系列系统调用读取的字节数（/proc/self/io 的 rchar，含页缓存命中；非 Linux 为 None）
+- peak_traced_bytes: tracemalloc 统计的 Python/NumPy 分配峰值
+- rss_peak_bytes: 常驻内存峰值（Linux 上每个阶段开始时通过 /proc/self/clear_refs 重置；否则为进程启动以来的峰值）
+
+结果保存为 JSON（默认 <output_dir>/profile.json），可选同时保存主进程的 cProfile 数据（profile.prof，
+用 python -m pstats 或 snakeviz 查看），以定位时间花在 read_pfm、指标计算、to_markdown 还是 matplotlib 上。
+
+开启方式：--profile / --cprofile，配置 profile.enabled / profile.cprofile，
+或环境变量 LFBENCH_PROFILE=1（LFBENCH_PROFILE=cprofile 时同时保存 cProfile）。
+"""
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+ENV_VAR = "LFBENCH_PROFILE"
+
+_peak_floor = 0  # 场景级测量重置 tracemalloc 峰值之前记下的最大值，阶段峰值取二者较大者
+
+
+def _read_bytes():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _rusage(who):
+    """返回 (CPU 秒数, 峰值 RSS 字节)，who 为 "RUSAGE_SELF" 或 "RUSAGE_CHILDREN"；无 resource 模块时为 (0.0, None)。"""
+    if resource is None:
+        return 0.0, None
+    usage = resource.getrusage(getattr(resource, who))
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024  # Linux 上 ru_maxrss 单位为 KB
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _traced_peak():
+    if not tracemalloc.is_tracing():
+        return None
+    return max(_peak_floor, tracemalloc.get_traced_memory()[1])
+
+
+def _diff(after, before):
+    return None if after is None or before is None else after - before
+
+
+def measure(fn, *args, **kwargs):
+    """
+    执行 fn(*args, **kwargs) 并测量其开销
+
+    返回:
+        (result, record)
+    """
+    global _peak_floor
+    if tracemalloc.is_tracing():
+        _peak_floor = _traced_peak()
+        tracemalloc.reset_peak()
+    wall, cpu, read = time.perf_counter(), time.process_time(), _read_bytes()
+    result = fn(*args, **kwargs)
+    record = {
+        "wall_s": time.perf_counter() - wall,
+        "cpu_s": time.process_time() - cpu,
+        "bytes_read": _diff(_read_bytes(), read),
+        "peak_traced_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+        "pid": os.getpid(),
+    }
+    if tracemalloc.is_tracing():
+        _peak_floor = max(_peak_floor, record["peak_traced_bytes"])
+    return result, record
+
+
+def profiled_item(fn, key_fields, trace_memory, item):
+    """
+    测量 fn(item)，可作为进程池的任务函数（用 functools.partial 绑定前三个参数）
+
+    参数:
+        key_fields: 记录中标识场景的字段名，与 item 的前几项一一对应，如 ("method", "dataset", "file")
+        trace_memory: 子进程中按需启动 tracemalloc
+    返回:
+        (fn(item), record)
+    """
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    result, record = measure(fn, item)
+    record.update(zip(key_fields, item))
+    return result, record
+
+
+def split_records(outputs, records):
+    """
+    把 profiled_item 的 (result, record) 序列拆开，record 追加到 records；records 为 None 时 outputs 就是结果本身
+
+    返回:
+        results 列表
+    """
+    if records is None:
+        return list(outputs)
+    results = []
+    for result, record in outputs:
+        results.append(result)
+        records.append(record)
+    return results
+
+
+class Profiler:
+    """
+    参数:
+        enabled: False 时所有方法都是空操作
+        trace_memory: 启用 tracemalloc（对分配密集的 Python 代码有一定开销，NumPy 计算影响很小）
+        cprofile_path: 不为 None 时用 cProfile 剖析主进程并保存到该路径
+    """
+
+    def __init__(self, enabled=False, trace_memory=True, cprofile_path=None):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.cprofile_path = cprofile_path
+        self.stages = []
+        self.scenes = []
+        self._cprofile = None
+        self._started = None
+        self._start_wall = None
+
+    @classmethod
+    def from_config(cls, cfg):
+        """根据 cfg["profile"] 和环境变量 LFBENCH_PROFILE 创建。"""
+        profile_cfg = cfg.get("profile", {})
+        env = os.environ.get(ENV_VAR, "").strip().lower()
+        enabled = bool(profile_cfg.get("enabled")) or env not in ("", "0", "false")
+        if not enabled:
+            return cls(False)
+        cprofile = profile_cfg.get("cprofile") or env == "cprofile"
+        cprofile_path = os.path.join(cfg["output_dir"], "profile.prof") if cprofile else None
+        return cls(True, profile_cfg.get("tracemalloc", True), cprofile_path)
+
+    def start(self):
+        if not self.enabled:
+            return self
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._started = datetime.now().isoformat(timespec="seconds")
+        self._start_wall = time.perf_counter()
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        """测量一个阶段；阶段内登记的场景记录会汇总到阶段记录中。"""
+        global _peak_floor
+        if not self.enabled:
+            yield
+            return
+        _reset_peak_rss()
+        if tracemalloc.is_tracing():
+            _peak_floor = 0
+            tracemalloc.reset_peak()
+        n_scenes = len(self.scenes)
+        wall, cpu, read = time.perf_counter(), time.process_time(), _read_bytes()
+        children_cpu = _rusage("RUSAGE_CHILDREN")[0]
+        try:
+            yield
+        finally:
+            children_cpu_after, children_rss = _rusage("RUSAGE_CHILDREN")
+            child_scenes = [s for s in self.scenes[n_scenes:] if s["pid"] != os.getpid()]
+            self.stages.append({
+                "stage": name,
+                "wall_s": time.perf_counter() - wall,
+                "cpu_s": time.process_time() - cpu,
+                "children_cpu_s": children_cpu_after - children_cpu,
+                "bytes_read": _diff(_read_bytes(), read),
+                "peak_traced_bytes": _traced_peak(),
+                "rss_peak_bytes": _rusage("RUSAGE_SELF")[1],
+                "children_rss_peak_bytes": children_rss,
+                "scenes": len(self.scenes) - n_scenes,
+                # 子进程中执行的场景不计入本进程的 bytes_read，单独汇总
+                "child_bytes_read": sum(s["bytes_read"] or 0 for s in child_scenes),
+            })
+
+    def add_scenes(self, stage, records):
+        """登记场景记录（须在对应阶段的 stage() 内调用，才会汇总到阶段记录中）。"""
+        if self.enabled and records:
+            self.scenes.extend({"stage": stage, **record} for record in records)
+
+    def summary(self):
+        return {
+            "started": self._started,
+            "wall_s": time.perf_counter() - self._start_wall if self._start_wall is not None else None,
+            "pid": os.getpid(),
+            "tracemalloc": tracemalloc.is_tracing(),
+            "cprofile": self.cprofile_path,
+            "stages": self.stages,
+            "scenes": self.scenes,
+        }
+
+    def save(self, path):
+        """保存 JSON（以及 cProfile 数据），并打印各阶段耗时。"""
+        if not self.enabled:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"{'Stage':<12}{'Wall(s)':>10}{'CPU(s)':>10}{'Child CPU(s)':>14}{'Read(MB)':>10}{'Peak(MB)':>10}")
+        for s in self.stages:
+            read = (s["bytes_read"] or 0) + s["child_bytes_read"]
+            peak = s["peak_traced_bytes"] or 0
+            print(f"{s['stage']:<12}{s['wall_s']:>10.2f}{s['cpu_s']:>10.2f}{s['children_cpu_s']:>14.2f}"
+                  f"{read / 2 ** 20:>10.1f}{peak / 2 ** 20:>10.1f}")
+        print(f"Profile saved to {path}" + (f", cProfile to {self.cprofile_path}" if self.cprofile_path else ""))
+
+    def stop(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.enabled and self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
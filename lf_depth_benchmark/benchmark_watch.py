@@ -0,0 +1,136 @@
+"""
+监视 ReconLFs 目录，新的或修改过的视差图落盘后自动触发回调
+
+- 安装了 watchdog 时使用其 Observer（Linux 上基于 inotify），否则退回定时轮询（比较文件大小和 mtime）
+- 防抖：最后一次文件事件之后静默 debounce 秒才处理本批变化，避免文件写到一半时就去读取
+- 回调收到本批所有变化的文件路径（新增、修改或删除）
+
+用法见 lfbench.py（或 generate_benchmark_v3.py）的 --watch。
+"""
+import fnmatch
+import os
+import queue
+import time
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog 是可选依赖
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class PollingWatcher:
+    """定时扫描目录树，比较 (大小, mtime_ns) 找出变化的文件。"""
+
+    def __init__(self, root, pattern="LF*.pfm"):
+        self.root = root
+        self.pattern = pattern
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if fnmatch.fnmatch(name, self.pattern):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def changes(self):
+        snapshot = self._scan()
+        changed = {path for path, sig in snapshot.items() if self._snapshot.get(path) != sig}
+        changed |= set(self._snapshot) - set(snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, pattern, events):
+        super().__init__()
+        self.pattern = pattern
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path and fnmatch.fnmatch(os.path.basename(path), self.pattern):
+                self.events.put(path)
+
+
+class InotifyWatcher:
+    """基于 watchdog 的事件监视（Linux 上为 inotify），事件在后台线程中收集。"""
+
+    def __init__(self, root, pattern="LF*.pfm"):
+        self._events = queue.Queue()
+        self._observer = Observer()
+        self._observer.schedule(_EventHandler(pattern, self._events), root, recursive=True)
+        self._observer.start()
+
+    def changes(self):
+        changed = set()
+        while True:
+            try:
+                changed.add(self._events.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+
+
+def make_watcher(root, pattern="LF*.pfm", poll=False):
+    """优先使用 watchdog，未安装或 poll=True 时使用轮询。"""
+    if Observer is not None and not poll:
+        print(f"Watching {root} for {pattern} (watchdog)")
+        return InotifyWatcher(root, pattern)
+    print(f"Watching {root} for {pattern} (polling)")
+    return PollingWatcher(root, pattern)
+
+
+def watch(root, on_change, pattern="LF*.pfm", interval=1.0, debounce=2.0, poll=False, max_batches=None,
+          extra_roots=()):
+    """
+    持续监视 root，每批变化稳定 debounce 秒后调用 on_change(paths)
+
+    参数:
+        root: 监视的根目录
+        on_change: 回调，参数为本批变化文件路径的有序列表（含 extra_roots 中的变化）
+        interval: 检查间隔（秒）
+        debounce: 最后一次变化后的静默时间（秒）
+        poll: 强制使用轮询
+        max_batches: 处理这么多批之后返回（测试用），None 表示一直运行直到 Ctrl+C
+        extra_roots: 额外监视的 [(目录, 文件名模式), ...]，如用户掩码目录
+    """
+    watchers = [make_watcher(path, path_pattern, poll)
+                for path, path_pattern in [(root, pattern)] + list(extra_roots)]
+    pending, last_event, batches = set(), 0.0, 0
+    try:
+        while max_batches is None or batches < max_batches:
+            time.sleep(interval)
+            changed = set().union(*(watcher.changes() for watcher in watchers))
+            if changed:
+                pending |= changed
+                last_event = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_event >= debounce:
+                batch, pending = sorted(pending), set()
+                try:
+                    on_change(batch)
+                except Exception as e:  # 单批失败不终止监视
+                    print(f"Failed to process {len(batch)} changed files: {e}")
+                batches += 1
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        for watcher in watchers:
+            watcher.close()
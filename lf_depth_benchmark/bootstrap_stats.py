@@ -0,0 +1,86 @@
+"""
+按场景的 bootstrap 置信区间与方法间两两胜率
+
+所有方法、所有指标共用同一个 (n_resamples, n_scenes) 重采样索引矩阵（配对 bootstrap），
+一次花式索引 + mean 得到全部重采样均值，不在 Python 中逐次循环。
+所有指标都是越小越好。
+"""
+import numpy as np
+
+
+def scene_matrix(dataset_results, methods, keys):
+    """
+    取所有方法都有结果的场景，组成 (n_methods, n_scenes, n_keys) 的指标矩阵
+
+    参数:
+        dataset_results: {method: {scene: metrics}}（不含 "average"）
+        methods: 方法顺序
+        keys: 指标键名顺序
+    返回:
+        values, scenes
+    """
+    scenes = sorted(set.intersection(*[set(dataset_results[m]) - {"average"} for m in methods])) if methods else []
+    values = np.array([[[dataset_results[m][s].get(k, np.nan) for k in keys] for s in scenes] for m in methods],
+                      dtype=np.float64).reshape(len(methods), len(scenes), len(keys))
+    return values, scenes
+
+
+def bootstrap_means(values, n_resamples=1000, seed=0):
+    """
+    配对 bootstrap：所有方法使用同一组重采样场景
+
+    参数:
+        values: (n_methods, n_scenes, n_keys)
+    返回:
+        means: (n_methods, n_resamples, n_keys) 每次重采样的场景均值
+    """
+    n_scenes = values.shape[1]
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, n_scenes, size=(n_resamples, n_scenes))
+    return values[:, index, :].mean(axis=2)
+
+
+def confidence_intervals(means, level=0.95):
+    """返回 (lower, upper)，形状均为 (n_methods, n_keys)。"""
+    alpha = (1 - level) / 2 * 100
+    lower, upper = np.percentile(means, [alpha, 100 - alpha], axis=1)
+    return lower, upper
+
+
+def win_rates(means):
+    """
+    两两胜率：win[i, j, k] 为重采样中方法 i 的指标 k 小于方法 j 的比例（相等记 0.5）
+
+    返回:
+        win: (n_methods, n_methods, n_keys)
+    """
+    a = means[:, None]
+    b = means[None, :]
+    return (a < b).mean(axis=2) + 0.5 * (a == b).mean(axis=2)
+
+
+def bootstrap_summary(dataset_results, methods, keys, n_resamples=1000, seed=0, level=0.95):
+    """
+    计算一个数据集上各方法的均值、置信区间和两两胜率
+
+    返回:
+        summary: dict，包含 methods、scenes、keys、mean (M, K)、lower、upper、win (M, M, K)；
+                 共同场景少于 2 个时返回 None
+    """
+    methods = [m for m in methods if dataset_results.get(m)]
+    values, scenes = scene_matrix(dataset_results, methods, keys)
+    if len(scenes) < 2:
+        return None
+    means = bootstrap_means(values, n_resamples, seed)
+    lower, upper = confidence_intervals(means, level)
+    return {
+        "methods": methods,
+        "scenes": scenes,
+        "keys": list(keys),
+        "mean": values.mean(axis=1),
+        "lower": lower,
+        "upper": upper,
+        "win": win_rates(means),
+        "n_resamples": n_resamples,
+        "level": level,
+    }
@@ -0,0 +1,111 @@
+"""
+OACC-Net 在纯 CPU 节点上的推理设置
+
+- 设置 intra-op / inter-op 线程数
+- 可选精度：fp32（默认）、bf16（torch.autocast）；不提供 int8：PyTorch 的动态量化只作用于 nn.Linear，
+  而 OACC-Net 全部由卷积层构成，动态量化不会改变任何一层
+- 推理统一在 torch.inference_mode 下进行
+- 可选 TorchScript trace 或 torch.compile：网络只编译一次，按输入形状缓存，所有 patch 复用
+- compare_to_fp32: 在同一光场上比较优化后的网络与 fp32 网络的输出差异
+"""
+import contextlib
+import copy
+
+import torch
+import torch.nn as nn
+
+from depth_metrics import compute_depth_metrics, badpix_key
+
+
+def add_cpu_args(parser):
+    """向 test_OACCNet 的参数解析器添加 CPU 推理相关参数。"""
+    parser.add_argument('--threads', type=int, default=None, help='intra-op 线程数（torch.set_num_threads）')
+    parser.add_argument('--interop_threads', type=int, default=None, help='inter-op 线程数')
+    parser.add_argument('--precision', type=str, default='fp32', choices=['fp32', 'bf16'])
+    parser.add_argument('--jit', type=str, default='none', choices=['none', 'trace', 'compile'],
+                        help='trace: TorchScript 按输入形状追踪一次并复用；compile: torch.compile')
+    parser.add_argument('--report_delta', action='store_true', help='在第一个光场上报告与 fp32 结果的误差')
+    return parser
+
+
+def configure_threads(cfg):
+    """设置 PyTorch 线程数，inter-op 线程数只能在并行任务开始前设置一次。"""
+    if cfg.threads:
+        torch.set_num_threads(cfg.threads)
+    if cfg.interop_threads:
+        try:
+            torch.set_num_interop_threads(cfg.interop_threads)
+        except RuntimeError as e:
+            print(f"Warning: could not set inter-op threads: {e}")
+    print(f"torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+
+class ShapeTracedNet(nn.Module):
+    """
+    首次遇到某种输入形状时用 torch.jit.trace 追踪网络，之后同形状的输入直接复用追踪结果
+    （切块推理时所有 patch 形状相同，只有最后一个不满的 batch 会多追踪一次）
+    """
+
+    def __init__(self, net):
+        super().__init__()
+        self.net = net
+        self._traced = {}
+
+    def forward(self, x):
+        key = tuple(x.shape)
+        if key not in self._traced:
+            try:
+                traced = torch.jit.trace(self.net, x, check_trace=False)
+            except Exception as e:
+                print(f"Warning: tracing failed for input {key}, falling back to eager: {e}")
+                traced = self.net
+            else:
+                with contextlib.suppress(Exception):  # 不支持 freeze 时保留未冻结的追踪结果
+                    traced = torch.jit.freeze(traced)
+            self._traced[key] = traced
+        return self._traced[key](x)
+
+
+def prepare_net(net, cfg):
+    """
+    按 cfg 对网络做编译，返回用于推理的网络（原网络不被修改）
+    """
+    net = net.eval()
+    if cfg.jit == 'trace':
+        net = ShapeTracedNet(net)
+    elif cfg.jit == 'compile':
+        net = torch.compile(net, dynamic=False)
+    return net
+
+
+def inference_context(cfg):
+    """推理上下文：inference_mode，bf16 时再叠加 autocast。"""
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if getattr(cfg, 'precision', 'fp32') == 'bf16':
+        device_type = 'cuda' if str(cfg.device).startswith('cuda') else 'cpu'
+        stack.enter_context(torch.autocast(device_type=device_type, dtype=torch.bfloat16))
+    return stack
+
+
+def compare_to_fp32(lf_gray, estimate_fn, net_ref, net_opt, cfg, etas=(0.07, 0.03, 0.01)):
+    """
+    用 fp32 网络的输出作为参考，报告优化后网络（bf16/编译）的精度差异
+
+    参数:
+        lf_gray: 光场灰度 (u, v, h, w)
+        estimate_fn: 视差估计函数，调用方式 estimate_fn(lf_gray, net, cfg)，如 disparity_estimation
+        net_ref: 未经 prepare_net 处理的 fp32 网络
+        net_opt: prepare_net 返回的网络
+    返回:
+        metrics: compute_depth_metrics 的结果（以 fp32 输出为真值）
+    """
+    ref_cfg = copy.copy(cfg)
+    ref_cfg.precision, ref_cfg.jit = 'fp32', 'none'
+    disp_ref = estimate_fn(lf_gray, net_ref, ref_cfg)
+    disp_opt = estimate_fn(lf_gray, net_opt, cfg)
+    metrics = compute_depth_metrics(disp_ref, disp_opt, etas)
+    print(f"Accuracy delta vs fp32 (precision={cfg.precision}, jit={cfg.jit}): "
+          f"MAE={metrics['mae']:.6f}, RMSE={metrics['rmse']:.6f}, MSE*100={metrics['mse']:.6f}, " +
+          ", ".join([f"BadPix@{eta}={metrics[badpix_key(eta)]:.4f}%" for eta in etas]))
+    return metrics
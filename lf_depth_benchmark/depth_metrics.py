@@ -0,0 +1,268 @@
+"""
+深度图评价指标的向量化计算内核
+
+`calculate_metrics` 原先对每个 eta 调用一次 `bad_pixel_ratio`，每次都重新计算 `np.abs(gt - pred)`，
+`mean_squared_error` 又算一遍差值。这里只计算一次 float32 差值，然后从同一份绝对误差中
+得到 MSE、MAE、RMSE 以及任意多个阈值下的 BadPix，阈值越多摊销越明显。
+
+超大视差图（或多帧堆叠）可用 compute_depth_metrics_tiled 按行块流式计算：两条路径共用
+MetricAccumulator，平方和/绝对值和都先按行求 float64 部分和、最后对整列部分和求和，
+BadPix 计数是精确整数，因此分块结果与整图结果逐位一致，峰值内存只与块大小有关。
+
+传入区域掩码（见 region_masks.py）时，各区域的指标在同一次遍历中从同一份绝对误差得到：
+每个像素先用一次 searchsorted 求出所在的阈值区间，每个区域只需一次 bincount。
+"""
+import numpy as np
+
+from pfm_io import open_pfm
+
+# BadPix-vs-eta 曲线的默认阈值网格（单位与视差相同）
+DEFAULT_CURVE_ETAS = np.linspace(0.0, 0.2, 201)
+
+
+def badpix_key(eta):
+    """结果字典中 BadPix 指标的键名，与 save_results_to_markdown 保持一致。"""
+    return f"badpix_eta_{eta}"
+
+
+REGION_SEP = "/"
+
+
+def region_key(region, key):
+    """区域指标的键名，如 region_key("smooth", "mse") -> "smooth/mse"。"""
+    return f"{region}{REGION_SEP}{key}"
+
+
+def absolute_error(gt, pred):
+    """
+    计算逐像素绝对误差，只做一次 float32 减法
+
+    参数:
+        gt: 真实值 (Ground Truth)，NumPy 数组
+        pred: 预测值 (Prediction)，NumPy 数组，形状需与 gt 一致
+    返回:
+        abs_err: float32 的绝对误差（新分配的数组，可原地修改）
+    """
+    gt = np.asarray(gt, dtype=np.float32)
+    pred = np.asarray(pred, dtype=np.float32)
+    if gt.shape != pred.shape:
+        raise ValueError(f"Shape mismatch: gt {gt.shape} vs pred {pred.shape}")
+    abs_err = np.subtract(gt, pred, dtype=np.float32)
+    np.abs(abs_err, out=abs_err)
+    return abs_err
+
+
+def count_above(sorted_err, thresholds):
+    """
+    在已排序（NaN 已剔除）的绝对误差上统计大于各阈值的像素数
+
+    参数:
+        sorted_err: 升序排列的一维绝对误差
+        thresholds: 阈值列表
+    返回:
+        counts: int64 数组，counts[i] = sum(err > thresholds[i])
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float32)
+    return sorted_err.size - np.searchsorted(sorted_err, thresholds, side="right")
+
+
+class MetricAccumulator:
+    """
+    按行块累加深度图指标
+
+    每个块只计算一次 float32 绝对误差：逐行的 float64 绝对值和与平方和保存下来（每行一个数），
+    BadPix 在块内排序后用二分查找计数并累加。result() 对所有行的部分和统一求和，
+    所以结果与分块方式无关。
+
+    参数:
+        etas: BadPix 阈值列表
+        scale: MSE 的缩放倍数
+        curve_etas: 若不为 None，则额外统计该阈值网格上的 BadPix 曲线；传 True 使用 DEFAULT_CURVE_ETAS
+    """
+
+    def __init__(self, etas=(0.07,), scale=100, curve_etas=None):
+        self.etas = list(etas)
+        self.scale = scale
+        self.curve_etas = DEFAULT_CURVE_ETAS if curve_etas is True else curve_etas
+        self.thresholds = self.etas + ([] if self.curve_etas is None else list(self.curve_etas))
+        self.n = 0
+        self.counts = np.zeros(len(self.thresholds), dtype=np.int64)
+        self._abs_sums = []
+        self._sq_sums = []
+        self._regions = {}  # 区域名 -> {"n", "counts", "abs_sums", "sq_sums"}
+
+    def update(self, gt, pred, masks=None):
+        """
+        累加一个块（gt/pred 的行块，第一维为行）
+
+        参数:
+            masks: 可选，{区域名: 与 gt 同形状的 bool 掩码（同一行块）}
+        """
+        abs_err = absolute_error(gt, pred)
+        abs_err = abs_err.reshape(abs_err.shape[0] if abs_err.ndim > 1 else 1, -1)
+
+        # 平方和/绝对值和用 float64 逐行累加，避免大图上的 float32 累加误差
+        err64 = abs_err.astype(np.float64)
+        if masks:
+            region_masks = self._reshape_masks(masks, gt, abs_err.shape)
+            bins = self._threshold_bins(abs_err)
+            self._update_regions(region_masks, err64, bins, "abs_sums")
+        self._abs_sums.append(np.sum(err64, axis=1))
+        np.multiply(err64, err64, out=err64)
+        self._sq_sums.append(np.sum(err64, axis=1))
+        if masks:
+            self._update_regions(region_masks, err64, None, "sq_sums")
+        del err64
+
+        # 排序一次（原地），NaN 会被排到末尾；NaN 与阈值比较结果为 False，不计入坏像素
+        sorted_err = abs_err.ravel()
+        sorted_err.sort()
+        num_valid = sorted_err.size
+        if num_valid and np.isnan(sorted_err[-1]):
+            num_valid = int(np.searchsorted(sorted_err, np.float32(np.nan), side="left"))
+        self.counts += count_above(sorted_err[:num_valid], self.thresholds)
+        self.n += sorted_err.size
+        return self
+
+    @staticmethod
+    def _reshape_masks(masks, gt, shape):
+        reshaped = {}
+        for name, mask in masks.items():
+            mask = np.asarray(mask, dtype=bool)
+            if mask.shape != np.shape(gt):
+                raise ValueError(f"Mask '{name}' shape {mask.shape} does not match gt {np.shape(gt)}")
+            reshaped[name] = mask.reshape(shape)
+        return reshaped
+
+    def _threshold_bins(self, abs_err):
+        """
+        每个像素所在的 BadPix 阈值区间：bins = 小于该像素误差的阈值个数（只用 etas，NaN 记为 0），
+        于是某区域内 err > etas[j] 的像素数 = 该区域 bins > j 的像素数。
+        """
+        order = np.argsort(np.asarray(self.etas, dtype=np.float32), kind="stable")
+        sorted_etas = np.asarray(self.etas, dtype=np.float32)[order]
+        bins = np.searchsorted(sorted_etas, abs_err, side="left")
+        bins[np.isnan(abs_err)] = 0
+        return bins, order
+
+    def _update_regions(self, region_masks, values, bins, sum_name):
+        num_etas = len(self.etas)
+        for name, mask in region_masks.items():
+            stats = self._regions.setdefault(name, {"n": 0, "counts": np.zeros(num_etas, dtype=np.int64),
+                                                    "abs_sums": [], "sq_sums": []})
+            # 掩码外置 0 后逐行求和（x + 0 精确），与分块方式无关
+            stats[sum_name].append(np.sum(np.where(mask, values, 0.0), axis=1))
+            if bins is not None:
+                pixel_bins, order = bins
+                hist = np.bincount(pixel_bins[mask], minlength=num_etas + 1)
+                above_sorted = hist.sum() - np.cumsum(hist)[:num_etas]  # err > sorted_etas[j] 的像素数
+                counts = np.empty(num_etas, dtype=np.int64)
+                counts[order] = above_sorted
+                stats["counts"] += counts
+                stats["n"] += int(np.count_nonzero(mask))
+
+    def _summarize(self, n, counts, abs_sums, sq_sums):
+        if n:
+            mse = np.sum(np.concatenate(sq_sums)) / n
+            mae = np.sum(np.concatenate(abs_sums)) / n
+            ratios = counts * (100.0 / n)
+        else:
+            mse = mae = np.nan
+            ratios = np.full(len(counts), np.nan)
+        return mse, mae, ratios
+
+    def result(self):
+        """返回与 compute_depth_metrics 相同格式的指标字典。"""
+        mse, mae, ratios = self._summarize(self.n, self.counts, self._abs_sums, self._sq_sums)
+        metrics = {
+            "mse": mse * self.scale,
+            "mae": mae,
+            "rmse": np.sqrt(mse),
+        }
+        for eta, ratio in zip(self.etas, ratios[:len(self.etas)]):
+            metrics[badpix_key(eta)] = float(ratio)
+        if self.curve_etas is not None:
+            metrics["badpix_curve"] = (np.asarray(self.curve_etas, dtype=np.float32), ratios[len(self.etas):])
+
+        for name, stats in self._regions.items():
+            mse, mae, ratios = self._summarize(stats["n"], stats["counts"], stats["abs_sums"], stats["sq_sums"])
+            metrics[region_key(name, "mse")] = mse * self.scale
+            metrics[region_key(name, "mae")] = mae
+            metrics[region_key(name, "rmse")] = np.sqrt(mse)
+            for eta, ratio in zip(self.etas, ratios):
+                metrics[region_key(name, badpix_key(eta))] = float(ratio)
+        return metrics
+
+
+def compute_depth_metrics(gt, pred, etas=(0.07,), scale=100, curve_etas=None, masks=None):
+    """
+    单次遍历计算 MSE / MAE / RMSE 以及多阈值 BadPix
+
+    绝对误差只计算一次并排序一次，之后每个阈值只是一次二分查找，
+    因此评估成百上千个阈值和评估一个阈值的代价几乎相同。
+
+    参数:
+        gt: 真实值 (Ground Truth)，NumPy 数组
+        pred: 预测值 (Prediction)，NumPy 数组
+        etas: BadPix 阈值列表
+        scale: MSE 的缩放倍数，与 mean_squared_error 一致（MAE/RMSE 不缩放）
+        curve_etas: 若不为 None，则额外返回该阈值网格上的 BadPix 曲线；传 True 使用 DEFAULT_CURVE_ETAS
+        masks: 可选，{区域名: 与 gt 同形状的 bool 掩码}，各区域的指标在同一次遍历中计算
+    返回:
+        metrics: 字典，包含 "mse"、"mae"、"rmse" 以及 badpix_key(eta) -> 百分比；
+                 若请求曲线，则 "badpix_curve" 为 (etas, ratios) 元组；
+                 若给出掩码，则另有 region_key(区域名, 指标名) -> 区域内的指标
+    """
+    return MetricAccumulator(etas, scale, curve_etas).update(gt, pred, masks).result()
+
+
+def _open_depth(depth, crop_size):
+    """PFM 路径以 memmap 惰性打开；可选裁剪四周 crop_size 像素（仍是视图）。"""
+    if isinstance(depth, str):
+        depth = open_pfm(depth)
+    if crop_size:
+        depth = depth[crop_size:-crop_size, crop_size:-crop_size, ...]
+    return depth
+
+
+def compute_depth_metrics_tiled(gt, pred, etas=(0.07,), scale=100, curve_etas=None, block_rows=256, crop_size=None,
+                                masks=None):
+    """
+    按行块流式计算指标，结果与 compute_depth_metrics 逐位一致
+
+    每次只把 block_rows 行读入内存并计算差值，峰值内存约为 block_rows * W * 12 字节，
+    与图像总大小无关，可在小内存节点上评估十亿像素或多帧堆叠 (F, H, W) 的视差图。
+
+    参数:
+        gt: 真实值，NumPy 数组（可为 memmap）或 PFM 文件路径
+        pred: 预测值，NumPy 数组（可为 memmap）或 PFM 文件路径
+        block_rows: 每块的行数（沿第一维）
+        crop_size: 若不为 None，评估前裁剪四周 crop_size 像素（与 crop_image 一致）
+        masks: 可选，{区域名: bool 掩码}，形状与裁剪后的 gt 相同
+    返回:
+        metrics: 与 compute_depth_metrics 相同
+    """
+    gt = _open_depth(gt, crop_size)
+    pred = _open_depth(pred, crop_size)
+    if gt.shape != pred.shape:
+        raise ValueError(f"Shape mismatch: gt {gt.shape} vs pred {pred.shape}")
+    accumulator = MetricAccumulator(etas, scale, curve_etas)
+    for row in range(0, max(1, gt.shape[0]), max(1, block_rows)):
+        block_masks = None if masks is None else {name: mask[row:row + block_rows] for name, mask in masks.items()}
+        accumulator.update(gt[row:row + block_rows], pred[row:row + block_rows], block_masks)
+    return accumulator.result()
+
+
+def average_metrics(scene_metrics, etas):
+    """
+    对多个场景的指标求平均（忽略曲线等非标量项）
+
+    参数:
+        scene_metrics: 每个场景的指标字典列表
+        etas: BadPix 阈值列表
+    返回:
+        average_results: 平均指标字典
+    """
+    keys = ["mse", "mae", "rmse"] + [badpix_key(eta) for eta in etas]
+    keys += sorted({key for m in scene_metrics for key in m if REGION_SEP in key})  # 区域指标
+    return {key: np.mean([m[key] for m in scene_metrics]) for key in keys if all(key in m for m in scene_metrics)}
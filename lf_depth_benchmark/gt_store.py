@@ -0,0 +1,99 @@
+"""
+视差真值 (GT/GTLF) 缓存
+
+每个 GT 视差图在一次运行中只读取（并裁剪）一次，供所有方法以及指标计算、对比图生成等各阶段共享。
+多进程模式下先把 GT 落盘为 .npy，子进程通过 np.load(mmap_mode="r") 映射同一份文件，
+由操作系统页缓存共享物理内存，不再各自解析 PFM。
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+def _crop_image(img, crop_size):
+    return img[crop_size:-crop_size, crop_size:-crop_size, ...]
+
+
+class GTStore:
+    """
+    GT 视差图存储，按 (dataset, file) 缓存
+
+    参数:
+        base_dir: ReconLFs 根目录
+        gt_dir_name: 真值目录名，"GTLF" 或 "GT"
+        crop_size: 若不为 None，加载时裁剪四周 crop_size 像素（与 crop_image 一致）
+        reader: PFM 读取函数，如 read_pfm
+    """
+
+    def __init__(self, base_dir, reader, gt_dir_name="GTLF", crop_size=None):
+        self.base_dir = base_dir
+        self.reader = reader
+        self.gt_dir_name = gt_dir_name
+        self.crop_size = crop_size
+        self._cache = {}
+        self._shared = {}  # (dataset, file) -> .npy 路径（多进程共享）
+        self._share_dir = None
+
+    def path(self, dataset, file):
+        return os.path.join(self.base_dir, self.gt_dir_name, dataset, file)
+
+    def get(self, dataset, file):
+        """返回 GT 视差图（只读共享，调用方不要原地修改）。"""
+        key = (dataset, file)
+        if key not in self._cache:
+            if key in self._shared:
+                gt = np.load(self._shared[key], mmap_mode="r")
+            else:
+                gt = self.reader(self.path(dataset, file))
+                if self.crop_size:
+                    gt = _crop_image(gt, self.crop_size)
+                gt.flags.writeable = False
+            self._cache[key] = gt
+        return self._cache[key]
+
+    def share(self, keys):
+        """
+        将给定的 GT 写入临时 .npy 文件，之后序列化到子进程的 store 只携带文件路径，
+        子进程以 memmap 方式读取。
+
+        参数:
+            keys: 可迭代的 (dataset, file)
+        """
+        if self._share_dir is None:
+            self._share_dir = tempfile.mkdtemp(prefix="gt_store_")
+        for dataset, file in keys:
+            key = (dataset, file)
+            if key in self._shared:
+                continue
+            npy_path = os.path.join(self._share_dir, f"{dataset}__{os.path.splitext(file)[0]}.npy")
+            np.save(npy_path, np.ascontiguousarray(self.get(dataset, file)))
+            self._shared[key] = npy_path
+        return self
+
+    def clear(self):
+        self._cache.clear()
+
+    def close(self):
+        """删除共享用的临时文件。"""
+        self._cache.clear()
+        self._shared.clear()
+        if self._share_dir is not None:
+            shutil.rmtree(self._share_dir, ignore_errors=True)
+            self._share_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # 子进程只需要路径信息，不传递已加载的数组
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        return state
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,127 @@
+"""
+内容寻址的视差估计结果缓存
+
+键为以下内容的 sha1：
+- 输入光场：源文件签名（大小 + mtime，或内容哈希），在读取/解码光场之前即可算出
+- 模型 checkpoint 的内容哈希
+- 影响输出的推理配置（角分辨率、切块、精度、编译方式等）
+
+值为 <cache_dir>/<key[:2]>/<key>.pfm。命中时直接复制已有 PFM，不再读光场、不再推理；
+缓存总大小超过上限时按最近使用时间（文件 mtime，命中时更新）淘汰最旧的条目。
+总大小在启动时扫描一次，之后随 put 累加；只有超过上限时才重新扫描目录（同时校正其他进程写入造成的偏差），
+并一次淘汰到上限的 EVICT_TO 倍以下，扫描的开销由多次 put 分摊。
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from results_store import file_signature
+
+# 参与缓存键的推理配置；batch 大小、线程数、内存预算等只影响速度，不影响结果
+CONFIG_KEYS = ('model_name', 'angRes', 'crop', 'patchsize', 'tiling', 'overlap', 'precision', 'jit')
+
+# 超过上限时淘汰到上限的该比例以下
+EVICT_TO = 0.9
+
+
+def config_fingerprint(cfg):
+    return {key: getattr(cfg, key, None) for key in CONFIG_KEYS}
+
+
+def sources_digest(paths, use_hash=False):
+    """一组源文件（视点 PNG 或打包光场）的签名摘要，不需要解码图像。"""
+    sha1 = hashlib.sha1()
+    for path in paths:
+        sha1.update(f"{os.path.basename(path)}={file_signature(path, use_hash)};".encode())
+    return "files:" + sha1.hexdigest()
+
+
+class InferenceCache:
+    """
+    参数:
+        cache_dir: 缓存目录
+        checkpoint_path: 模型 checkpoint 路径（取内容哈希，只计算一次）
+        cfg: 推理配置，取 CONFIG_KEYS 中的字段
+        max_bytes: 缓存总大小上限，None 表示不限制
+    """
+
+    def __init__(self, cache_dir, checkpoint_path, cfg, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._prefix = json.dumps({
+            "checkpoint": file_signature(checkpoint_path, use_hash=True),
+            "config": config_fingerprint(cfg),
+        }, sort_keys=True)
+        self._lock = threading.Lock()  # put 在写线程中执行
+        self.hits = 0
+        self.misses = 0
+        self._total = None if max_bytes is None else sum(size for _, size, _ in self._scan())
+
+    def key(self, input_digest):
+        return hashlib.sha1(f"{self._prefix}|{input_digest}".encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pfm")
+
+    def fetch(self, key, out_path):
+        """命中时把缓存的 PFM 复制到 out_path 并返回 True。"""
+        cached = self.path(key)
+        if not os.path.exists(cached):
+            self.misses += 1
+            return False
+        out_dir = os.path.dirname(out_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        shutil.copyfile(cached, out_path)
+        os.utime(cached)  # 更新最近使用时间
+        self.hits += 1
+        return True
+
+    def put(self, key, pfm_path):
+        """把已写出的 PFM 存入缓存（先写临时文件再原子替换），然后按大小上限淘汰。"""
+        cached = self.path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        shutil.copyfile(pfm_path, tmp)
+        with self._lock:
+            if self._total is not None:
+                old_size = os.path.getsize(cached) if os.path.exists(cached) else 0
+                self._total += os.path.getsize(tmp) - old_size
+            os.replace(tmp, cached)
+        self.evict()
+
+    def _scan(self):
+        """[(mtime, size, path), ...]：缓存中的全部条目。"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith(".pfm"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:  # 被其他进程淘汰
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self):
+        """累计大小超过上限时重新扫描，按最近使用时间淘汰到 EVICT_TO * max_bytes 以下。"""
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._total <= self.max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    if total <= self.max_bytes * EVICT_TO:
+                        break
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                    total -= size
+            self._total = total
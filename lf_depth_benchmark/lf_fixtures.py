@@ -0,0 +1,188 @@
+"""
+合成评估数据生成（用于测试和性能测量）
+
+生成与真实数据相同的目录结构：
+    <base_dir>/GTLF/<dataset>/LF{i}.pfm              v3 的视差真值
+    <base_dir>/GTLF/<dataset>/LF{i}_view{k}_fine.png 视点图（中心视点用于对比图，全部视点可供 test_OACCNet/lf_pack）
+    <base_dir>/<method>/<dataset>/LF{i}.pfm          各方法的视差估计
+    <base_dir>/GT/<dataset>/LF{i}.pfm                可选：四周多出 gt_crop 像素的视差真值（v1/v2 布局）
+
+视差图是分段平滑的：倾斜的背景平面上叠加若干个遮挡物体（椭圆或矩形，各自是倾斜平面），
+近处物体遮挡远处物体，因此有真实的视差不连续和平滑区域；各方法的估计由真值模糊（边缘变钝）、
+加噪声和少量离群点得到，方法序号越大误差越大。视点图由同一纹理按视差平移得到。
+
+用法:
+    python lf_fixtures.py ReconLFs_synth --methods 6 --datasets 3 --scenes 4 --height 512 --width 512
+    python lf_fixtures.py ReconLFs_synth --views all --method_views --gt_crop 22
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+import imageio.v2 as imageio
+
+from pfm_io import write_pfm
+
+METHOD_NAMES = ["GC2ASR", "DispEhcASR", "ELFR", "FS-GAF", "HLFASR", "DistgASR"]
+DATASET_NAMES = ["HCI", "HCI_old", "Inria_DLFD"]
+
+
+def _names(known, prefix, count):
+    return known[:count] + [f"{prefix}{i}" for i in range(len(known), count)]
+
+
+def structured_disparity(height, width, rng, n_objects=6, disp_range=(-1.5, 1.5)):
+    """
+    分段平滑的合成视差图
+
+    参数:
+        rng: np.random.Generator
+        n_objects: 前景遮挡物体个数
+        disp_range: 视差范围
+    返回:
+        (height, width) float32
+    """
+    lo, hi = disp_range
+    span = hi - lo
+    xx = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    yy = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+
+    # 背景：倾斜平面 + 低频起伏
+    gx, gy = rng.uniform(-0.3, 0.3, 2) * span
+    fx, fy, phase = rng.uniform(0.5, 2.0), rng.uniform(0.5, 2.0), rng.uniform(0, 2 * np.pi)
+    disp = (lo + 0.25 * span) + gx * xx + gy * yy + 0.03 * span * np.sin(2 * np.pi * (fx * xx + fy * yy) + phase)
+    disp = disp.astype(np.float32)
+
+    # 前景物体按视差从小到大绘制，近处（视差大）遮挡远处
+    for level in np.sort(rng.uniform(lo + 0.45 * span, hi, n_objects)):
+        cx, cy = rng.uniform(0.1, 0.9, 2)
+        rx, ry = rng.uniform(0.05, 0.25, 2)
+        sx, sy = rng.uniform(-0.1, 0.1, 2) * span
+        # 只在物体的包围盒内计算
+        r0, r1 = np.searchsorted(yy[:, 0], [cy - ry, cy + ry])
+        c0, c1 = np.searchsorted(xx[0], [cx - rx, cx + rx])
+        if r1 <= r0 or c1 <= c0:
+            continue
+        bx, by = xx[:, c0:c1], yy[r0:r1]
+        if rng.random() < 0.5:
+            mask = ((bx - cx) / rx) ** 2 + ((by - cy) / ry) ** 2 <= 1
+        else:
+            mask = np.broadcast_to(True, (r1 - r0, c1 - c0))
+        plane = level + sx * (bx - cx) + sy * (by - cy)
+        np.copyto(disp[r0:r1, c0:c1], plane, where=mask)
+    return disp
+
+
+def degrade(disp, rng, level):
+    """
+    模拟某个方法的视差估计：模糊（不连续处变钝）+ 高斯噪声 + 离群点
+
+    参数:
+        level: 误差等级（>= 0），越大误差越大
+    """
+    out = cv2.GaussianBlur(disp, (0, 0), sigmaX=0.5 + 1.5 * level)
+    out += rng.normal(0, 0.01 + 0.02 * level, disp.shape).astype(np.float32)
+    n_outliers = int(disp.size * 0.002 * level)
+    if n_outliers:
+        idx = rng.integers(0, disp.size, n_outliers)
+        out.reshape(-1)[idx] += rng.normal(0, 0.5, n_outliers).astype(np.float32)
+    return out
+
+
+def random_texture(height, width, rng):
+    """低频色块 + 高频细节的 RGB 纹理（uint8），供视点图使用。"""
+    coarse = rng.random((max(2, height // 16), max(2, width // 16), 3), dtype=np.float32)
+    texture = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    texture += 0.15 * rng.standard_normal((height, width, 3), dtype=np.float32)
+    return np.clip(texture * 255, 0, 255).astype(np.uint8)
+
+
+def render_view(texture, disp, u, v, ang_res=7):
+    """按视差把中心视点纹理平移到视点 (u, v)。"""
+    c = ang_res // 2
+    if u == c and v == c:
+        return texture
+    height, width = disp.shape
+    map_x = np.arange(width, dtype=np.float32)[None, :] + (v - c) * disp
+    map_y = np.arange(height, dtype=np.float32)[:, None] + (u - c) * disp
+    return cv2.remap(texture, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+
+def write_views(out_dir, scene, texture, disp, views="center", ang_res=7):
+    """
+    写出 <scene>_view{k}_fine.png
+
+    参数:
+        views: "center" 只写中心视点；"all" 写全部 ang_res * ang_res 个视点；"none" 不写
+    """
+    if views == "none":
+        return
+    center = (ang_res // 2) * ang_res + ang_res // 2
+    ids = range(ang_res * ang_res) if views == "all" else [center]
+    for k in ids:
+        view = render_view(texture, disp, k // ang_res, k % ang_res, ang_res)
+        imageio.imwrite(os.path.join(out_dir, f"{scene}_view{k}_fine.png"), view)
+
+
+def generate_fixture(base_dir, n_methods=6, n_datasets=2, n_scenes=3, height=256, width=256, views="center",
+                     method_views=False, gt_crop=0, ang_res=7, seed=0):
+    """
+    生成一套合成评估数据
+
+    参数:
+        n_methods, n_datasets, n_scenes: 方法、数据集、每个数据集的场景个数（名字不够时用 Method{i}/Dataset{i}）
+        height, width: 评估分辨率（GTLF 和各方法的视差图大小）
+        views: GTLF 视点图，"center" / "all" / "none"
+        method_views: 同时为各方法写出视点图（按各自的估计视差平移）
+        gt_crop: 大于 0 时额外写出四周各大 gt_crop 像素的 GT 目录（v1/v2 布局）
+        seed: 随机种子，相同参数得到相同数据
+    返回:
+        {"methods": [...], "datasets": [...], "scenes": [...]}
+    """
+    methods = _names(METHOD_NAMES, "Method", n_methods)
+    datasets = _names(DATASET_NAMES, "Dataset", n_datasets)
+    scenes = [f"LF{i}" for i in range(n_scenes)]
+    c = gt_crop
+    for d, dataset in enumerate(datasets):
+        for s, scene in enumerate(scenes):
+            rng = np.random.default_rng([seed, d, s])
+            full = structured_disparity(height + 2 * c, width + 2 * c, rng)
+            texture = random_texture(height + 2 * c, width + 2 * c, rng)
+            disp = full[c:c + height, c:c + width]
+            dirs = [("GTLF", disp, texture[c:c + height, c:c + width], views)]
+            if c:
+                dirs.append(("GT", full, texture, "center" if views != "none" else "none"))
+            for i, method in enumerate(methods):
+                dirs.append((method, degrade(disp, rng, 0.5 + i), texture[c:c + height, c:c + width],
+                             views if method_views else "none"))
+            for name, data, tex, view_mode in dirs:
+                out_dir = os.path.join(base_dir, name, dataset)
+                os.makedirs(out_dir, exist_ok=True)
+                write_pfm(data, os.path.join(out_dir, f"{scene}.pfm"))
+                write_views(out_dir, scene, tex, data, view_mode, ang_res)
+        print(f"{dataset}: {len(scenes)} scenes x {len(methods)} methods written")
+    return {"methods": methods, "datasets": datasets, "scenes": scenes}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="生成合成的光场视差评估数据（GTLF 布局）")
+    parser.add_argument("base_dir", type=str, help="输出目录，如 ReconLFs_synth")
+    parser.add_argument("--methods", type=int, default=6)
+    parser.add_argument("--datasets", type=int, default=2)
+    parser.add_argument("--scenes", type=int, default=3)
+    parser.add_argument("--height", type=int, default=256)
+    parser.add_argument("--width", type=int, default=256)
+    parser.add_argument("--views", type=str, default="center", choices=["center", "all", "none"],
+                        help="GTLF 视点图：只写中心视点 / 全部视点 / 不写")
+    parser.add_argument("--method_views", action="store_true", help="同时为各方法写出视点图")
+    parser.add_argument("--gt_crop", type=int, default=0, help="大于 0 时额外生成四周各大该像素数的 GT 目录")
+    parser.add_argument("--ang_res", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_fixture(args.base_dir, args.methods, args.datasets, args.scenes, args.height, args.width, args.views,
+                     args.method_views, args.gt_crop, args.ang_res, args.seed)
@@ -0,0 +1,209 @@
+"""
+评估流程的离线微基准
+
+在不同分辨率的合成数据（lf_fixtures.py）上计时：
+- io: write_pfm、read_pfm（整图 / memmap 遍历 / 按行读取）
+- metrics: compute_depth_metrics、分块版本、带区域掩码的版本，以及逐指标各算一遍差值的朴素实现作为对照
+- report: save_results_to_markdown（含 / 不含 bootstrap），指标来自该分辨率下 --scenes 个场景的实际评估
+- plot: 单场景对比图（matplotlib / lut）、PNG 导出、预览金字塔的生成和读取
+- pipeline: lfbench 完整流水线（开启剖析，记录各阶段耗时）
+
+每项重复 --repeat 次，报告最小值和中位数（秒），结果可保存为 JSON 以便对比不同提交。
+
+用法:
+    python lf_microbench.py --sizes 256,512,1024 --repeat 5 --output bench.json
+    python lf_microbench.py --suites io,metrics --sizes 2048,4096
+    python lf_microbench.py --suites report --sizes 512 --scenes 50
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+
+from pfm_io import read_pfm, read_pfm_rows, write_pfm
+from depth_metrics import compute_depth_metrics, compute_depth_metrics_tiled, badpix_key
+from region_masks import derive_masks
+from gt_store import GTStore
+from png_export import export_depth_png
+from preview_pyramid import load_preview
+from lf_fixtures import generate_fixture, structured_disparity, degrade
+import lfbench
+
+SUITES = ["io", "metrics", "report", "plot", "pipeline"]
+ETAS = [0.07, 0.03, 0.01]
+
+
+def timeit(fn, repeat=3):
+    """返回 {"min": 秒, "median": 秒}。"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def naive_metrics(gt, pred, etas):
+    """改造前的做法：MSE 和每个 eta 的 BadPix 各自重新计算差值。"""
+    metrics = {"mse": np.mean((gt - pred) ** 2) * 100}
+    for eta in etas:
+        metrics[badpix_key(eta)] = np.sum(np.abs(gt - pred) > eta) / gt.size * 100
+    return metrics
+
+
+def bench_io(size, work_dir, repeat):
+    rng = np.random.default_rng(0)
+    data = structured_disparity(size, size, rng)
+    path = os.path.join(work_dir, "io.pfm")
+    write_pfm(data, path)
+    return {
+        "write_pfm": timeit(lambda: write_pfm(data, path), repeat),
+        "read_pfm": timeit(lambda: read_pfm(path), repeat),
+        "read_pfm_mmap_sum": timeit(lambda: float(read_pfm(path, mmap=True).sum()), repeat),
+        "read_pfm_rows_256": timeit(lambda: read_pfm_rows(path, 0, min(256, size)), repeat),
+    }
+
+
+def bench_metrics(size, work_dir, repeat):
+    rng = np.random.default_rng(0)
+    gt = structured_disparity(size, size, rng)
+    pred = degrade(gt, rng, 1.0)
+    masks = derive_masks(gt)
+    return {
+        "naive": timeit(lambda: naive_metrics(gt, pred, ETAS), repeat),
+        "compute_depth_metrics": timeit(lambda: compute_depth_metrics(gt, pred, ETAS), repeat),
+        "tiled_256": timeit(lambda: compute_depth_metrics_tiled(gt, pred, ETAS, block_rows=256), repeat),
+        "with_regions": timeit(lambda: compute_depth_metrics(gt, pred, ETAS, masks=masks), repeat),
+        "derive_masks": timeit(lambda: derive_masks(gt), repeat),
+    }
+
+
+def bench_report(size, work_dir, repeat, n_scenes=10):
+    # 先在 size x size 的 n_scenes 个场景上实际评估（不计时），只对生成报告计时
+    base_dir = _fixture(size, work_dir, n_scenes)
+    out_dir = os.path.join(work_dir, f"report_{size}_{n_scenes}")
+    os.makedirs(out_dir, exist_ok=True)
+    cfg = lfbench.load_config("v3", overrides=[
+        ("base_dir", base_dir), ("output_dir", out_dir), ("pipeline", ["discover", "load", "score"]),
+        ("stages.score.cache", False)])
+    results = lfbench.run_pipeline(cfg).results
+    return {
+        "markdown": timeit(lambda: lfbench.save_results_to_markdown(results, out_dir, ETAS), repeat),
+        "markdown_bootstrap_1000": timeit(
+            lambda: lfbench.save_results_to_markdown(results, out_dir, ETAS, n_bootstrap=1000), repeat),
+    }
+
+
+def _fixture(size, work_dir, n_scenes=1):
+    base_dir = os.path.join(work_dir, f"fixture_{size}_{n_scenes}")
+    if not os.path.isdir(base_dir):
+        generate_fixture(base_dir, n_methods=6, n_datasets=1, n_scenes=n_scenes, height=size, width=size)
+    return base_dir
+
+
+def bench_plot(size, work_dir, repeat):
+    base_dir = _fixture(size, work_dir)
+    gt_store = GTStore(base_dir, read_pfm, gt_dir_name="GTLF")
+    methods = lfbench.COMPARISON_METHODS
+    out = os.path.join(work_dir, "cmp.png")
+    pfm_path = os.path.join(base_dir, methods[0], "HCI", "LF0.pfm")
+    all_methods = lfbench.get_methods_and_datasets(base_dir)[0]
+    return {
+        "comparison_matplotlib": timeit(
+            lambda: lfbench.render_comparison_scene(("HCI", "LF0.pfm", out), base_dir, methods, gt_store), repeat),
+        "comparison_lut": timeit(
+            lambda: lfbench.render_comparison_scene(("HCI", "LF0.pfm", out), base_dir, methods, gt_store,
+                                                    renderer="lut"), repeat),
+        "png_export": timeit(lambda: export_depth_png(pfm_path, os.path.join(work_dir, "disp.png")), repeat),
+        "preview_pyramid": timeit(
+            lambda: lfbench.convert_pfm_to_png(base_dir, all_methods, ["HCI"], work_dir, incremental=False, png=False,
+                                               pyramid_dir=work_dir), repeat),
+        "load_preview_256": timeit(
+            lambda: load_preview(os.path.join(work_dir, "HCI_LF0.npz"), methods[0], "error", 256), repeat),
+    }
+
+
+def bench_pipeline(size, work_dir, repeat):
+    base_dir = _fixture(size, work_dir)
+    out_dir = os.path.join(work_dir, f"pipeline_{size}")
+    cfg = lfbench.load_config("v3", overrides=[
+        ("base_dir", base_dir), ("output_dir", out_dir), ("stages.score.cache", False),
+        ("stages.visualise.cache", False), ("stages.report.bootstrap", 0), ("profile.enabled", True),
+        ("profile.tracemalloc", False)])
+    os.makedirs(out_dir, exist_ok=True)
+    stage_times = {}
+
+    def run_once():
+        for s in lfbench.run_pipeline(cfg).profiler.stages:
+            stage_times.setdefault(s["stage"], []).append(s["wall_s"])
+
+    cases = {"total": timeit(run_once, repeat)}
+    for name, times in stage_times.items():
+        cases[f"stage_{name}"] = {"min": min(times), "median": statistics.median(times)}
+    return cases
+
+
+BENCHES = {"io": bench_io, "metrics": bench_metrics, "report": bench_report, "plot": bench_plot,
+           "pipeline": bench_pipeline}
+
+
+def run(suites, sizes, repeat=3, work_dir=None, n_scenes=10):
+    """
+    参数:
+        suites: SUITES 的子集
+        sizes: 分辨率列表
+        n_scenes: report 中每个方法的场景数
+    返回:
+        {suite: {size: {case: {"min", "median"}}}}
+    """
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="lf_microbench_")
+    results = {}
+    try:
+        for suite in suites:
+            results[suite] = {}
+            for size in sizes:
+                if suite == "report":
+                    cases = bench_report(size, work_dir, repeat, n_scenes)
+                else:
+                    cases = BENCHES[suite](size, work_dir, repeat)
+                results[suite][size] = cases
+                for case, t in cases.items():
+                    print(f"{suite:<9}{size:>6}  {case:<26}{t['min']:>10.4f}{t['median']:>10.4f}")
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="评估流程微基准（PFM 读写、指标、报告、绘图）")
+    parser.add_argument("--suites", type=str, default=",".join(SUITES), help=f"逗号分隔，可选 {','.join(SUITES)}")
+    parser.add_argument("--sizes", type=str, default="256,512,1024", help="逗号分隔的分辨率")
+    parser.add_argument("--scenes", type=int, default=10, help="report 中每个方法的场景数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--work_dir", type=str, default=None, help="临时数据目录，默认新建并在结束后删除")
+    parser.add_argument("--output", type=str, default=None, help="保存 JSON 结果的路径")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    suites = [s for s in args.suites.split(",") if s]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise ValueError(f"Unknown suites {sorted(unknown)}, expected a subset of {SUITES}")
+    print(f"{'suite':<9}{'size':>6}  {'case':<26}{'min(s)':>10}{'median(s)':>10}")
+    results = run(suites, [int(s) for s in args.sizes.split(",")], args.repeat, args.work_dir, args.scenes)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"repeat": args.repeat, "scenes": args.scenes, "results": results}, f, indent=2)
+        print(f"Saved to {args.output}")
@@ -0,0 +1,236 @@
+"""
+打包光场存储
+
+read_lfs 每次都要逐张解码 49 张（test 为 81 张）PNG。这里把一个光场的所有视点一次性转换为
+单个可内存映射的 .npy 文件（uint8, 形状 (u, v, h, w, 3)），并在同名 .json 中保存元数据。
+之后加载光场只需一次 np.load(mmap_mode="r")，可以直接切片任意视点或任意行而不触及其余数据。
+
+用法（一次性转换已有的 LF{n}_view{i}_fine.png 目录）：
+    python lf_pack.py ReconLFs --ang_res 7
+"""
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import imageio.v2 as imageio
+
+LF_VIEW_FORMAT = "LF%d_view%d_fine.png"
+PACKED_FORMAT = "LF%d_views.npy"
+
+
+def view_paths(lf_dir, lf_no, ang_res=7):
+    return [os.path.join(lf_dir, LF_VIEW_FORMAT % (lf_no, i)) for i in range(ang_res ** 2)]
+
+
+def packed_path(lf_dir, lf_no):
+    return os.path.join(lf_dir, PACKED_FORMAT % lf_no)
+
+
+def _meta_path(npy_path):
+    return os.path.splitext(npy_path)[0] + ".json"
+
+
+def pack_light_field(lf_dir, lf_no, ang_res=7, out_path=None):
+    """
+    将 LF{lf_no}_view{i}_fine.png 打包为一个 .npy 文件
+
+    视点逐张解码并直接写入 open_memmap 打开的输出文件，不在内存中拼出整个光场。
+
+    参数:
+        lf_dir: 视点 PNG 所在目录
+        lf_no: 光场编号
+        ang_res: 角分辨率，视点数为 ang_res ** 2（按行优先排列）
+        out_path: 输出路径，默认 <lf_dir>/LF{lf_no}_views.npy
+    返回:
+        out_path: 输出文件路径
+    """
+    paths = view_paths(lf_dir, lf_no, ang_res)
+    out_path = out_path or packed_path(lf_dir, lf_no)
+    first = imageio.imread(paths[0])
+    h, w = first.shape[:2]
+    lf = np.lib.format.open_memmap(out_path + ".tmp", mode="w+", dtype=np.uint8, shape=(ang_res, ang_res, h, w, 3))
+    for i, path in enumerate(paths):
+        view = first if i == 0 else imageio.imread(path)
+        if view.ndim == 2:
+            view = view[..., None]
+        lf[i // ang_res, i % ang_res] = view[..., :3]
+    lf.flush()
+    del lf
+    os.replace(out_path + ".tmp", out_path)
+
+    meta = {
+        "ang_res": ang_res,
+        "shape": [ang_res, ang_res, h, w, 3],
+        "dtype": "uint8",
+        "layout": "u v h w c",
+        "sources": [os.path.basename(p) for p in paths],
+        "source_mtime": max(os.path.getmtime(p) for p in paths),
+    }
+    with open(_meta_path(out_path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return out_path
+
+
+def is_packed_up_to_date(lf_dir, lf_no, ang_res=7):
+    """打包文件存在、角分辨率一致且不早于所有源 PNG 时返回 True。"""
+    npy_path = packed_path(lf_dir, lf_no)
+    meta_path = _meta_path(npy_path)
+    if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("ang_res") != ang_res:
+        return False
+    packed_mtime = os.path.getmtime(npy_path)
+    return all(not os.path.exists(p) or os.path.getmtime(p) <= packed_mtime for p in view_paths(lf_dir, lf_no, ang_res))
+
+
+def open_packed_lf(path):
+    """以只读 memmap 方式打开打包光场，返回 (u, v, h, w, 3) uint8 数组。"""
+    return np.load(path, mmap_mode="r")
+
+
+def lf_to_gray(lf):
+    """
+    转为 [0, 1] 灰度，计算方式与 read_lfs 相同：mean((1 / 255) * lf, axis=-1)
+
+    参数:
+        lf: (..., 3) uint8 数组，可以是打包光场的任意切片
+    返回:
+        gray: float32，去掉最后一维
+    """
+    return np.mean((1 / 255) * np.asarray(lf).astype('float32'), axis=-1, keepdims=False)
+
+
+def read_views_threaded(paths, ang_res, gray=True, num_threads=None):
+    """
+    用线程池并行解码视点，每张视点解码后立即写入预分配的张量
+
+    不再构造 int64 的 (u, v, h, w, 3) RGB 数组：gray=True 时直接得到 float32 灰度 (u, v, h, w)，
+    峰值内存约为原来的 1/24；gray=False 时得到 uint8 RGB (u, v, h, w, 3)。
+
+    参数:
+        paths: 按行优先排列的 ang_res ** 2 个视点路径
+        ang_res: 角分辨率
+        gray: 是否转为 [0, 1] 灰度（计算方式与 lf_to_gray 相同）
+        num_threads: 线程数，None 使用 ThreadPoolExecutor 默认值
+    返回:
+        lf: float32 (u, v, h, w) 或 uint8 (u, v, h, w, 3)
+    """
+    if len(paths) != ang_res ** 2:
+        raise ValueError(f"Expected {ang_res ** 2} views, got {len(paths)}")
+    first = imageio.imread(paths[0])
+    h, w = first.shape[:2]
+    if gray:
+        lf = np.empty((ang_res, ang_res, h, w), dtype=np.float32)
+    else:
+        lf = np.empty((ang_res, ang_res, h, w, 3), dtype=np.uint8)
+
+    def _decode(i):
+        view = first if i == 0 else imageio.imread(paths[i])
+        if view.ndim == 2:
+            view = view[..., None].repeat(3, axis=-1)
+        view = view[..., :3]
+        lf[i // ang_res, i % ang_res] = lf_to_gray(view) if gray else view
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(_decode, range(len(paths))))
+    return lf
+
+
+class LightFieldViews:
+    """
+    按需读取单个光场的视点、行和区域
+
+    有最新的打包文件时直接从 memmap 中切片，只触及需要的行/区域；否则逐张解码 PNG，
+    解码后的 uint8 视点保留在内存中，同一视点（如中心视点）在多次调用间只解码一次。
+    返回的数据均为 float32 [0, 1]，与 imageio.imread(path).astype(np.float32) / 255.0 一致。
+
+    参数:
+        lf_dir: 视点 PNG（及打包文件）所在目录
+        lf_no: 光场编号
+        ang_res: 角分辨率
+    """
+
+    def __init__(self, lf_dir, lf_no, ang_res=7):
+        self.lf_dir = lf_dir
+        self.lf_no = lf_no
+        self.ang_res = ang_res
+        self.packed = open_packed_lf(packed_path(lf_dir, lf_no)) if is_packed_up_to_date(lf_dir, lf_no, ang_res) else None
+        self._decoded = {}
+
+    def path(self, i):
+        return os.path.join(self.lf_dir, LF_VIEW_FORMAT % (self.lf_no, i))
+
+    def exists(self, i):
+        return self.packed is not None or os.path.exists(self.path(i))
+
+    def _raw(self, i):
+        """第 i 个视点（行优先编号）的 uint8 数据：memmap 切片，或解码后缓存的数组。"""
+        if self.packed is not None:
+            return self.packed[i // self.ang_res, i % self.ang_res]
+        if i not in self._decoded:
+            self._decoded[i] = imageio.imread(self.path(i))
+        return self._decoded[i]
+
+    def view(self, i):
+        return self._raw(i).astype(np.float32) / 255.0
+
+    def rows(self, view_ids, hs):
+        """
+        多个视点的若干行，即水平 EPI
+
+        每个视点只读取一次：未打包时整张 PNG 只解码一次，取出所有需要的行后丢弃（不缓存整张视点），
+        因此多条 EPI 线应在一次调用中传入，而不是逐行调用。
+
+        参数:
+            view_ids: 视点编号
+            hs: 行号，或行号列表
+        返回:
+            hs 为单个行号时为 (len(view_ids), w, c)；为列表时为 (len(hs), len(view_ids), w, c)
+        """
+        single = np.ndim(hs) == 0
+        hs = [hs] if single else list(hs)
+        rows = []
+        for i in view_ids:
+            if self.packed is None and i not in self._decoded:
+                rows.append(imageio.imread(self.path(i))[hs])
+            else:
+                rows.append(self._raw(i)[hs])
+        epis = np.stack(rows, axis=1).astype(np.float32) / 255.0
+        return epis[0] if single else epis
+
+
+def find_light_fields(root):
+    """递归查找包含 LF{n}_view0_fine.png 的目录，返回 [(dir, lf_no), ...]。"""
+    pattern = re.compile(r"^LF(\d+)_view0_fine\.png$")
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            match = pattern.match(name)
+            if match:
+                found.append((dirpath, int(match.group(1))))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将 LF{n}_view{i}_fine.png 打包为可内存映射的 .npy 光场")
+    parser.add_argument("root", type=str, help="递归查找光场视点的根目录，如 ReconLFs")
+    parser.add_argument("--ang_res", type=int, default=7)
+    parser.add_argument("--force", action="store_true", help="即使已是最新也重新打包")
+    args = parser.parse_args()
+
+    for lf_dir, lf_no in find_light_fields(args.root):
+        if not args.force and is_packed_up_to_date(lf_dir, lf_no, args.ang_res):
+            continue
+        if not os.path.exists(view_paths(lf_dir, lf_no, args.ang_res)[-1]):
+            print(f"Skipping LF{lf_no} under <{lf_dir}>: fewer than {args.ang_res ** 2} views")
+            continue
+        print(f"Packing LF{lf_no} under <{lf_dir}> -> {pack_light_field(lf_dir, lf_no, args.ang_res)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+生产者/消费者流水线工具
+
+- prefetch_iter: 后台线程提前读取并预处理接下来的 K 个任务，主线程按原顺序取结果
+- AsyncWriter: 后台写线程，主线程提交结果后立即返回，继续下一个任务
+
+用于 test_benchmark：读光场 (I/O) / 视差估计 (计算) / 写 PFM (I/O) 三者重叠执行，
+总耗时接近 max(I/O, 计算)，而不是三者之和。
+"""
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def prefetch_iter(jobs, loader, depth=2, num_workers=1):
+    """
+    按顺序产出 (job, loader(job))，同时后台最多提前加载 depth 个任务
+
+    参数:
+        jobs: 任务列表
+        loader: 加载/预处理函数，在后台线程中执行
+        depth: 预取深度（队列长度），0 表示不预取，直接在当前线程中加载
+        num_workers: 后台加载线程数
+    """
+    if depth <= 0:
+        for job in jobs:
+            yield job, loader(job)
+        return
+
+    jobs = iter(jobs)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        for job in jobs:
+            pending.append((job, executor.submit(loader, job)))
+            if len(pending) >= depth:
+                break
+        while pending:
+            job, future = pending.popleft()
+            result = future.result()  # 加载出错时在主线程中抛出
+            next_job = next(jobs, None)
+            if next_job is not None:
+                pending.append((next_job, executor.submit(loader, next_job)))
+            yield job, result
+
+
+class AsyncWriter:
+    """
+    后台写线程
+
+    参数:
+        write_fn: 写函数，如 write_pfm，调用方式为 write_fn(*args)
+        max_queue: 等待写入的最大任务数；队列满时 submit 会阻塞，避免结果在内存中无限堆积
+    用法:
+        with AsyncWriter(write_pfm, 4) as writer:
+            writer.submit(disp, path)
+    """
+
+    _STOP = object()
+
+    def __init__(self, write_fn, max_queue=4):
+        self.write_fn = write_fn
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if self._error is None:
+                try:
+                    self.write_fn(*item)
+                except Exception as e:  # 记录第一个错误，在主线程中重新抛出
+                    self._error = e
+
+    def submit(self, *args):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(args)
+
+    def close(self):
+        """等待所有写入完成。"""
+        self._queue.put(self._STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._queue.put(self._STOP)
@@ -0,0 +1,1148 @@
+"""
+lfbench：光场重建深度图评估引擎
+
+流水线：discover -> load -> score -> report -> visualise，每个阶段在 config["stages"][阶段名] 中有自己的
+并行度（workers）和缓存设置。配置按 预设(PRESETS) <- JSON 配置文件(--config) <- 命令行 的顺序合并，
+原来的 evaluate_depth.py / generate_benchmark_v2.py / generate_benchmark_v3.py 分别对应预设 v1 / v2 / v3。
+
+用法:
+    python lfbench.py --preset v3 --base_dir ReconLFs --output_dir benchmark_depth
+    python lfbench.py --preset v2 --config my_bench.json --set stages.score.workers=8
+    python lfbench.py --preset v2 --dump_config      # 打印合并后的完整配置，可另存为 JSON 修改
+
+自定义阶段：在 config["plugins"] 中列出模块名，模块中用 @stage("名字") 注册 fn(ctx, stage_cfg)，
+再把名字加入 config["pipeline"]。
+"""
+import argparse
+import copy
+import fnmatch
+import importlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+import imageio.v2 as imageio
+import pandas as pd
+
+from pfm_io import read_pfm
+from depth_metrics import (compute_depth_metrics, compute_depth_metrics_tiled, average_metrics, badpix_key,
+                           region_key, REGION_SEP)
+from gt_store import GTStore
+from region_masks import MaskStore
+from bootstrap_stats import bootstrap_summary
+from benchmark_watch import watch
+from results_store import ResultsStore, file_signature, metric_params
+from lut_render import render_comparison
+from png_export import export_pngs, is_up_to_date, MAX_EXPORT_WORKERS
+from preview_pyramid import export_scene
+from work_queue import WorkQueue
+from bench_profile import Profiler, profiled_item, split_records
+
+# 对比图中固定的方法顺序
+COMPARISON_METHODS = ["GC2ASR", "DispEhcASR", "ELFR", "FS-GAF", "HLFASR", "DistgASR"]
+# Inria_DLFD 中参与评估的光场
+DLFD_SCENES = [f"LF{idx}" for idx in [1, 9, 10, 16, 20, 22, 31, 32]]
+
+DEFAULT_CONFIG = {
+    "base_dir": "ReconLFs",
+    "output_dir": "benchmark_depth",
+    "gt_dir": "GTLF",  # 真值目录名
+    "exclude_dirs": ["GT", "GTLF"],  # base_dir 下不是方法的目录
+    "methods": None,  # None 表示 base_dir 下除 exclude_dirs 外的所有目录
+    "datasets": None,  # None 表示所有方法目录下出现过的数据集
+    "pattern": "LF*.pfm",
+    "scene_filter": {},  # {dataset: [场景名(不含扩展名), ...]}，只评估列出的场景
+    "gt_crop": 0,  # GT 四周裁剪的像素数（预测已是裁剪后的大小）
+    "etas": [0.07, 0.03, 0.01],
+    "mse_scale": 100,
+    "plugins": [],
+    "pipeline": ["discover", "load", "score", "report", "visualise"],
+    "stages": {
+        "discover": {},
+        "load": {
+            "workers": 1,  # 大于 1 时用线程池预读所有 GT
+            "share": True,  # score 多进程时把 GT 落盘为 .npy 供子进程 memmap 共享
+        },
+        "score": {
+            "workers": os.cpu_count() or 1,
+            "cache": True,  # 增量结果存储，只计算新增或文件已变化的场景
+            "results_db": None,  # 默认 <output_dir>/results.sqlite
+            "hash": False,  # 按文件内容哈希而非大小+mtime 判断变化
+            "block_rows": None,  # 按行块流式计算（超大视差图）
+            "regions": [],
+            "mask_dir": None,
+            "edge_thresh": 0.1,
+            "band": 3,
+        },
+        "report": {
+            "layout": "scene",  # "scene": 按场景分组；"method": 按方法分组
+            "precision": 2,
+            "badpix_label": "BadPix@{eta}",
+            "bootstrap": 1000,
+            "seed": 0,
+        },
+        "visualise": {
+            "workers": os.cpu_count() or 1,
+            "cache": True,  # 跳过比输入新的 PNG 和对比图
+            "png": True,
+            "png_cmap": None,
+            "png_compress": None,
+            "png_suffix": "_disp.png",
+            "comparison": True,
+            "renderer": "matplotlib",
+            "methods": None,  # 对比图中的方法顺序，None 表示评估的全部方法
+            "view_suffix": "_view24_fine.png",
+            "fontsize": 14,
+            "pyramid": False,  # 导出 PNG 时为每个场景写出视差图/误差图的预览金字塔，见 preview_pyramid.py
+            "pyramid_min_size": 16,  # 金字塔最小一层的短边下限
+        },
+    },
+    "watch": {"interval": 1.0, "debounce": 2.0, "poll": False},
+    "dist": {"work_dir": None, "stale_after": 120.0, "heartbeat": 10.0},
+    # 阶段级 / 场景级性能剖析，见 bench_profile.py；环境变量 LFBENCH_PROFILE 也可开启
+    "profile": {"enabled": False, "path": None, "cprofile": False, "tracemalloc": True},
+}
+
+PRESETS = {
+    # evaluate_depth.py：GT 目录，单一阈值，MSE 不缩放，按方法分组的 4 位小数表格
+    "v1": {
+        "gt_dir": "GT",
+        "exclude_dirs": ["GT"],
+        "pattern": "*.pfm",
+        "gt_crop": 22,
+        "etas": [0.07],
+        "mse_scale": 1,
+        "stages": {
+            "score": {"cache": False},
+            "report": {"layout": "method", "precision": 4, "badpix_label": "BadPix", "bootstrap": 0},
+            "visualise": {"png_suffix": ".png", "methods": COMPARISON_METHODS, "view_suffix": ".png",
+                          "fontsize": 12},
+        },
+    },
+    # generate_benchmark_v2.py：GT 目录（GTLF 也作为一个方法参与评估），只评估部分 DLFD 场景
+    "v2": {
+        "output_dir": "benchmark_depth_GT",
+        "gt_dir": "GT",
+        "exclude_dirs": ["GT"],
+        "gt_crop": 22,
+        "scene_filter": {"Inria_DLFD": DLFD_SCENES},
+        "stages": {
+            "report": {"bootstrap": 0},
+            "visualise": {"png_suffix": ".png", "methods": ["GTLF"] + COMPARISON_METHODS},
+        },
+    },
+    # generate_benchmark_v3.py：以 GTLF 估计的视差作为真值
+    "v3": {
+        "stages": {"visualise": {"methods": COMPARISON_METHODS}},
+    },
+}
+
+STAGES = {}
+
+
+def stage(name):
+    """注册流水线阶段：fn(ctx, stage_cfg)。"""
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+def merge_config(base, override):
+    """递归合并字典，override 中的值覆盖 base（列表整体替换）。"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def set_config_value(cfg, dotted_key, value):
+    """按 "stages.score.workers" 形式的路径设置配置项。"""
+    keys = dotted_key.split(".")
+    node = cfg
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+def load_config(preset="v3", config_path=None, overrides=None):
+    """
+    预设 <- 配置文件 <- overrides 依次合并
+
+    参数:
+        overrides: [(点分路径, 值), ...]
+    """
+    cfg = merge_config(DEFAULT_CONFIG, PRESETS[preset])
+    if config_path:
+        with open(config_path) as f:
+            cfg = merge_config(cfg, json.load(f))
+    for dotted_key, value in overrides or []:
+        set_config_value(cfg, dotted_key, value)
+    return cfg
+
+
+class BenchContext:
+    """
+    流水线各阶段共享的状态
+
+    参数:
+        results_store: ResultsStore，None 表示不使用增量结果
+        datasets: 只处理这些数据集，None 表示全部
+        files: 只重新生成这些 (dataset, file) 的对比图，None 表示全部
+    """
+
+    def __init__(self, cfg, results_store=None, datasets=None, files=None):
+        self.cfg = cfg
+        self.results_store = results_store
+        self.only_datasets = datasets
+        self.only_files = files
+        self.methods, self.datasets = [], []
+        self.jobs, self.found = [], set()
+        self.gt_store = None
+        self.mask_store = None
+        self.results = None
+        self.profiler = Profiler()
+
+    def close(self):
+        if self.gt_store is not None:
+            self.gt_store.close()
+
+
+def get_methods_and_datasets(base_dir, exclude_dirs=("GT", "GTLF")):
+    methods = [method for method in os.listdir(base_dir) if
+               os.path.isdir(os.path.join(base_dir, method)) and method not in exclude_dirs]
+    datasets = []
+    for method in methods:
+        method_dir = os.path.join(base_dir, method)
+        datasets.extend([ds for ds in os.listdir(method_dir) if os.path.isdir(os.path.join(method_dir, ds))])
+    return methods, list(set(datasets))
+
+
+def collect_scene_jobs(base_dir, methods, datasets, gt_dir_name="GTLF", pattern="LF*.pfm", scene_filter=None):
+    """
+    枚举所有需要评估的 (方法, 数据集, 场景) 组合
+
+    参数:
+        scene_filter: {dataset: [场景名, ...]}，列出的数据集只评估其中的场景
+    返回:
+        jobs: [(method, dataset, file, pred_path, gt_path), ...]，顺序固定（方法 -> 数据集 -> 文件名）
+        found: {(method, dataset)} 方法和 GT 目录都存在的组合，用于在结果中保留空数据集
+    """
+    scene_filter = scene_filter or {}
+    jobs, found = [], set()
+    for method in methods:
+        for dataset in datasets:
+            method_dataset_dir = os.path.join(base_dir, method, dataset)
+            gt_dir = os.path.join(base_dir, gt_dir_name, dataset)
+            if not os.path.exists(method_dataset_dir) or not os.path.exists(gt_dir):
+                print(f"{method} or {gt_dir_name} of {dataset} not found, skipping ...")
+                continue
+            found.add((method, dataset))
+
+            for file in sorted(os.listdir(method_dataset_dir)):
+                if not fnmatch.fnmatch(file, pattern):
+                    continue
+                if dataset in scene_filter and os.path.splitext(file)[0] not in scene_filter[dataset]:
+                    continue
+                pred_path = os.path.join(method_dataset_dir, file)
+                gt_path = os.path.join(gt_dir, file)
+                if not os.path.exists(gt_path):
+                    print(f"{gt_path} not found")
+                    continue
+                jobs.append((method, dataset, file, pred_path, gt_path))
+    return jobs, found
+
+
+def _crop(img, crop_size):
+    return img[crop_size:-crop_size, crop_size:-crop_size, ...] if crop_size else img
+
+
+def _scene_masks(dataset, file, gt_path, gt_store, mask_store, block_rows=None):
+    """场景的区域掩码；分块模式下 GT 以 memmap 视图传入，只在首次推导掩码时读完整个 GT。"""
+    if mask_store is None:
+        return None
+    if block_rows:
+        gt = _crop(read_pfm(gt_path, mmap=True), gt_store.crop_size)
+    else:
+        gt = gt_store.get(dataset, file)
+    return mask_store.get(dataset, file, gt, gt_path)
+
+
+def evaluate_scene(job, etas, gt_store, block_rows=None, mask_store=None, scale=100):
+    """
+    评估单个场景（可在子进程中执行）
+
+    参数:
+        block_rows: 不为 None 时按行块流式计算（GT 与预测都以 memmap 读取，不经过 gt_store 缓存），
+                    峰值内存只与块大小有关，结果与整图计算一致
+        mask_store: MaskStore，不为 None 时在同一次遍历中额外计算各区域的指标
+    返回:
+        (metrics, error): 成功时 error 为 None；失败时 metrics 为 None
+    """
+    method, dataset, file, pred_path, gt_path = job
+    try:
+        masks = _scene_masks(dataset, file, gt_path, gt_store, mask_store, block_rows)
+    except Exception as e:
+        return None, f"Failed to load region masks for {gt_path}: {e}."
+    if block_rows:
+        try:
+            gt = _crop(read_pfm(gt_path, mmap=True), gt_store.crop_size)  # 只裁剪 GT，与整图模式一致
+            return compute_depth_metrics_tiled(gt, pred_path, etas, scale, block_rows=block_rows, masks=masks), None
+        except Exception as e:
+            return None, f"Failed to compute metrics for {pred_path}: {e}."
+
+    pred = read_pfm(pred_path, mmap=True)  # memmap 只读视图，不复制
+    gt = gt_store.get(dataset, file)  # 每个 GT 只读取一次，所有方法共享
+
+    # 一次计算差值，得到 MSE/MAE/RMSE 及所有 eta 下的 BadPix（以及各区域的指标）
+    try:
+        return compute_depth_metrics(gt, pred, etas, scale, masks=masks), None
+    except Exception as e:
+        return None, f"Failed to compute metrics for {pred_path}: {e}."
+
+
+def calculate_metrics(jobs, etas, gt_store, num_workers=1, results_store=None, block_rows=None, mask_store=None,
+                      scale=100, share=True, scene_records=None, trace_memory=True):
+    """
+    计算所有场景的指标
+
+    参数:
+        num_workers: 进程数，大于 1 时将场景分发到 ProcessPoolExecutor 并行计算，结果与串行模式完全一致
+        results_store: ResultsStore，不为 None 时只计算新增或文件已变化的场景，其余直接读取已保存的结果
+        block_rows: 不为 None 时按行块流式计算指标（用于超大视差图），见 evaluate_scene
+        mask_store: MaskStore，不为 None 时额外计算各区域（不连续处、平滑区域、用户掩码）的指标
+        share: 多进程时把 GT 落盘为 .npy，子进程以 memmap 共享
+        scene_records: 不为 None 时测量每个新计算的场景（耗时、读取字节数、内存峰值），记录追加到该列表
+        trace_memory: 测量场景时是否启用 tracemalloc
+    返回:
+        outputs: {job: (metrics, error)}
+    """
+    # 查询已保存的结果，只保留需要重新计算的场景
+    outputs = {}
+    # 区域配置（区域、阈值、用户掩码目录）是键的一部分，用户掩码文件的签名随 GT 签名一起校验
+    params = metric_params(etas, gt_store.crop_size, scale, None if mask_store is None else mask_store.config())
+
+    def mask_paths(dataset, file):
+        return [] if mask_store is None else list(mask_store.user_mask_paths(dataset, file).values())
+
+    if results_store is not None:
+        for job in jobs:
+            method, dataset, file, pred_path, gt_path = job
+            metrics = results_store.get(method, dataset, file, params, pred_path, gt_path, mask_paths(dataset, file))
+            if metrics is not None:
+                outputs[job] = (metrics, None)
+        print(f"{len(outputs)}/{len(jobs)} scenes loaded from {results_store.db_path}")
+    pending = [job for job in jobs if job not in outputs]
+    evaluate = partial(evaluate_scene, etas=etas, gt_store=gt_store, block_rows=block_rows, mask_store=mask_store,
+                       scale=scale)
+    if scene_records is not None:
+        evaluate = partial(profiled_item, evaluate, ("method", "dataset", "file"), trace_memory)
+
+    if num_workers > 1 and len(pending) > 1:
+        # GT 落盘为 .npy，子进程以 memmap 方式共享，避免每个进程重复解析；分块模式直接 memmap 原 PFM
+        if share and not block_rows:
+            gt_store.share({(dataset, file) for _, dataset, file, _, _ in pending})
+        if mask_store is not None:
+            # 每个 GT 的掩码在主进程中只推导一次并写入磁盘缓存，子进程直接读取
+            for dataset, file, gt_path in sorted({(dataset, file, gt_path) for _, dataset, file, _, gt_path in pending}):
+                try:
+                    _scene_masks(dataset, file, gt_path, gt_store, mask_store, block_rows)
+                except Exception as e:
+                    print(f"Failed to derive region masks for {gt_path}: {e}.")
+        chunksize = max(1, len(pending) // (num_workers * 4))
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            computed = split_records(executor.map(evaluate, pending, chunksize=chunksize), scene_records)
+    else:
+        computed = split_records(map(evaluate, pending), scene_records)
+    outputs.update(zip(pending, computed))
+
+    if results_store is not None:
+        for job in pending:
+            method, dataset, file, pred_path, gt_path = job
+            metrics, error = outputs[job]
+            if error is None:
+                results_store.put(method, dataset, file, params, pred_path, gt_path, metrics, mask_paths(dataset, file))
+        results_store.commit()
+    return outputs
+
+
+def assemble_results(methods, datasets, found, scene_outputs, etas):
+    """
+    把逐场景的结果整理成 {method: {dataset: {file: metrics, "average": ...}}}
+
+    参数:
+        found: collect_scene_jobs 返回的 {(method, dataset)}，这些组合即使没有场景结果也保留
+        scene_outputs: [(method, dataset, file, metrics, error), ...]，按该顺序打印和保存
+    """
+    results = {method: {} for method in methods}
+    for method in methods:
+        for dataset in datasets:
+            if (method, dataset) in found:
+                results[method][dataset] = {}  # 保存每个场景的指标
+
+    for method, dataset, file, metrics, error in scene_outputs:
+        if error is not None:
+            print(error)
+            continue
+        # 保存当前场景的结果
+        results[method][dataset][file] = metrics
+        print(f"{method} {dataset} {file}: MSE={metrics['mse']:.4f}, " +
+              ", ".join([f"BadPix@{eta}={metrics[badpix_key(eta)]:.2f}%" for eta in etas]))
+
+    # 计算每个数据集的平均值
+    for method_results in results.values():
+        for dataset_results in method_results.values():
+            if dataset_results:
+                dataset_results["average"] = average_metrics(list(dataset_results.values()), etas)
+    return results
+
+
+def _markdown_rows(results, methods, dataset, scenes, etas, key=lambda name: name, layout="scene", precision=2):
+    def fmt(value):
+        return f"{value:.{precision}f}" if value != "-" else "-"
+
+    def row(method, scene):
+        dataset_results = results[method][dataset]
+        head = [scene, method] if layout == "scene" else [method, scene]
+        if scene not in dataset_results:
+            return head + ["-"] * (1 + len(etas))
+        metrics = dataset_results[scene]
+        return head + [fmt(metrics.get(key("mse"), "-"))] + \
+            [fmt(metrics.get(key(badpix_key(eta)), "-")) for eta in etas]
+
+    methods = [method for method in methods if dataset in results[method]]
+    if layout == "scene":
+        return [row(method, scene) for scene in scenes for method in methods]
+    return [row(method, scene) for method in methods for scene in scenes]
+
+
+def _bootstrap_markdown(results, methods, dataset, etas, n_resamples, seed=0):
+    """按场景 bootstrap 的置信区间表和两两胜率表（Markdown 文本），共同场景不足 2 个时返回空字符串。"""
+    keys = ["mse"] + [badpix_key(eta) for eta in etas]
+    names = ["MSE"] + [f"BadPix@{eta}" for eta in etas]
+    dataset_results = {method: results[method].get(dataset, {}) for method in methods}
+    summary = bootstrap_summary(dataset_results, methods, keys, n_resamples, seed)
+    if summary is None:
+        return ""
+
+    ci_rows = [[method] + [f"{summary['mean'][i, k]:.2f} [{summary['lower'][i, k]:.2f}, {summary['upper'][i, k]:.2f}]"
+                           for k in range(len(keys))]
+               for i, method in enumerate(summary["methods"])]
+    text = (f"\n\n### Bootstrap {summary['level']:.0%} CI ({n_resamples} resamples over "
+            f"{len(summary['scenes'])} scenes)\n\n")
+    text += pd.DataFrame(ci_rows, columns=["Method"] + names).to_markdown(index=False)
+
+    # win[i, j]: 行方法优于列方法（指标更小）的重采样比例
+    for k, name in enumerate(names):
+        win_rows = [[method] + ["-" if i == j else f"{summary['win'][i, j, k]:.2f}"
+                                for j in range(len(summary["methods"]))]
+                    for i, method in enumerate(summary["methods"])]
+        text += f"\n\n### Win rate ({name}, row better than column)\n\n"
+        text += pd.DataFrame(win_rows, columns=["Method"] + summary["methods"]).to_markdown(index=False)
+    return text
+
+
+def save_results_to_markdown(results, output_path, etas, n_bootstrap=0, seed=0, layout="scene", precision=2,
+                             badpix_label="BadPix@{eta}", regions=None):
+    """
+    每个数据集保存一个 Markdown 表格；结果中含区域指标（region_key）时，每个区域再追加一个同样格式的表格
+
+    参数:
+        n_bootstrap: 大于 0 时按场景 bootstrap 重采样，追加各方法的置信区间和两两胜率
+        seed: bootstrap 随机种子
+        layout: "scene" 按场景分组（Scene, Method, ...）；"method" 按方法分组（Method, Scene, ...）
+        precision: 指标保留的小数位数
+        badpix_label: BadPix 列名格式
+        regions: 只输出这些区域的表格，None 表示结果中出现的所有区域
+    """
+    methods = list(results.keys())
+    datasets = {ds for method_results in results.values() for ds in method_results.keys()}
+    datasets = sorted(datasets)
+
+    head = ["Scene", "Method"] if layout == "scene" else ["Method", "Scene"]
+    columns = head + ["MSE"] + [badpix_label.format(eta=eta) for eta in etas]
+    for dataset in datasets:
+        scenes = set()
+        dataset_regions = set()
+
+        # 收集所有场景
+        for method in methods:
+            if dataset not in results[method]:
+                continue
+            dataset_results = results[method][dataset]
+            scenes.update(dataset_results.keys())
+            dataset_regions.update(key.split(REGION_SEP)[0] for metrics in dataset_results.values()
+                                   for key in metrics if REGION_SEP in key)
+        if regions is not None:
+            dataset_regions &= set(regions)
+
+        scenes = sorted(scenes)
+        data = _markdown_rows(results, methods, dataset, scenes, etas, layout=layout, precision=precision)
+
+        # 保存为 Markdown 文件
+        dataset_output_path = os.path.join(output_path, f"{dataset}_results.md")
+        with open(dataset_output_path, "w") as f:
+            f.write(pd.DataFrame(data, columns=columns).to_markdown(index=False))
+            for region in sorted(dataset_regions):
+                region_data = _markdown_rows(results, methods, dataset, scenes, etas,
+                                             key=lambda name: region_key(region, name), layout=layout,
+                                             precision=precision)
+                f.write(f"\n\n### Region: {region}\n\n")
+                f.write(pd.DataFrame(region_data, columns=columns).to_markdown(index=False))
+            if n_bootstrap > 0:
+                f.write(_bootstrap_markdown(results, methods, dataset, etas, n_bootstrap, seed))
+
+        print(f"Results for dataset {dataset} saved to {dataset_output_path}")
+
+
+# 将 PFM 转为 PNG
+def convert_pfm_to_png(base_dir, methods, datasets, output_dir, num_workers=1, cmap=None, compress_level=None,
+                       incremental=True, suffix="_disp.png", png=True, pyramid_dir=None, gt_dir_name="GTLF",
+                       pyramid_min_size=16, gt_crop=0):
+    """
+    num_workers: 导出进程数；cmap: None 为灰度图，否则用该 colormap 的 LUT 上色；
+    compress_level: PNG 压缩级别；incremental: 跳过比 PFM 新的 PNG；suffix: 输出文件名后缀（替换 .pfm）
+    png: False 时不导出 PNG（只写预览金字塔）
+    pyramid_dir: 不为 None 时按场景导出，同时写出每个场景的预览金字塔 <pyramid_dir>/<dataset>_<场景名>.npz，
+    包含所有方法的视差图，以及有真值（<gt_dir_name> 下的同名 PFM）时的 GT 和误差图；
+    gt_crop: GT 四周裁剪的像素数（与评估一致，预测已是裁剪后的大小）
+    """
+    scenes = {}
+    for method in methods:
+        for dataset in datasets:
+            method_dataset_dir = os.path.join(base_dir, method, dataset)
+            if not os.path.exists(method_dataset_dir):
+                continue
+            output_dataset_dir = os.path.join(output_dir, method, dataset)
+            if png:
+                os.makedirs(output_dataset_dir, exist_ok=True)
+            for file in os.listdir(method_dataset_dir):
+                if file.endswith(".pfm"):
+                    pfm_path = os.path.join(method_dataset_dir, file)
+                    png_path = os.path.join(output_dataset_dir, file.replace(".pfm", suffix)) if png else None
+                    scenes.setdefault((dataset, file), []).append((method, pfm_path, png_path))
+    if pyramid_dir is None:
+        pairs = [(pfm_path, png_path) for items in scenes.values() for _, pfm_path, png_path in items]
+        export_pngs(pairs, num_workers=num_workers, cmap=cmap, compress_level=compress_level, incremental=incremental)
+        return
+
+    jobs = []
+    for (dataset, file), items in sorted(scenes.items()):
+        gt_path = os.path.join(base_dir, gt_dir_name, dataset, file)
+        gt_path = gt_path if os.path.exists(gt_path) else None
+        pyramid_path = _pyramid_path(pyramid_dir, dataset, file)
+        png_paths = [None if png_path is None or (incremental and is_up_to_date(pfm_path, png_path)) else png_path
+                     for _, pfm_path, png_path in items]
+        inputs = [pfm_path for _, pfm_path, _ in items] + [path for path in [gt_path] if path is not None]
+        if incremental and all(path is None for path in png_paths) and _is_up_to_date(pyramid_path, inputs):
+            continue
+        jobs.append((pyramid_path, [method for method, _, _ in items], [pfm_path for _, pfm_path, _ in items],
+                     png_paths, gt_dir_name, gt_path, gt_crop, cmap, compress_level, pyramid_min_size))
+    if len(scenes) != len(jobs):
+        print(f"Skipping {len(scenes) - len(jobs)} up-to-date scenes")
+    num_workers = max(1, min(num_workers, MAX_EXPORT_WORKERS, len(jobs)))
+    if num_workers == 1:
+        list(map(export_scene, jobs))
+        return
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(export_scene, jobs))
+
+
+def load_scene_stack(base_dir, methods, dataset, file, disp_gt):
+    """
+    对比图的单场景加载阶段：每个方法的预测只读取一次，并一次性计算所有误差图
+
+    参数:
+        methods: 方法列表（不含 GT）
+        disp_gt: GT 视差图
+    返回:
+        preds: 与 methods 对应的预测视差图列表，缺失为 None
+        error_stack: (M, H, W) 误差图，M 为实际存在的方法数；没有任何方法时为 None
+        error_index: 与 methods 对应的 error_stack 下标，缺失为 None
+    """
+    preds, error_index = [], []
+    for method in methods:
+        pred_path = os.path.join(base_dir, method, dataset, file)
+        if not os.path.exists(pred_path):
+            print(f"Warning: File {pred_path} not found. Skipping...")
+            preds.append(None)
+            error_index.append(None)
+            continue
+        error_index.append(sum(p is not None for p in preds))
+        preds.append(read_pfm(pred_path))
+
+    valid = [p for p in preds if p is not None]
+    if not valid:
+        return preds, None, error_index
+    error_stack = np.stack(valid)
+    np.subtract(disp_gt, error_stack, out=error_stack)
+    np.abs(error_stack, out=error_stack)
+    return preds, error_stack, error_index
+
+
+def _comparison_inputs(base_dir, methods, dataset, file, gt_path, view_path):
+    return [gt_path, view_path] + [os.path.join(base_dir, method, dataset, file) for method in methods]
+
+
+def _is_up_to_date(output_path, inputs):
+    if not os.path.exists(output_path):
+        return False
+    mtime = os.path.getmtime(output_path)
+    return all(os.path.getmtime(path) <= mtime for path in inputs if os.path.exists(path))
+
+
+def _pyramid_path(pyramid_dir, dataset, file):
+    return os.path.join(pyramid_dir, f"{dataset}_{file.replace('.pfm', '.npz')}")
+
+
+def render_comparison_scene(scene, base_dir, methods, gt_store, renderer="matplotlib", view_suffix="_view24_fine.png",
+                            fontsize=14):
+    """
+    生成单个场景的对比图（视差图和误差图，可在子进程中执行）
+
+    参数:
+        scene: (dataset, file, output_path)
+    """
+    dataset, file, output_path = scene
+    gt_name = gt_store.gt_dir_name
+    methods_with_gt = [gt_name] + methods
+    disp_gt_path = gt_store.path(dataset, file)
+    try:
+        disp_gt = gt_store.get(dataset, file)
+    except Exception as e:
+        print(f"Error reading {disp_gt_path}: {e}")
+        return
+    view_gt_path = disp_gt_path.replace(".pfm", view_suffix)
+    try:
+        view_gt = _crop(imageio.imread(view_gt_path), gt_store.crop_size)
+    except FileNotFoundError:
+        print(f"Warning: File {view_gt_path} not found. Using dummy data for passing")
+        view_gt = np.zeros_like(disp_gt)
+
+    # 每个预测只读一次，误差图一次性算好，供全局归一化和两行子图共用
+    preds, error_stack, error_index = load_scene_stack(base_dir, methods, dataset, file, disp_gt)
+    if error_stack is None:
+        print(f"Warning: no predictions found for {dataset} {file}. Skipping...")
+        return
+    disp_maps = [disp_gt] + preds
+    error_maps = [None] + [None if idx is None else error_stack[idx] for idx in error_index]
+
+    if renderer == "lut":
+        render_comparison(disp_maps, error_maps, view_gt, methods_with_gt, output_path)
+        return
+
+    fig, axes = plt.subplots(2, len(methods_with_gt), figsize=(4 * len(methods_with_gt), 9))
+
+    # 第一行：视差图
+    for i, method in enumerate(methods_with_gt):
+        pred = disp_maps[i]
+        if pred is None:
+            continue
+        normalized_pred = (pred - np.min(pred)) / (np.max(pred) - np.min(pred))
+        axes[0, i].imshow(normalized_pred, cmap="viridis", norm=Normalize(vmin=0, vmax=1))
+        axes[0, i].text(0.5, -0.05, f"{method}", transform=axes[0, i].transAxes,
+                        ha="center", va="center", fontsize=fontsize)
+        axes[0, i].axis("off")
+
+    # 找到全局最大误差
+    global_max_error = np.max(error_stack)
+
+    # 第二行：误差图
+    for i, method in enumerate(methods_with_gt):
+        if i == 0:
+            normalized_error = view_gt  # 显示view
+        elif error_maps[i] is None:
+            continue
+        else:
+            normalized_error = error_maps[i] / global_max_error
+        axes[1, i].imshow(normalized_error, cmap="hot", norm=Normalize(vmin=0, vmax=1))
+        title = f"{method} Error" if i > 0 else "View"
+        # 在子图底部添加注释性文字
+        axes[1, i].text(0.5, -0.05, title, transform=axes[1, i].transAxes,
+                        ha="center", va="center", fontsize=fontsize)
+        axes[1, i].axis("off")
+
+    # 保存对比图
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+# 生成对比图（视差图和误差图）
+def generate_comparison_plots(base_dir, methods, datasets, output_dir, gt_store, renderer="matplotlib", files=None,
+                              pattern="LF*.pfm", scene_filter=None, num_workers=1, incremental=False,
+                              view_suffix="_view24_fine.png", fontsize=14, scene_records=None, trace_memory=True):
+    """
+    renderer: "matplotlib" 使用 plt.subplots 绘制；"lut" 使用 lut_render 直接在 NumPy 画布上拼图，速度快一个数量级
+    files: 若不为 None，只重新生成其中的 (dataset, file) 场景（监视模式下只刷新有变化的场景）
+    num_workers: 大于 1 时各场景在进程池中并行绘制
+    incremental: 跳过比 GT、视点图和所有预测都新的对比图
+    scene_records: 不为 None 时测量每个场景的绘制开销，记录追加到该列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    scene_filter = scene_filter or {}
+    scenes = []
+    for dataset in datasets:
+        gt_dir = os.path.join(base_dir, gt_store.gt_dir_name, dataset)
+        if not os.path.exists(gt_dir):
+            print(f"Error: GT dir <{gt_dir}> not found, skipping ...")
+            continue
+        for file in sorted(os.listdir(gt_dir)):
+            if not fnmatch.fnmatch(file, pattern):  # 获取gt_dir下LF*.pfm文件
+                continue
+            if dataset in scene_filter and os.path.splitext(file)[0] not in scene_filter[dataset]:
+                print(f"Skipping {file} in {dataset} controlled by scene_filter")
+                continue
+            if files is not None and (dataset, file) not in files:
+                continue
+            output_path = os.path.join(output_dir, f"{dataset}_{file.replace('.pfm', '.png')}")
+            inputs = _comparison_inputs(base_dir, methods, dataset, file, os.path.join(gt_dir, file),
+                                        os.path.join(gt_dir, file.replace(".pfm", view_suffix)))
+            if incremental and _is_up_to_date(output_path, inputs):
+                continue
+            scenes.append((dataset, file, output_path))
+
+    render = partial(render_comparison_scene, base_dir=base_dir, methods=methods, gt_store=gt_store,
+                     renderer=renderer, view_suffix=view_suffix, fontsize=fontsize)
+    if scene_records is not None:
+        render = partial(profiled_item, render, ("dataset", "file"), trace_memory)
+    if num_workers > 1 and len(scenes) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(scenes))) as executor:
+            split_records(executor.map(render, scenes), scene_records)
+    else:
+        split_records(map(render, scenes), scene_records)
+
+
+@stage("discover")
+def discover_stage(ctx, stage_cfg):
+    cfg = ctx.cfg
+    methods, datasets = get_methods_and_datasets(cfg["base_dir"], cfg["exclude_dirs"])
+    if cfg["methods"] is not None:
+        methods = [method for method in cfg["methods"] if method in methods]
+    if cfg["datasets"] is not None:
+        datasets = [ds for ds in cfg["datasets"] if ds in datasets]
+    if ctx.only_datasets is not None:
+        datasets = [ds for ds in datasets if ds in ctx.only_datasets]
+    ctx.methods, ctx.datasets = methods, datasets
+    ctx.jobs, ctx.found = collect_scene_jobs(cfg["base_dir"], methods, datasets, cfg["gt_dir"], cfg["pattern"],
+                                             cfg["scene_filter"])
+
+
+def make_mask_store(cfg, crop_size):
+    """根据 score 阶段的 regions / mask_dir 创建 MaskStore，都未指定时返回 None。"""
+    score_cfg = cfg["stages"]["score"]
+    if not score_cfg["regions"] and not score_cfg["mask_dir"]:
+        return None
+    return MaskStore(os.path.join(cfg["output_dir"], "mask_cache"), score_cfg["regions"],
+                     mask_dir=score_cfg["mask_dir"], crop_size=crop_size, edge_thresh=score_cfg["edge_thresh"],
+                     band=score_cfg["band"])
+
+
+def config_metric_params(cfg):
+    """按配置得到本次运行的结果键（metric_params），与 score 阶段写入结果存储时使用的一致。"""
+    crop_size = cfg["gt_crop"] or None
+    mask_store = make_mask_store(cfg, crop_size)
+    return metric_params(cfg["etas"], crop_size, cfg["mse_scale"], None if mask_store is None else mask_store.config())
+
+
+@stage("load")
+def load_stage(ctx, stage_cfg):
+    cfg = ctx.cfg
+    # 所有阶段共享同一份 GT，每个 GT 文件只解析一次
+    ctx.gt_store = GTStore(cfg["base_dir"], read_pfm, gt_dir_name=cfg["gt_dir"], crop_size=cfg["gt_crop"] or None)
+    ctx.mask_store = make_mask_store(cfg, ctx.gt_store.crop_size)
+    keys = sorted({(dataset, file) for _, dataset, file, _, _ in ctx.jobs})
+    if stage_cfg.get("workers", 1) > 1 and keys:
+        with ThreadPoolExecutor(max_workers=stage_cfg["workers"]) as executor:
+            list(executor.map(lambda key: ctx.gt_store.get(*key), keys))
+        print(f"Preloaded {len(keys)} GT maps")
+
+
+@stage("score")
+def score_stage(ctx, stage_cfg):
+    cfg = ctx.cfg
+    records = [] if ctx.profiler.enabled else None
+    outputs = calculate_metrics(ctx.jobs, cfg["etas"], ctx.gt_store, num_workers=stage_cfg["workers"],
+                                results_store=ctx.results_store, block_rows=stage_cfg["block_rows"],
+                                mask_store=ctx.mask_store, scale=cfg["mse_scale"],
+                                share=cfg["stages"]["load"].get("share", True), scene_records=records,
+                                trace_memory=ctx.profiler.trace_memory)
+    ctx.profiler.add_scenes("score", records)
+    ctx.results = assemble_results(ctx.methods, ctx.datasets, ctx.found,
+                                   [job[:3] + outputs[job] for job in ctx.jobs], cfg["etas"])
+
+
+def report_regions(cfg):
+    """本次运行请求的区域：score 阶段的 regions；使用用户掩码时区域名由文件名决定，返回 None（全部输出）。"""
+    score_cfg = cfg["stages"]["score"]
+    return None if score_cfg["mask_dir"] else list(score_cfg["regions"])
+
+
+@stage("report")
+def report_stage(ctx, stage_cfg):
+    save_results_to_markdown(ctx.results, ctx.cfg["output_dir"], ctx.cfg["etas"], n_bootstrap=stage_cfg["bootstrap"],
+                             seed=stage_cfg["seed"], layout=stage_cfg["layout"], precision=stage_cfg["precision"],
+                             badpix_label=stage_cfg["badpix_label"], regions=report_regions(ctx.cfg))
+
+
+@stage("visualise")
+def visualise_stage(ctx, stage_cfg):
+    cfg = ctx.cfg
+    if stage_cfg["png"] or stage_cfg["pyramid"]:
+        pyramid_dir = os.path.join(cfg["output_dir"], "pyramid") if stage_cfg["pyramid"] else None
+        convert_pfm_to_png(cfg["base_dir"], ctx.methods, ctx.datasets, os.path.join(cfg["output_dir"], "png"),
+                           num_workers=stage_cfg["workers"], cmap=stage_cfg["png_cmap"],
+                           compress_level=stage_cfg["png_compress"], incremental=stage_cfg["cache"],
+                           suffix=stage_cfg["png_suffix"], png=stage_cfg["png"], pyramid_dir=pyramid_dir,
+                           gt_dir_name=cfg["gt_dir"], pyramid_min_size=stage_cfg["pyramid_min_size"],
+                           gt_crop=cfg["gt_crop"])
+    if stage_cfg["comparison"]:
+        methods = stage_cfg["methods"] if stage_cfg["methods"] is not None else ctx.methods
+        records = [] if ctx.profiler.enabled else None
+        generate_comparison_plots(cfg["base_dir"], methods, ctx.datasets, os.path.join(cfg["output_dir"], "comparison"),
+                                  ctx.gt_store, renderer=stage_cfg["renderer"], files=ctx.only_files,
+                                  pattern=cfg["pattern"], scene_filter=cfg["scene_filter"],
+                                  num_workers=stage_cfg["workers"], incremental=stage_cfg["cache"],
+                                  view_suffix=stage_cfg["view_suffix"], fontsize=stage_cfg["fontsize"],
+                                  scene_records=records, trace_memory=ctx.profiler.trace_memory)
+        ctx.profiler.add_scenes("visualise", records)
+
+
+def load_plugins(cfg):
+    for module in cfg.get("plugins", []):
+        importlib.import_module(module)
+
+
+def run_pipeline(cfg, results_store=None, datasets=None, files=None):
+    """
+    按 cfg["pipeline"] 依次执行各阶段
+
+    参数:
+        datasets: 只处理这些数据集，None 表示全部
+        files: 只重新生成这些 (dataset, file) 的对比图，None 表示全部
+    返回:
+        ctx: BenchContext，ctx.results 为各场景的指标
+    """
+    load_plugins(cfg)
+    ctx = BenchContext(cfg, results_store, datasets, files)
+    ctx.profiler = Profiler.from_config(cfg).start()
+    try:
+        for name in cfg["pipeline"]:
+            if name not in STAGES:
+                raise ValueError(f"Unknown stage {name}, registered stages: {sorted(STAGES)}")
+            with ctx.profiler.stage(name):
+                STAGES[name](ctx, cfg["stages"].get(name, {}))
+        ctx.profiler.save(cfg["profile"]["path"] or os.path.join(cfg["output_dir"], "profile.json"))
+    finally:
+        ctx.profiler.stop()
+        ctx.close()
+    return ctx
+
+
+def open_results_store(cfg):
+    score_cfg = cfg["stages"]["score"]
+    if not score_cfg["cache"]:
+        return None
+    return ResultsStore(score_cfg["results_db"] or os.path.join(cfg["output_dir"], "results.sqlite"),
+                        use_hash=score_cfg["hash"])
+
+
+def prune_results_store(cfg, results_store):
+    """删除预测或 GT 文件已不存在的场景的结果，避免它们继续出现在 --report_only 和监视模式的报告中。"""
+    removed = 0
+    for method, dataset, scene in results_store.scenes():
+        pred_path = os.path.join(cfg["base_dir"], method, dataset, scene)
+        gt_path = os.path.join(cfg["base_dir"], cfg["gt_dir"], dataset, scene)
+        if not (os.path.exists(pred_path) and os.path.exists(gt_path)):
+            removed += results_store.delete(method, dataset, scene)
+    if removed:
+        results_store.commit()
+        print(f"Removed {removed} stored results of deleted files")
+    return removed
+
+
+def _mask_scenes(cfg, dataset, mask_name):
+    """用户掩码 <场景名>_<区域名>.png 对应的场景文件。"""
+    gt_dir = os.path.join(cfg["base_dir"], cfg["gt_dir"], dataset)
+    if not os.path.isdir(gt_dir):
+        return []
+    return [file for file in os.listdir(gt_dir) if fnmatch.fnmatch(file, cfg["pattern"])
+            and mask_name.startswith(os.path.splitext(file)[0] + "_")]
+
+
+def refresh_changed(cfg, results_store, paths):
+    """
+    监视模式的回调：根据变化的 PFM 路径找出受影响的数据集和场景，只重新评估这些文件
+
+    <base_dir>/<method>/<dataset>/LF*.pfm 变化时刷新该场景；GT 变化时该场景的所有方法都会重新评估
+    （签名不一致，结果存储自动视为过期）。用户掩码 <mask_dir>/<dataset>/<场景名>_<区域名>.png
+    的签名也是结果键的一部分，掩码变化时重新评估对应场景。文件被删除时同时删除其已保存的结果。
+    """
+    mask_dir = cfg["stages"]["score"]["mask_dir"]
+    datasets, files = set(), set()
+    for path in paths:
+        if results_store is not None:
+            results_store.forget(path)
+        if mask_dir and not os.path.relpath(path, mask_dir).startswith(os.pardir):
+            parts = os.path.relpath(path, mask_dir).split(os.sep)
+            if len(parts) == 2:
+                dataset = parts[0]
+                datasets.add(dataset)
+                files.update((dataset, file) for file in _mask_scenes(cfg, dataset, os.path.splitext(parts[1])[0]))
+            continue
+        parts = os.path.relpath(path, cfg["base_dir"]).split(os.sep)
+        if len(parts) != 3:
+            continue
+        _, dataset, file = parts
+        datasets.add(dataset)
+        files.add((dataset, file))
+    if results_store is not None and any(not os.path.exists(path) for path in paths):
+        prune_results_store(cfg, results_store)
+    if not datasets:
+        return
+    start = time.time()
+    print(f"{len(paths)} changed file(s) in {sorted(datasets)}, refreshing ...")
+    run_pipeline(cfg, results_store, datasets=datasets, files=files)
+    print(f"Refreshed in {time.time() - start:.1f}s")
+
+
+def _work_queue(cfg):
+    dist_cfg = cfg["dist"]
+    return WorkQueue(dist_cfg["work_dir"] or os.path.join(cfg["output_dir"], "work_queue"),
+                     stale_after=dist_cfg["stale_after"], heartbeat=dist_cfg["heartbeat"])
+
+
+def enqueue_benchmark(cfg, queue):
+    """
+    分布式模式第一步：枚举所有场景，写入共享工作目录
+
+    任务描述只保存 (方法, 数据集, 文件名)、指标参数（metric_params，含 MSE 缩放和区域配置）和文件签名
+    （含用户掩码），不保存绝对路径，各机器用自己的 base_dir 定位文件；文件或参数变化后对应的是新任务，
+    旧结果分片不会被误用。
+    """
+    ctx = BenchContext(cfg)
+    discover_stage(ctx, cfg["stages"]["discover"])
+    use_hash = cfg["stages"]["score"]["hash"]
+    params = config_metric_params(cfg)
+    mask_store = make_mask_store(cfg, cfg["gt_crop"] or None)
+    specs = []
+    for method, dataset, file, pred_path, gt_path in ctx.jobs:
+        spec = {"method": method, "dataset": dataset, "file": file, "params": params,
+                "pred_sig": file_signature(pred_path, use_hash), "gt_sig": file_signature(gt_path, use_hash)}
+        if mask_store is not None and mask_store.mask_dir:
+            spec["mask_sigs"] = {region: file_signature(path, use_hash)
+                                 for region, path in mask_store.user_mask_paths(dataset, file).items()}
+        specs.append(spec)
+    job_ids = queue.enqueue(specs)
+    queue.write_manifest({"methods": ctx.methods, "datasets": ctx.datasets, "found": sorted(ctx.found),
+                          "etas": cfg["etas"], "params": params, "jobs": job_ids})
+    status = queue.status()
+    print(f"Enqueued {status['total']} scene jobs in {queue.work_dir} ({status['done']} already done)")
+
+
+def run_queue_worker(cfg):
+    """
+    分布式模式 worker：不断认领任务并写入结果分片，直到所有任务完成（可在任意多台机器上同时运行）
+
+    worker 的指标参数（etas、裁剪、MSE 缩放、区域配置）须与 enqueue 时一致，否则拒绝启动
+    """
+    queue = _work_queue(cfg)
+    params, queued = config_metric_params(cfg), queue.read_manifest()["params"]
+    if params != queued:
+        raise ValueError(f"Worker metric params {params} do not match the queue {queued}, "
+                         f"use the same config as enqueue")
+    ctx = BenchContext(cfg)
+    load_stage(ctx, {})
+    block_rows = cfg["stages"]["score"]["block_rows"]
+
+    def handle(spec):
+        method, dataset, file = spec["method"], spec["dataset"], spec["file"]
+        job = (method, dataset, file, os.path.join(cfg["base_dir"], method, dataset, file),
+               ctx.gt_store.path(dataset, file))
+        metrics, error = evaluate_scene(job, spec["params"]["etas"], ctx.gt_store, block_rows, ctx.mask_store,
+                                        spec["params"]["scale"])
+        if error is not None:
+            return {"error": error}
+        return {"metrics": {k: float(v) for k, v in metrics.items() if k != "badpix_curve"}}
+
+    start = time.time()
+    try:
+        count = queue.run_worker(handle)
+    finally:
+        ctx.close()
+    print(f"[{queue.worker_id}] finished {count} jobs in {time.time() - start:.1f}s")
+
+
+def reduce_queue_results(queue):
+    """合并结果分片，得到与 score 阶段相同结构的结果字典。"""
+    manifest = queue.read_manifest()
+    shards = {job_id: (spec, result) for job_id, spec, result in queue.results()}
+    missing = [job_id for job_id in manifest["jobs"] if job_id not in shards]
+    if missing:
+        print(f"Warning: {len(missing)}/{len(manifest['jobs'])} jobs have no result yet, reporting partial results")
+    scene_outputs = [(spec["method"], spec["dataset"], spec["file"], result.get("metrics"), result.get("error"))
+                     for spec, result in (shards[job_id] for job_id in manifest["jobs"] if job_id in shards)]
+    found = {tuple(pair) for pair in manifest["found"]}
+    return assemble_results(manifest["methods"], manifest["datasets"], found, scene_outputs, manifest["etas"])
+
+
+def run_distributed(cfg, mode, num_workers=1):
+    """
+    分布式评估（共享文件系统）
+
+    enqueue: 枚举任务；worker: 执行任务；reduce: 合并分片并生成 Markdown 报告；
+    local: 在本机依次执行 enqueue、启动 num_workers 个 worker 进程、reduce（用于单机测试分布式流程）
+    """
+    queue = _work_queue(cfg)
+    if mode in ("enqueue", "local"):
+        enqueue_benchmark(cfg, queue)
+    if mode == "worker":
+        run_queue_worker(cfg)
+    elif mode == "local":
+        workers = [multiprocessing.Process(target=run_queue_worker, args=(cfg,)) for _ in range(max(1, num_workers))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    if mode in ("reduce", "local"):
+        ctx = BenchContext(cfg)
+        ctx.results = reduce_queue_results(queue)
+        report_stage(ctx, cfg["stages"]["report"])
+
+
+def _regions(text):
+    return [region for region in text.split(",") if region]
+
+
+# 命令行快捷参数 -> 配置路径；值为 None（未指定）时不覆盖预设和配置文件
+SHORTCUTS = [
+    ("--base_dir", ["base_dir"], {"type": str}),
+    ("--output_dir", ["output_dir"], {"type": str}),
+    ("--workers", ["stages.score.workers", "stages.visualise.workers"], {"type": int,
+     "help": "计算指标、导出 PNG 和绘制对比图的进程数，1 表示串行"}),
+    ("--results_db", ["stages.score.results_db"], {"type": str,
+     "help": "增量结果存储 (SQLite)，默认 <output_dir>/results.sqlite"}),
+    ("--no_cache", ["stages.score.cache"], {"action": "store_const", "const": False,
+     "help": "不读取/写入结果存储，全部重新计算"}),
+    ("--hash", ["stages.score.hash"], {"action": "store_const", "const": True,
+     "help": "用文件内容哈希而非大小+mtime 判断文件是否变化"}),
+    ("--renderer", ["stages.visualise.renderer"], {"type": str, "choices": ["matplotlib", "lut"],
+     "help": "对比图渲染方式，lut 不经过 matplotlib 绘图，速度更快"}),
+    ("--png_cmap", ["stages.visualise.png_cmap"], {"type": str, "help": "导出 PNG 时使用的 colormap，默认灰度"}),
+    ("--png_compress", ["stages.visualise.png_compress"], {"type": int, "help": "PNG 压缩级别 0-9"}),
+    ("--pyramid", ["stages.visualise.pyramid"], {"action": "store_const", "const": True,
+     "help": "导出 PNG 时为每个场景写出所有方法的视差图和误差图的多分辨率预览"
+             "（<output_dir>/pyramid/<dataset>_<场景名>.npz）"}),
+    ("--block_rows", ["stages.score.block_rows"], {"type": int,
+     "help": "按行块流式计算指标（每块行数），用于超大视差图；默认整图计算"}),
+    ("--regions", ["stages.score.regions"], {"type": _regions,
+     "help": "额外评估的区域，逗号分隔，可选 edges,disc_band,smooth；默认不评估区域指标"}),
+    ("--mask_dir", ["stages.score.mask_dir"], {"type": str,
+     "help": "用户掩码目录，<mask_dir>/<dataset>/<场景名>_<区域名>.png"}),
+    ("--bootstrap", ["stages.report.bootstrap"], {"type": int,
+     "help": "按场景 bootstrap 的重采样次数，用于置信区间和两两胜率；0 表示不计算"}),
+    ("--edge_thresh", ["stages.score.edge_thresh"], {"type": float, "help": "视差不连续阈值"}),
+    ("--band", ["stages.score.band"], {"type": int, "help": "不连续边界带半宽（像素）"}),
+    ("--watch_interval", ["watch.interval"], {"type": float, "help": "监视检查间隔（秒）"}),
+    ("--debounce", ["watch.debounce"], {"type": float, "help": "最后一次文件变化后等待的静默时间（秒）"}),
+    ("--poll", ["watch.poll"], {"action": "store_const", "const": True,
+     "help": "监视时强制使用轮询（不使用 watchdog/inotify）"}),
+    ("--work_dir", ["dist.work_dir"], {"type": str, "help": "分布式模式的共享工作目录，默认 <output_dir>/work_queue"}),
+    ("--stale_after", ["dist.stale_after"], {"type": float,
+     "help": "任务锁超过该秒数没有心跳时视为 worker 失联，由其他 worker 回收"}),
+    ("--heartbeat", ["dist.heartbeat"], {"type": float, "help": "worker 心跳间隔（秒）"}),
+    ("--profile", ["profile.enabled"], {"action": "store_const", "const": True,
+     "help": "记录各阶段和各场景的耗时、CPU 时间、读取字节数和内存峰值，保存到 <output_dir>/profile.json"}),
+    ("--cprofile", ["profile.enabled", "profile.cprofile"], {"action": "store_const", "const": True,
+     "help": "在 --profile 的基础上保存主进程的 cProfile 数据到 <output_dir>/profile.prof"}),
+]
+
+
+def _parse_set(text):
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text}")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        return key, value  # 未加引号的字符串
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="光场重建深度图评估引擎 (discover -> load -> score -> report -> visualise)")
+    parser.add_argument("--preset", type=str, default="v3", choices=sorted(PRESETS),
+                        help="v1: evaluate_depth.py；v2: GT 为真值；v3: GTLF 估计的视差为真值")
+    parser.add_argument("--config", type=str, default=None, help="JSON 配置文件，覆盖预设中的同名项")
+    parser.add_argument("--set", type=_parse_set, action="append", default=[], metavar="KEY=VALUE",
+                        help="覆盖单个配置项，如 --set stages.score.workers=4（值按 JSON 解析）")
+    parser.add_argument("--dump_config", action="store_true", help="打印合并后的配置并退出")
+    parser.add_argument("--report_only", action="store_true", help="只根据结果存储重新生成 Markdown 报告")
+    parser.add_argument("--watch", action="store_true",
+                        help="完成一次完整评估后持续监视 base_dir，只评估新增或修改的 PFM 并刷新对应的报告和对比图")
+    parser.add_argument("--dist", type=str, default=None, choices=["enqueue", "worker", "reduce", "local"],
+                        help="分布式评估（共享文件系统）：enqueue 枚举任务，worker 认领并执行，reduce 合并生成报告；"
+                             "local 在本机用 --workers 个进程跑完整流程")
+    for flag, _, kwargs in SHORTCUTS:
+        parser.add_argument(flag, default=None, **kwargs)
+    return parser.parse_args(argv)
+
+
+def build_config(args):
+    overrides = []
+    for flag, paths, _ in SHORTCUTS:
+        value = getattr(args, flag.lstrip("-"))
+        if value is not None:
+            overrides.extend((path, value) for path in paths)
+    return load_config(args.preset, args.config, overrides + args.set)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cfg = build_config(args)
+    if args.dump_config:
+        print(json.dumps(cfg, indent=2, ensure_ascii=False))
+        return
+    os.makedirs(cfg["output_dir"], exist_ok=True)
+    if args.dist:
+        run_distributed(cfg, args.dist, num_workers=cfg["stages"]["score"]["workers"])
+        return
+
+    results_store = open_results_store(cfg)
+    if args.report_only:
+        if results_store is None:
+            raise ValueError("--report_only requires the results store (remove --no_cache)")
+        base_dir = cfg["base_dir"]
+        methods = get_methods_and_datasets(base_dir, cfg["exclude_dirs"])[0] if os.path.isdir(base_dir) else None
+        ctx = BenchContext(cfg)
+        if methods is not None:  # 数据目录存在时先清理已删除文件的结果
+            prune_results_store(cfg, results_store)
+        ctx.results = results_store.load_results(config_metric_params(cfg), methods=methods)
+        report_stage(ctx, cfg["stages"]["report"])
+        results_store.close()
+        return
+
+    run_pipeline(cfg, results_store)
+    if args.watch:
+        watch_cfg = cfg["watch"]
+        mask_dir = cfg["stages"]["score"]["mask_dir"]
+        watch(cfg["base_dir"], partial(refresh_changed, cfg, results_store), pattern=cfg["pattern"],
+              extra_roots=[(mask_dir, "*.png")] if mask_dir else [],
+              interval=watch_cfg["interval"], debounce=watch_cfg["debounce"], poll=watch_cfg["poll"])
+    if results_store is not None:
+        results_store.close()
+    print("Processing complete.")
+
+
+if __name__ == "__main__":
+    # 以 lfbench 模块运行，插件 import lfbench 时注册到同一个 STAGES（而不是 __main__ 的副本）
+    import lfbench
+    lfbench.main()
@@ -0,0 +1,150 @@
+"""
+不依赖 matplotlib 绘图流程的对比图渲染器
+
+generate_comparison_plots 的大部分时间花在 plt.subplots / imshow / tight_layout / savefig 上。
+这里用预先计算好的 256 项颜色查找表 (LUT) 给视差图和误差图上色，把各个子图和下方的文字条
+直接拼到一张 NumPy 画布上，最后只编码一次 PNG。布局与原来的 2 x N 网格一致：
+第一行为 GT 及各方法的视差图，第二行为中心视点及各方法的误差图，文字位于图像下方。
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import imageio.v2 as imageio
+
+LUT_SIZE = 256
+BACKGROUND = 255  # 白色背景，与 matplotlib 默认画布一致
+
+
+@lru_cache(maxsize=None)
+def get_lut(cmap="viridis"):
+    """
+    返回 (256, 3) uint8 颜色查找表，每种 colormap 只构建一次
+
+    从 matplotlib 的 colormap 定义采样一次（只用到颜色表，不涉及绘图），与 imshow 使用的颜色完全一致。
+    """
+    from matplotlib import colormaps
+    # bytes=True 与 imshow 写入图像时的 uint8 转换相同
+    return colormaps[cmap](np.linspace(0, 1, LUT_SIZE), bytes=True)[:, :3].copy()
+
+
+def apply_lut(values, cmap="viridis", vmin=0.0, vmax=1.0):
+    """
+    用 LUT 给二维数组上色，等价于 imshow(values, cmap=cmap, norm=Normalize(vmin, vmax))
+
+    参数:
+        values: 二维数组
+        cmap: colormap 名称
+        vmin, vmax: 归一化范围，超出范围的值截断到两端颜色
+    返回:
+        rgb: (H, W, 3) uint8，NaN 像素为白色背景
+    """
+    values = np.asarray(values, dtype=np.float32)
+    scale = LUT_SIZE / (vmax - vmin) if vmax > vmin else 0.0
+    idx = (values - vmin) * scale
+    nan_mask = np.isnan(idx)
+    np.nan_to_num(idx, copy=False, nan=0.0)
+    np.clip(idx, 0, LUT_SIZE - 1, out=idx)
+    rgb = get_lut(cmap)[idx.astype(np.uint8)]
+    if nan_mask.any():
+        rgb[nan_mask] = BACKGROUND
+    return rgb
+
+
+def normalize_min_max(data):
+    """(data - min) / (max - min)，与原先第一行视差图的归一化方式相同。"""
+    data = np.asarray(data, dtype=np.float32)
+    d_min, d_max = np.nanmin(data), np.nanmax(data)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (data - d_min) / (d_max - d_min)
+
+
+def to_rgb_tile(image, cmap="hot"):
+    """将视点图像转换为 RGB uint8：彩色图直接使用（去掉 alpha），单通道图按 [0, 1] 用 cmap 上色。"""
+    image = np.asarray(image)
+    if image.ndim == 3:
+        image = image[..., :3]
+        if image.dtype != np.uint8:
+            image = np.clip(image * 255 if image.max() <= 1 else image, 0, 255).astype(np.uint8)
+        return image
+    return apply_lut(image, cmap, 0, 1)
+
+
+def _draw_label(canvas, text, x0, y0, width, height, font_scale):
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    thickness = max(1, int(round(font_scale * 1.5)))
+    (text_w, text_h), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    if text_w > width:
+        # 文字比子图宽时缩小字体，避免与相邻子图的文字重叠
+        font_scale *= width / text_w
+        thickness = max(1, int(round(font_scale * 1.5)))
+        (text_w, text_h), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    org = (x0 + (width - text_w) // 2, y0 + (height + text_h) // 2)
+    cv2.putText(canvas, text, org, font, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+
+
+def render_grid(tiles, labels, gap=16, label_height=None, font_scale=None):
+    """
+    将子图拼接成网格画布，每个子图下方留出文字条
+
+    参数:
+        tiles: 二维列表 tiles[row][col]，元素为 (H, W, 3) uint8 或 None（留白）
+        labels: 与 tiles 同形状的文字列表
+        gap: 子图之间的间距（像素）
+        label_height: 文字条高度，默认按图像高度自适应
+        font_scale: 字体大小，默认按文字条高度自适应
+    返回:
+        canvas: (H_total, W_total, 3) uint8
+    """
+    shapes = [tile.shape[:2] for row in tiles for tile in row if tile is not None]
+    if not shapes:
+        raise ValueError("No tiles to render")
+    cell_h = max(h for h, _ in shapes)
+    cell_w = max(w for _, w in shapes)
+    if label_height is None:
+        label_height = max(24, cell_h // 10)
+    if font_scale is None:
+        font_scale = label_height / 40
+
+    n_rows, n_cols = len(tiles), max(len(row) for row in tiles)
+    row_h = cell_h + label_height
+    canvas = np.full((n_rows * row_h + (n_rows + 1) * gap, n_cols * cell_w + (n_cols + 1) * gap, 3),
+                     BACKGROUND, dtype=np.uint8)
+    for r, row in enumerate(tiles):
+        y0 = gap + r * (row_h + gap)
+        for c, tile in enumerate(row):
+            if tile is None:
+                continue
+            x0 = gap + c * (cell_w + gap)
+            if tile.shape[:2] != (cell_h, cell_w):
+                tile = cv2.resize(tile, (cell_w, cell_h), interpolation=cv2.INTER_NEAREST)
+            canvas[y0:y0 + cell_h, x0:x0 + cell_w] = tile
+            if labels[r][c]:
+                _draw_label(canvas, labels[r][c], x0, y0 + cell_h, cell_w, label_height, font_scale)
+    return canvas
+
+
+def render_comparison(disp_maps, error_maps, view, names, output_path, view_label="View"):
+    """
+    渲染视差/误差对比图并保存为 PNG（只编码一次）
+
+    参数:
+        disp_maps: 与 names 对应的视差图列表（第一个为 GT），缺失的方法为 None
+        error_maps: 与 names 对应的误差图列表（第一个忽略），缺失为 None
+        view: 中心视点图像，显示在第二行第一列
+        names: 列名（方法名），第一个为 GT 目录名
+        output_path: 输出 PNG 路径
+    """
+    valid_errors = [e for e in error_maps[1:] if e is not None]
+    global_max_error = max(float(np.nanmax(e)) for e in valid_errors) if valid_errors else 1.0
+
+    top_row = [None if d is None else apply_lut(normalize_min_max(d), "viridis") for d in disp_maps]
+    bottom_row = [to_rgb_tile(view)] + [None if e is None else apply_lut(e, "hot", 0, global_max_error)
+                                        for e in error_maps[1:]]
+    top_labels = [name if d is not None else "" for name, d in zip(names, disp_maps)]
+    bottom_labels = [view_label] + [f"{name} Error" if e is not None else ""
+                                    for name, e in zip(names[1:], error_maps[1:])]
+
+    canvas = render_grid([top_row, bottom_row], [top_labels, bottom_labels])
+    imageio.imwrite(output_path, canvas)
+    return canvas
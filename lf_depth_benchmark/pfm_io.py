@@ -0,0 +1,188 @@
+"""
+PFM 读写模块
+PFM format definition: http://netpbm.sourceforge.net/doc/pfm.html
+
+- read_pfm_header: 只解析文件头，返回尺寸、通道数、缩放因子和数据偏移
+- open_pfm: 基于 np.memmap 的惰性读取，scale 为 ±1 时返回上下翻转的只读视图，不复制数据
+- read_pfm_rows / read_pfm_tile: 只读取指定行范围或区域
+- read_pfm: 与原先各脚本中的 read_pfm 兼容，可选 mmap=True
+- write_pfm: 逐行写出，不做整图 flatten/flipud 复制
+"""
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+PFMHeader = namedtuple("PFMHeader", ["width", "height", "channels", "scale", "dtype", "offset"])
+
+
+def _get_next_line(f):
+    next_line = f.readline().decode('utf-8').rstrip()
+    # ignore comments
+    while next_line.startswith('#'):
+        next_line = f.readline().decode('utf-8').rstrip()
+    return next_line
+
+
+def read_pfm_header(fpath, expected_identifier="Pf"):
+    """
+    只解析 PFM 文件头
+
+    参数:
+        fpath: PFM 文件路径
+        expected_identifier: "Pf"（单通道）或 "PF"（三通道）；为 None 时两者均可
+    返回:
+        PFMHeader(width, height, channels, scale, dtype, offset)，
+        scale 为绝对值，dtype 带字节序（如 "<f4"），offset 为数据起始字节
+    """
+    with open(fpath, 'rb') as f:
+        identifier = _get_next_line(f)
+        if identifier not in ("Pf", "PF") or (expected_identifier is not None and identifier != expected_identifier):
+            raise Exception('Unknown identifier. Expected: "%s", got: "%s".' % (expected_identifier, identifier))
+        channels = 3 if identifier == "PF" else 1
+
+        line_dimensions = _get_next_line(f)
+        try:
+            dimensions = line_dimensions.split()
+            width = int(dimensions[0].strip())
+            height = int(dimensions[1].strip())
+        except (IndexError, ValueError):
+            raise Exception('Could not parse dimensions: "%s". '
+                            'Expected "width height", e.g. "512 512".' % line_dimensions)
+
+        line_scale = _get_next_line(f)
+        try:
+            scale = float(line_scale)
+        except ValueError:
+            scale = 0
+        if scale == 0:
+            raise Exception('Could not parse max value / endianess information: "%s". '
+                            'Should be a non-zero number.' % line_scale)
+        endianness = "<" if scale < 0 else ">"
+        return PFMHeader(width, height, channels, abs(scale), np.dtype("%sf4" % endianness), f.tell())
+
+
+def _shape(header):
+    if header.channels == 1:
+        return header.height, header.width
+    return header.height, header.width, header.channels
+
+
+def _memmap(fpath, header):
+    try:
+        return np.memmap(fpath, dtype=header.dtype, mode="r", offset=header.offset, shape=_shape(header))
+    except ValueError:
+        raise Exception('Invalid binary values. Could not create %dx%d array from input.'
+                        % (header.height, header.width))
+
+
+def open_pfm(fpath, expected_identifier="Pf"):
+    """
+    以 memmap 方式惰性打开 PFM
+
+    文件中的行是自下而上存储的，这里返回 [::-1] 翻转视图；scale 为 ±1 时不复制任何数据，
+    只有真正访问的页才会被读入内存。scale 不为 ±1 时需要乘以缩放因子，只能返回新数组。
+
+    返回:
+        data: (H, W) 或 (H, W, 3) 的只读数组
+    """
+    header = read_pfm_header(fpath, expected_identifier)
+    data = _memmap(fpath, header)[::-1]
+    if header.scale != 1:
+        with np.errstate(invalid="ignore"):
+            data = data * np.float32(header.scale)
+    return data
+
+
+def read_pfm_rows(fpath, row_start, row_end, expected_identifier="Pf"):
+    """
+    读取图像坐标下 [row_start, row_end) 行（自上而下计数），只触及对应的文件区域
+
+    返回:
+        rows: 新分配的数组，形状 (row_end - row_start, W[, 3])
+    """
+    return read_pfm_tile(fpath, row_start, 0, row_end - row_start, None, expected_identifier)
+
+
+def read_pfm_tile(fpath, y, x, h, w, expected_identifier="Pf"):
+    """
+    读取图像坐标下左上角为 (y, x)、大小为 h x w 的区域；w 为 None 表示到行尾
+
+    区域超出图像的部分被裁掉（与 numpy 切片一致），与图像没有交集时返回空数组；h、w 为负时报错。
+
+    返回:
+        tile: 新分配的数组（已乘以缩放因子），形状为区域与图像的交集
+    """
+    if h < 0 or (w is not None and w < 0):
+        raise ValueError(f"Tile size must be non-negative, got h={h}, w={w}")
+    header = read_pfm_header(fpath, expected_identifier)
+    mm = _memmap(fpath, header)
+    height, width = header.height, header.width
+    y0, y1 = min(height, max(0, y)), min(height, max(0, y + h))
+    x0 = min(width, max(0, x))
+    x1 = width if w is None else min(width, max(0, x + w))
+    y1, x1 = max(y0, y1), max(x0, x1)
+    # 图像第 r 行对应文件第 height - 1 - r 行
+    tile = np.array(mm[height - y1:height - y0, x0:x1][::-1])
+    if header.scale != 1:
+        with np.errstate(invalid="ignore"):
+            tile *= np.float32(header.scale)
+    return tile
+
+
+def read_pfm(fpath, expected_identifier="Pf", mmap=False):
+    """
+    读取 PFM 文件
+
+    参数:
+        fpath: PFM 文件路径
+        expected_identifier: 文件标识，默认 "Pf"
+        mmap: True 时等价于 open_pfm（惰性只读视图），False 时一次性读入内存
+    返回:
+        data: 视差图，float32
+    """
+    if mmap:
+        return open_pfm(fpath, expected_identifier)
+
+    header = read_pfm_header(fpath, expected_identifier)
+    with open(fpath, 'rb') as f:
+        f.seek(header.offset)
+        try:
+            data = np.fromfile(f, header.dtype, count=header.width * header.height * header.channels)
+            data = np.reshape(data, _shape(header))[::-1]
+        except ValueError:
+            raise Exception('Invalid binary values. Could not create %dx%d array from input.'
+                            % (header.height, header.width))
+    if header.scale != 1:
+        with np.errstate(invalid="ignore"):
+            data *= np.float32(header.scale)
+    return data
+
+
+def write_pfm(data, fpath, scale=1, file_identifier=b'Pf', dtype="float32"):
+    """
+    写出 PFM 文件，按自下而上的顺序逐行写入，不生成整图的临时副本
+
+    参数:
+        data: (H, W) 或 (H, W, 3) 数组
+        fpath: 输出路径
+        scale: 缩放因子（写入文件头，符号由字节序决定）
+        file_identifier: b'Pf' 单通道 / b'PF' 三通道
+        dtype: 写出的数据类型
+    """
+    data = np.asarray(data)
+    height, width = data.shape[:2]
+    out_dtype = np.dtype(dtype)
+    endianess = out_dtype.byteorder
+
+    if endianess == '<' or (endianess in '=|' and sys.byteorder == 'little'):
+        scale = -abs(scale)
+
+    with open(fpath, 'wb') as file:
+        file.write(file_identifier)
+        file.write(('\n%d %d\n' % (width, height)).encode())
+        file.write(('%d\n' % scale).encode())
+
+        for row in data[::-1]:
+            # dtype 与内存布局都匹配时 asarray 不复制，直接写出底层缓冲区
+            file.write(np.ascontiguousarray(row, dtype=out_dtype).data)
@@ -0,0 +1,107 @@
+"""
+并行 PFM -> PNG 导出
+
+- 有界进程池：PNG 编码是主要开销，按 CPU 核数并行
+- 按行块一次遍历同时求 min/max（块在缓存中，min 和 max 共用一次内存读取）
+- 可选用 colormap LUT 上色、指定 PNG 压缩级别
+- 增量导出：输出文件比输入新时跳过
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import imageio.v2 as imageio
+
+from pfm_io import read_pfm
+from lut_render import get_lut
+
+# 默认进程数上限，避免在大机器上同时打开过多文件/占用过多内存
+MAX_EXPORT_WORKERS = 16
+
+
+def fused_min_max(data, block_rows=256):
+    """
+    按行块遍历一次数组，同时得到最小值和最大值（忽略 NaN）
+
+    参数:
+        data: 数组（可以是 memmap）
+        block_rows: 每块的行数
+    返回:
+        (d_min, d_max): 全为 NaN 时返回 (nan, nan)
+    """
+    d_min, d_max = np.inf, -np.inf
+    for start in range(0, data.shape[0], block_rows):
+        block = np.asarray(data[start:start + block_rows])
+        d_min = np.fmin(d_min, np.fmin.reduce(block, axis=None))
+        d_max = np.fmax(d_max, np.fmax.reduce(block, axis=None))
+    if d_min > d_max:
+        return np.nan, np.nan
+    return float(d_min), float(d_max)
+
+
+def normalize_to_uint8(data, d_min, d_max):
+    """(data - min) / (max - min) * 255 后截断为 uint8，与原 convert_pfm_to_png 一致；NaN 写为 0。"""
+    out = np.subtract(data, np.float32(d_min), dtype=np.float32)
+    if d_max > d_min:
+        out /= np.float32(d_max - d_min)
+    out *= np.float32(255)
+    np.nan_to_num(out, copy=False, nan=0.0)
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def is_up_to_date(src_path, dst_path):
+    """输出存在且修改时间不早于输入时认为无需重新导出。"""
+    return os.path.exists(dst_path) and os.path.getmtime(dst_path) >= os.path.getmtime(src_path)
+
+
+def export_depth_png(pfm_path, png_path, cmap=None, compress_level=None):
+    """
+    导出单个视差图
+
+    参数:
+        pfm_path: 输入 PFM
+        png_path: 输出 PNG
+        cmap: None 输出灰度图；否则为 colormap 名称（如 "viridis"），通过 LUT 上色
+        compress_level: PNG 压缩级别 0-9，None 使用默认值
+    """
+    return write_depth_png(read_pfm(pfm_path, mmap=True), png_path, cmap, compress_level)
+
+
+def write_depth_png(depth_map, png_path, cmap=None, compress_level=None):
+    """把已读取的视差图按 export_depth_png 的规则归一化、上色并写出。"""
+    d_min, d_max = fused_min_max(depth_map)
+    image = normalize_to_uint8(depth_map, d_min, d_max)
+    if cmap is not None:
+        image = get_lut(cmap)[image]
+    kwargs = {} if compress_level is None else {"compress_level": compress_level}
+    imageio.imwrite(png_path, image, **kwargs)
+    return png_path
+
+
+def _export_job(job):
+    pfm_path, png_path, cmap, compress_level = job
+    return export_depth_png(pfm_path, png_path, cmap, compress_level)
+
+
+def export_pngs(pairs, num_workers=1, cmap=None, compress_level=None, incremental=True):
+    """
+    批量导出
+
+    参数:
+        pairs: [(pfm_path, png_path), ...]
+        num_workers: 进程数，1 表示串行；实际不超过 MAX_EXPORT_WORKERS
+        incremental: True 时跳过比输入新的输出
+    返回:
+        exported: 实际导出的 PNG 路径列表
+    """
+    jobs = [(pfm_path, png_path, cmap, compress_level) for pfm_path, png_path in pairs
+            if not (incremental and is_up_to_date(pfm_path, png_path))]
+    if len(pairs) != len(jobs):
+        print(f"Skipping {len(pairs) - len(jobs)} up-to-date PNGs")
+    num_workers = max(1, min(num_workers, MAX_EXPORT_WORKERS, len(jobs)))
+    if num_workers == 1:
+        return [_export_job(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (num_workers * 4))
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(_export_job, jobs, chunksize=chunksize))
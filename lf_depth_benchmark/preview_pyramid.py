@@ -0,0 +1,126 @@
+"""
+视差图 / 误差图的多分辨率预览金字塔
+
+每个场景写一个 npz（<pyramid_dir>/<dataset>_<场景名>.npz），每个数组是一个独立的 zip 成员，
+读取时只解压用到的那一层，看板、快速浏览工具可以在毫秒级读取小尺寸预览，而不必打开全分辨率 PNG 或对比图。
+金字塔在导出 PNG 时生成（export_scene），与 PNG 共用同一次读取，每个导出的视差图都有对应的预览。
+
+键名:
+    {name}/{kind}/L{k}   第 k 层（k >= 1，边长为原图的 1/2^k），float32；kind 为 "disp" 或 "error"
+    {name}/{kind}/range  原图的 [min, max]（忽略 NaN），用于统一上色
+    shape                原图的 (H, W)
+name 为方法名（GT 的 name 为真值目录名，只有 disp）。
+
+每层由上一层 2x2 块均值得到（整个方法堆叠一次 reshape + mean），等价于对原图做 2^k x 2^k 块均值；
+边长为奇数时丢弃最后一行/列。
+"""
+import os
+
+import numpy as np
+
+from pfm_io import read_pfm
+from png_export import fused_min_max, write_depth_png
+
+
+def block_mean_pyramid(stack, min_size=16, max_levels=None):
+    """
+    参数:
+        stack: (H, W) 或 (N, H, W) 数组
+        min_size: 某层的短边小于该值时停止
+        max_levels: 最多生成的层数，None 表示不限
+    返回:
+        [L1, L2, ...]，每层形状为 (..., H // 2^k, W // 2^k)，float32
+    """
+    levels = []
+    level = np.asarray(stack, dtype=np.float32)
+    while max_levels is None or len(levels) < max_levels:
+        h, w = level.shape[-2] // 2, level.shape[-1] // 2
+        if min(h, w) < min_size:
+            break
+        blocks = level[..., :2 * h, :2 * w].reshape(level.shape[:-2] + (h, 2, w, 2))
+        level = blocks.mean(axis=(-3, -1), dtype=np.float32)
+        levels.append(level)
+    return levels
+
+
+def _add_maps(arrays, names, kind, maps, min_size, max_levels):
+    valid = [(name, data) for name, data in zip(names, maps) if data is not None]
+    if not valid:
+        return
+    stack = np.stack([data for _, data in valid])
+    for k, level in enumerate(block_mean_pyramid(stack, min_size, max_levels), start=1):
+        for (name, _), data in zip(valid, level):
+            arrays[f"{name}/{kind}/L{k}"] = data
+    for name, data in valid:
+        arrays[f"{name}/{kind}/range"] = np.array(fused_min_max(data), dtype=np.float32)
+
+
+def write_scene_pyramid(path, names, disp_maps, error_maps, min_size=16, max_levels=None):
+    """
+    写出单个场景的预览金字塔（先写临时文件再替换，读取方不会看到写了一半的文件）
+
+    参数:
+        names: 与 disp_maps / error_maps 对应的名字（方法名，GT 为真值目录名）
+        disp_maps, error_maps: 全分辨率视差图 / 误差图列表，缺失为 None；形状须相同
+    """
+    arrays = {}
+    _add_maps(arrays, names, "disp", disp_maps, min_size, max_levels)
+    _add_maps(arrays, names, "error", error_maps, min_size, max_levels)
+    shape = next(data.shape for data in disp_maps if data is not None)
+    arrays["shape"] = np.array(shape, dtype=np.int64)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_scene(job):
+    """
+    导出一个场景中各方法的 PNG，并用同一次读取的视差图写出该场景的预览金字塔（可在子进程中执行）
+
+    参数:
+        job: (pyramid_path, names, pfm_paths, png_paths, gt_name, gt_path, gt_crop, cmap, compress_level, min_size)
+            png_paths 中为 None 的项不导出 PNG（已是最新或未开启 PNG 导出）；
+            gt_path 为 None（没有真值）时金字塔中只有各方法的视差图；
+            gt_crop 为 GT 四周裁剪的像素数（与评估时的 GTStore 一致，预测已是裁剪后的大小）
+    返回:
+        实际导出的 PNG 路径列表
+    """
+    pyramid_path, names, pfm_paths, png_paths, gt_name, gt_path, gt_crop, cmap, compress_level, min_size = job
+    disp_maps = [read_pfm(path) for path in pfm_paths]
+    exported = [write_depth_png(data, png_path, cmap, compress_level)
+                for data, png_path in zip(disp_maps, png_paths) if png_path is not None]
+    names, error_maps = list(names), [None] * len(disp_maps)
+    if gt_path is not None:
+        disp_gt = read_pfm(gt_path)
+        if gt_crop:
+            disp_gt = disp_gt[gt_crop:-gt_crop, gt_crop:-gt_crop, ...]
+        names, disp_maps, error_maps = [gt_name] + names, [disp_gt] + disp_maps, [None] + [
+            np.abs(disp_gt - data) if data.shape == disp_gt.shape else None for data in disp_maps]
+    # 金字塔中各图的形状须相同，以第一张图（有真值时为 GT）为准
+    shape = disp_maps[0].shape
+    for i, data in enumerate(disp_maps):
+        if data.shape != shape:
+            print(f"Warning: {names[i]} {data.shape} does not match {shape}, not added to {pyramid_path}")
+            disp_maps[i] = None
+    write_scene_pyramid(pyramid_path, names, disp_maps, error_maps, min_size=min_size)
+    return exported
+
+
+def load_preview(path, name, kind="disp", max_size=256):
+    """
+    读取不超过 max_size 的最大一层（没有满足的层时返回最小的一层）
+
+    返回:
+        (preview, (d_min, d_max))：preview 为 float32 数组，(d_min, d_max) 为原图的取值范围
+    """
+    with np.load(path) as pyramid:
+        prefix = f"{name}/{kind}/"
+        count = sum(key.startswith(prefix + "L") for key in pyramid.files)
+        if not count:
+            raise KeyError(f"{prefix}L* not found in {path}")
+        shape = pyramid["shape"]
+        k = next((k for k in range(1, count + 1) if max(shape) >> k <= max_size), count)
+        return pyramid[f"{prefix}L{k}"], tuple(pyramid[prefix + "range"].tolist())
@@ -0,0 +1,180 @@
+"""
+区域掩码：只在部分像素上评估视差指标
+
+由 GT 视差推导的区域（每个 GT 只计算一次）：
+- edges: 视差不连续处，相邻像素视差差值大于 edge_thresh
+- disc_band: edges 膨胀 band 像素得到的遮挡边界带
+- smooth: 平滑区域，离不连续处至少 2 * band 像素，且二阶差分小于 curv_thresh
+
+另外可以提供用户掩码 PNG：<mask_dir>/<dataset>/<场景名>_<区域名>.png，非零像素属于该区域。
+
+推导出的掩码以 np.packbits 压缩（每像素 1 bit）保存在 <cache_dir>/<dataset>/<场景名>.npz，
+文件中记录 GT 签名和推导参数，二者不变时直接读取。
+"""
+import glob
+import json
+import os
+
+import cv2
+import numpy as np
+import imageio.v2 as imageio
+
+from results_store import file_signature
+
+DERIVED_REGIONS = ("edges", "disc_band", "smooth")
+
+
+def _dilate(mask, radius):
+    if radius <= 0:
+        return mask
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+    return cv2.dilate(mask.astype(np.uint8), kernel).astype(bool)
+
+
+def derive_masks(gt, regions=DERIVED_REGIONS, edge_thresh=0.1, band=3, curv_thresh=0.01):
+    """
+    从 GT 视差推导区域掩码
+
+    参数:
+        gt: (H, W) GT 视差
+        regions: 需要的区域名，取自 DERIVED_REGIONS
+        edge_thresh: 相邻像素视差差值超过该值视为不连续
+        band: 边界带半宽（像素）
+        curv_thresh: 平滑区域允许的最大二阶差分
+    返回:
+        masks: {区域名: (H, W) bool}
+    """
+    unknown = set(regions) - set(DERIVED_REGIONS)
+    if unknown:
+        raise ValueError(f"Unknown regions {sorted(unknown)}, expected a subset of {DERIVED_REGIONS}")
+    gt = np.nan_to_num(np.asarray(gt, dtype=np.float32))
+
+    # 前向差分，不连续标记在差值两侧的像素上
+    dx = np.abs(np.diff(gt, axis=1)) > edge_thresh
+    dy = np.abs(np.diff(gt, axis=0)) > edge_thresh
+    edges = np.zeros(gt.shape, dtype=bool)
+    edges[:, :-1] |= dx
+    edges[:, 1:] |= dx
+    edges[:-1, :] |= dy
+    edges[1:, :] |= dy
+
+    masks = {}
+    if "edges" in regions:
+        masks["edges"] = edges
+    if "disc_band" in regions:
+        masks["disc_band"] = _dilate(edges, band)
+    if "smooth" in regions:
+        curvature = np.abs(cv2.Laplacian(gt, cv2.CV_32F, ksize=1))
+        masks["smooth"] = ~_dilate(edges, 2 * band) & (curvature < curv_thresh)
+    return masks
+
+
+def pack_mask(mask):
+    return np.packbits(mask.ravel())
+
+
+def unpack_mask(packed, shape):
+    return np.unpackbits(packed, count=int(np.prod(shape))).reshape(shape).astype(bool)
+
+
+class MaskStore:
+    """
+    区域掩码存储，按 (dataset, file) 缓存
+
+    参数:
+        cache_dir: 推导掩码的磁盘缓存目录
+        regions: 需要从 GT 推导的区域名（可为空，只使用用户掩码）
+        mask_dir: 用户掩码目录，None 表示不使用
+        crop_size: 与 GT 一致的裁剪大小，用户掩码按同样方式裁剪
+        edge_thresh, band, curv_thresh: 见 derive_masks
+    """
+
+    def __init__(self, cache_dir, regions=DERIVED_REGIONS, mask_dir=None, crop_size=None,
+                 edge_thresh=0.1, band=3, curv_thresh=0.01):
+        self.cache_dir = cache_dir
+        self.regions = tuple(regions)
+        self.mask_dir = mask_dir
+        self.crop_size = crop_size
+        self.params = {"regions": list(self.regions), "edge_thresh": edge_thresh, "band": band,
+                       "curv_thresh": curv_thresh, "crop": int(crop_size or 0)}
+        self._cache = {}
+
+    def __getstate__(self):
+        # 传给子进程时不携带已加载的掩码，子进程从磁盘缓存读取
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        return state
+
+    def cache_path(self, dataset, file):
+        return os.path.join(self.cache_dir, dataset, os.path.splitext(file)[0] + ".npz")
+
+    def _load_cached(self, path, gt_sig, shape):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if str(data["key"]) != json.dumps({"gt": gt_sig, **self.params}, sort_keys=True):
+                return None
+            if tuple(data["shape"]) != tuple(shape):
+                return None
+            return {region: unpack_mask(data[region], shape) for region in self.regions}
+
+    def _save_cached(self, path, gt_sig, masks, shape):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"  # 多进程同时写同一个 GT 时用原子替换
+        np.savez(tmp, key=json.dumps({"gt": gt_sig, **self.params}, sort_keys=True), shape=np.asarray(shape),
+                 **{region: pack_mask(mask) for region, mask in masks.items()})
+        os.replace(tmp, path)
+
+    def config(self):
+        """影响区域指标的全部参数（不含裁剪大小），作为结果存储的键的一部分。"""
+        return {**{k: v for k, v in self.params.items() if k != "crop"}, "mask_dir": self.mask_dir}
+
+    def user_mask_paths(self, dataset, file):
+        """场景的用户掩码文件 {区域名: 路径}。"""
+        if not self.mask_dir:
+            return {}
+        stem = os.path.splitext(file)[0]
+        paths = sorted(glob.glob(os.path.join(self.mask_dir, dataset, f"{stem}_*.png")))
+        return {os.path.splitext(os.path.basename(path))[0][len(stem) + 1:]: path for path in paths}
+
+    def _user_masks(self, dataset, file, shape):
+        masks = {}
+        for region, path in self.user_mask_paths(dataset, file).items():
+            mask = imageio.imread(path)
+            if mask.ndim == 3:
+                mask = mask[..., 0]
+            if self.crop_size:
+                c = self.crop_size
+                mask = mask[c:-c, c:-c]
+            if mask.shape != tuple(shape):
+                print(f"Skipping mask {path}: shape {mask.shape} does not match GT {tuple(shape)}")
+                continue
+            masks[region] = mask != 0
+        return masks
+
+    def get(self, dataset, file, gt, gt_path):
+        """
+        返回 {区域名: bool 掩码}
+
+        参数:
+            gt: 评估时使用的 GT（已裁剪）
+            gt_path: GT 文件路径，用于校验磁盘缓存
+        """
+        key = (dataset, file)
+        if key not in self._cache:
+            shape = np.shape(gt)
+            masks = {}
+            if self.regions:
+                path = self.cache_path(dataset, file)
+                gt_sig = file_signature(gt_path)
+                masks = self._load_cached(path, gt_sig, shape)
+                if masks is None:
+                    masks = derive_masks(gt, self.regions, self.params["edge_thresh"], self.params["band"],
+                                         self.params["curv_thresh"])
+                    self._save_cached(path, gt_sig, masks, shape)
+            masks.update(self._user_masks(dataset, file, shape))
+            self._cache[key] = masks
+        return self._cache[key]
+
+    def clear(self):
+        self._cache.clear()
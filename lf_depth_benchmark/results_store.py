@@ -0,0 +1,174 @@
+"""
+基于 SQLite 的增量评估结果存储
+
+每个场景的指标按 (方法, 数据集, 场景, 指标参数) 保存，指标参数（eta 集合、裁剪大小、MSE 缩放等，
+见 metric_params）任一项不同都视为不同的结果；同时记录预测/GT 文件的签名
+（文件大小 + mtime，或可选的内容哈希）。再次运行时签名未变的场景直接读取已有结果，
+只有新增或修改过的 (pred, GT) 对才需要重新计算。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from depth_metrics import average_metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scene_results (
+    method   TEXT NOT NULL,
+    dataset  TEXT NOT NULL,
+    scene    TEXT NOT NULL,
+    params   TEXT NOT NULL,
+    pred_sig TEXT NOT NULL,
+    gt_sig   TEXT NOT NULL,
+    metrics  TEXT NOT NULL,
+    updated  REAL NOT NULL,
+    PRIMARY KEY (method, dataset, scene, params)
+)
+"""
+
+
+def file_signature(path, use_hash=False):
+    """
+    文件签名：默认 "大小:mtime_ns"，use_hash=True 时为内容的 sha1（更稳妥，但需要读完整个文件）
+    """
+    if use_hash:
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+        return "sha1:" + sha1.hexdigest()
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def metric_params(etas, crop_size=None, scale=100, regions=None):
+    """
+    决定指标取值的全部参数，作为结果的键；新增影响指标的参数时都应加入这里
+
+    参数:
+        regions: 区域指标的配置（MaskStore.config()），None 表示不计算区域指标
+    返回:
+        dict，可直接 JSON 序列化
+    """
+    params = {"etas": [float(eta) for eta in etas], "crop": int(crop_size or 0), "scale": float(scale)}
+    if regions is not None:
+        params["regions"] = regions
+    return params
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+class ResultsStore:
+    """
+    场景级评估结果的持久化存储
+
+    参数:
+        db_path: SQLite 数据库路径
+        use_hash: 是否使用内容哈希作为文件签名（默认使用大小和修改时间）
+    """
+
+    def __init__(self, db_path, use_hash=False):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.use_hash = use_hash
+        self._conn = sqlite3.connect(db_path)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(scene_results)")]
+        if columns and "params" not in columns:
+            # 旧版本按 (etas, crop) 保存，不含 MSE 缩放等参数，无法判断是否可复用，直接重建
+            print(f"Rebuilding outdated results store {db_path}")
+            self._conn.execute("DROP TABLE scene_results")
+        self._conn.execute(_SCHEMA)
+        self._signatures = {}  # 同一次运行中 GT 会被多个方法引用，签名只算一次
+
+    def signature(self, path):
+        if path not in self._signatures:
+            self._signatures[path] = file_signature(path, self.use_hash)
+        return self._signatures[path]
+
+    def _gt_signature(self, gt_path, extra_paths=()):
+        # 用户掩码等与 GT 一起决定结果的文件，签名拼接在 GT 签名之后
+        return "+".join([self.signature(gt_path)] + [self.signature(path) for path in extra_paths])
+
+    def get(self, method, dataset, scene, params, pred_path, gt_path, extra_paths=()):
+        """
+        查询已有结果；没有以相同 params（metric_params）计算的结果，或签名不一致（文件被修改）时返回 None
+
+        参数:
+            extra_paths: 结果还依赖的其他文件（如用户掩码），其中任一文件变化或增删都视为不一致
+        """
+        row = self._conn.execute(
+            "SELECT pred_sig, gt_sig, metrics FROM scene_results "
+            "WHERE method=? AND dataset=? AND scene=? AND params=?",
+            (method, dataset, scene, _params_key(params))).fetchone()
+        if row is None:
+            return None
+        pred_sig, gt_sig, metrics = row
+        if pred_sig != self.signature(pred_path) or gt_sig != self._gt_signature(gt_path, extra_paths):
+            return None
+        return json.loads(metrics)
+
+    def put(self, method, dataset, scene, params, pred_path, gt_path, metrics, extra_paths=()):
+        """写入（覆盖）一个场景的结果，非标量项（如 BadPix 曲线）不保存。"""
+        scalars = {k: float(v) for k, v in metrics.items() if k != "badpix_curve"}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO scene_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (method, dataset, scene, _params_key(params),
+             self.signature(pred_path), self._gt_signature(gt_path, extra_paths), json.dumps(scalars), time.time()))
+
+    def forget(self, path):
+        """文件被修改后清除其签名缓存（长时间运行时使用）。"""
+        self._signatures.pop(path, None)
+
+    def scenes(self):
+        """存储中所有的 (方法, 数据集, 场景)。"""
+        return self._conn.execute("SELECT DISTINCT method, dataset, scene FROM scene_results").fetchall()
+
+    def delete(self, method, dataset, scene):
+        """删除一个场景在任意指标参数下的所有结果（预测或 GT 文件已被删除时），返回删除的行数。"""
+        cursor = self._conn.execute("DELETE FROM scene_results WHERE method=? AND dataset=? AND scene=?",
+                                    (method, dataset, scene))
+        return cursor.rowcount
+
+    def load_results(self, params, methods=None):
+        """
+        从存储中重建与 calculate_metrics 相同结构的结果字典（含 average），用于只重新生成报告
+
+        参数:
+            params: metric_params，只加载以这些参数计算的结果
+            methods: 只加载这些方法（并按该顺序排列），None 表示全部
+        """
+        etas = params["etas"]
+        results = {}
+        rows = self._conn.execute(
+            "SELECT method, dataset, scene, metrics FROM scene_results WHERE params=? "
+            "ORDER BY method, dataset, scene",
+            (_params_key(params),))
+        for method, dataset, scene, metrics in rows:
+            if methods is not None and method not in methods:
+                continue
+            results.setdefault(method, {}).setdefault(dataset, {})[scene] = json.loads(metrics)
+        if methods is not None:
+            results = {method: results[method] for method in methods if method in results}  # 保持给定的方法顺序
+        for method_results in results.values():
+            for dataset_results in method_results.values():
+                dataset_results["average"] = average_metrics(list(dataset_results.values()), etas)
+        return results
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
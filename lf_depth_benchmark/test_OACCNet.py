@@ -5,6 +5,11 @@ import numpy as np
 
 from utils import *
 from model import Net
+from lf_pipeline import prefetch_iter, AsyncWriter
+from cpu_inference import add_cpu_args, configure_threads, prepare_net, inference_context, compare_to_fp32
+from tile_scheduler import tiled_disparity
+from inference_cache import InferenceCache, sources_digest
+from lf_pack import is_packed_up_to_date, open_packed_lf, packed_path, lf_to_gray, view_paths, read_views_threaded
 
 
 def parse_args():
@@ -16,8 +21,24 @@ def parse_args():
     parser.add_argument('--crop', type=bool, default=True)
     parser.add_argument('--patchsize', type=int, default=128)
     parser.add_argument('--minibatch_test', type=int, default=4)
+    parser.add_argument('--tiling', type=str, default='fixed', choices=['fixed', 'adaptive'],
+                        help='fixed: 原 LFdivide/LFintegrate 方式（默认，与已发布的结果一致）；'
+                             'adaptive: 可配置重叠 + 羽化融合 + 按内存预算定 batch，会使用块边缘的输出，视差图与 fixed 不同')
+    parser.add_argument('--overlap', type=int, default=None, help='相邻块重叠像素数，默认 patchsize // 4')
+    parser.add_argument('--mem_budget_mb', type=int, default=1024,
+                        help='adaptive 切块时每个 batch 的内存预算 (MB)，0 表示使用 --minibatch_test')
     parser.add_argument('--model_path', type=str, default='./log/OACC-Net110.pth')
     parser.add_argument('--save_path', type=str, default='./Results/')
+    parser.add_argument('--load_threads', type=int, default=None, help='解码视点 PNG 的线程数，默认自动')
+    parser.add_argument('--prefetch', type=int, default=2, help='后台预取的光场数，0 表示不预取')
+    parser.add_argument('--prefetch_workers', type=int, default=1, help='预取光场的线程数')
+    parser.add_argument('--write_queue', type=int, default=4, help='等待异步写出的视差图数量上限')
+    parser.add_argument('--infer_cache', type=str, default=None,
+                        help='视差结果缓存目录，默认 <save_path>/infer_cache')
+    parser.add_argument('--infer_cache_gb', type=float, default=20, help='缓存大小上限 (GB)，超出时淘汰最久未用的结果')
+    parser.add_argument('--no_infer_cache', action='store_true', help='不使用视差结果缓存')
+    parser.add_argument('--cache_hash', action='store_true', help='按源文件内容哈希（而非大小和修改时间）识别输入光场')
+    add_cpu_args(parser)
     return parser.parse_args()
 
 
@@ -58,9 +79,14 @@ def disparity_estimation(lf_angCrop, net, cfg):
     if not cfg.crop:
         data = rearrange(lf_angCrop, 'u v h w -> (u h) (v w)')
         data = ToTensor()(data.copy())
-        with torch.no_grad():
+        with inference_context(cfg):
             disp = net(data.unsqueeze(0).to(cfg.device))
-        disp = np.float32(disp[0, 0, :, :].data.cpu())
+        disp = np.float32(disp[0, 0, :, :].data.float().cpu())
+
+    elif cfg.tiling == 'adaptive':
+        disp = tiled_disparity(lf_angCrop, net, cfg.device, cfg.patchsize, overlap=cfg.overlap,
+                               batch_size=None if cfg.mem_budget_mb else cfg.minibatch_test,
+                               mem_budget_mb=cfg.mem_budget_mb, context=inference_context(cfg))
 
     else:
         patchsize = cfg.patchsize
@@ -70,18 +96,12 @@ def disparity_estimation(lf_angCrop, net, cfg):
         n1, n2, u, v, c, h, w = sub_lfs.shape
         sub_lfs = rearrange(sub_lfs, 'n1 n2 u v c h w -> (n1 n2) u v c h w')
         mini_batch = cfg.minibatch_test
-        num_inference = (n1 * n2) // mini_batch
-        with torch.no_grad():
+        with inference_context(cfg):
             out_disp = []
-            for idx_inference in range(num_inference):
-                current_lfs = sub_lfs[idx_inference * mini_batch: (idx_inference + 1) * mini_batch, :, :, :, :, :]
-                input_data = rearrange(current_lfs, 'b u v c h w -> b c (u h) (v w)')
-                out_disp.append(net(input_data.to(cfg.device)))
-
-            if (n1 * n2) % mini_batch:
-                current_lfs = sub_lfs[(idx_inference + 1) * mini_batch:, :, :, :, :, :]
+            for start in range(0, n1 * n2, mini_batch):  # 最后一个 batch 可能不满
+                current_lfs = sub_lfs[start: start + mini_batch, :, :, :, :, :]
                 input_data = rearrange(current_lfs, 'b u v c h w -> b c (u h) (v w)')
-                out_disp.append(net(input_data.to(cfg.device)))
+                out_disp.append(net(input_data.to(cfg.device)).float())
 
         out_disps = torch.cat(out_disp, dim=0)
         out_disps = rearrange(out_disps, '(n1 n2) c h w -> n1 n2 c h w', n1=n1, n2=n2)
@@ -92,56 +112,66 @@ def disparity_estimation(lf_angCrop, net, cfg):
     return disp
 
 
-def test(cfg):
-    scene_list = os.listdir(cfg.testset_dir)
-    angRes = cfg.angRes
-
+def load_net(cfg):
+    """
+    加载 OACC-Net，返回 (fp32 网络, 按 --precision/--jit 处理后用于推理的网络)
+    """
+    if not str(cfg.device).startswith('cuda'):
+        configure_threads(cfg)
     net = Net(cfg.angRes)
     net.to(cfg.device)
     model = torch.load(cfg.model_path, map_location={'cuda:0': cfg.device})
     net.load_state_dict(model['state_dict'])
+    net.eval()
+    return net, prepare_net(net, cfg)
+
+
+def test(cfg):
+    scene_list = os.listdir(cfg.testset_dir)
+    angRes = cfg.angRes
+
+    net_ref, net = load_net(cfg)
 
     for scenes in scene_list:
         print('Working on scene: ' + scenes + '...')
-        temp = imageio.imread(cfg.testset_dir + scenes + '/input_Cam000.png')
-        lf = np.zeros(shape=(9, 9, temp.shape[0], temp.shape[1], 3), dtype=int)
-        for i in range(81):
-            temp = imageio.imread(cfg.testset_dir + scenes + '/input_Cam0%.2d.png' % i)
-            lf[i // 9, i - 9 * (i // 9), :, :, :] = temp
-        lf_gray = np.mean((1 / 255) * lf.astype('float32'), axis=-1, keepdims=False)
+        # 只并行解码角度裁剪后需要的视点，直接得到 float32 灰度
         angBegin = (9 - angRes) // 2
-        lf_angCrop = lf_gray[angBegin:  angBegin + angRes, angBegin: angBegin + angRes, :, :]
+        paths = [cfg.testset_dir + scenes + '/input_Cam0%.2d.png' % (u * 9 + v)
+                 for u in range(angBegin, angBegin + angRes) for v in range(angBegin, angBegin + angRes)]
+        lf_angCrop = read_views_threaded(paths, angRes, gray=True, num_threads=cfg.load_threads)
 
+        if cfg.report_delta and scenes == scene_list[0]:
+            compare_to_fp32(lf_angCrop, disparity_estimation, net_ref, net, cfg)
         disp = disparity_estimation(lf_angCrop, net, cfg)
         print('Finished! \n')
         write_pfm(disp, cfg.save_path + '%s.pfm' % (scenes))
 
 
-def read_lfs(lf_dir, lf_no, ang_res=7):
+def read_lfs(lf_dir, lf_no, ang_res=7, num_threads=None):
     print(f"Reading {lf_no}th LFs under directory <{lf_dir}> ...")
-    filename_format = r"LF%d_view%d_fine.png"
-    filename = filename_format % (lf_no, 0)
-    tmp = imageio.imread(os.path.join(lf_dir, filename))
-    lf = np.zeros((ang_res, ang_res, tmp.shape[0], tmp.shape[1], 3), dtype=int)
-    for i in range(ang_res ** 2):
-        tmp = imageio.imread(os.path.join(lf_dir, filename_format % (lf_no, i)))
-        lf[i // ang_res, i - ang_res * (i // ang_res), :, :, :] = tmp
-    lf_gray = np.mean((1 / 255) * lf.astype('float32'), axis=-1, keepdims=False)
-    return lf_gray
+    # 优先使用 lf_pack.py 生成的打包光场（一次 mmap，代替逐张解码 PNG）
+    if is_packed_up_to_date(lf_dir, lf_no, ang_res):
+        return lf_to_gray(open_packed_lf(packed_path(lf_dir, lf_no)))
+    # 线程池并行解码，直接写入 float32 灰度张量
+    return read_views_threaded(view_paths(lf_dir, lf_no, ang_res), ang_res, gray=True, num_threads=num_threads)
+
+
+def lf_sources(lf_dir, lf_no, ang_res=7):
+    """光场的源文件：存在的视点 PNG，若视点已被删除只保留打包文件，则为打包文件。"""
+    paths = [p for p in view_paths(lf_dir, lf_no, ang_res) if os.path.exists(p)]
+    return paths or [packed_path(lf_dir, lf_no)]
 
 
 def test_benchmark(cfg):
     # TODO: 提供的预训练模型要求是9x9的输入视点, damn!
-    net = Net(cfg.angRes)
-    net.to(cfg.device)
-    model = torch.load(cfg.model_path, map_location={'cuda:0': cfg.device})
-    net.load_state_dict(model['state_dict'])
+    net_ref, net = load_net(cfg)
 
     # SRC_DIR = r"E:\lf\LFRecon\ReconLFs"
     SRC_DIR = r"/data1/cdj/LFRecon/ReconLFs"
     methods = ["GTLF", "GC2ASR", "DispEhcASR", "ELFR", "FS-GAF", "HLFASR", "DistgASR"]
     lf_family = ["HCI", "HCI_old", "Inria_DLFD"]
 
+    jobs = []
     for method in methods:
         for lf_f in lf_family:
             lf_path = os.path.join(SRC_DIR, os.path.join(method, lf_f))
@@ -151,13 +181,47 @@ def test_benchmark(cfg):
                 lf_nos = [1, 9, 10, 16, 20, 22, 31, 32]
             else:
                 lf_nos = [i for i in range(5)]
-            print(f"Working on {lf_f} {method}...")
-            for lf_no in lf_nos:
-                lf_gray = read_lfs(lf_path, lf_no, ang_res=7)
-                disp = disparity_estimation(lf_gray, net, cfg)
-                lf_no_name = "LF" + str(lf_no)
-                # write_pfm(disp, os.path.join(lf_path, f"{lf_no_to_name[lf_f][lf_no_name]}.pfm"))
-                write_pfm(disp, os.path.join(lf_path, f"{lf_no_name}.pfm"))  # 不转换成具体的光场名称
+            jobs.extend((method, lf_f, lf_path, lf_no) for lf_no in lf_nos)
+
+    # 缓存命中的光场直接复制已有 PFM，不读光场也不推理；只有新增或改动过的光场进入流水线
+    cache, cache_keys = None, {}
+    if not cfg.no_infer_cache:
+        cache = InferenceCache(cfg.infer_cache or os.path.join(cfg.save_path, 'infer_cache'), cfg.model_path, cfg,
+                               max_bytes=int(cfg.infer_cache_gb * 1024 ** 3))
+        pending = []
+        for job in jobs:
+            _, _, lf_path, lf_no = job
+            key = cache.key(sources_digest(lf_sources(lf_path, lf_no, 7), cfg.cache_hash))
+            if not cache.fetch(key, os.path.join(lf_path, f"LF{lf_no}.pfm")):
+                cache_keys[job] = key
+                pending.append(job)
+        print(f"Inference cache: {cache.hits}/{len(jobs)} light fields reused, {len(pending)} to estimate")
+        jobs = pending
+
+    def write_result(disp, out_path, job):
+        write_pfm(disp, out_path)
+        if cache is not None:
+            cache.put(cache_keys[job], out_path)
+
+    # 流水线：后台线程预取接下来的光场，主线程做视差估计，写线程异步保存 PFM
+    def load_job(job):
+        _, _, lf_path, lf_no = job
+        return read_lfs(lf_path, lf_no, ang_res=7, num_threads=cfg.load_threads)
+
+    current = None
+    with AsyncWriter(write_result, cfg.write_queue) as writer:
+        for (method, lf_f, lf_path, lf_no), lf_gray in prefetch_iter(jobs, load_job, cfg.prefetch,
+                                                                     cfg.prefetch_workers):
+            if current != (method, lf_f):
+                current = (method, lf_f)
+                print(f"Working on {lf_f} {method}...")
+            if cfg.report_delta and (method, lf_f, lf_path, lf_no) == jobs[0]:
+                compare_to_fp32(lf_gray, disparity_estimation, net_ref, net, cfg)
+            disp = disparity_estimation(lf_gray, net, cfg)
+            lf_no_name = "LF" + str(lf_no)
+            # write_pfm(disp, os.path.join(lf_path, f"{lf_no_to_name[lf_f][lf_no_name]}.pfm"))
+            # 不转换成具体的光场名称
+            writer.submit(disp, os.path.join(lf_path, f"{lf_no_name}.pfm"), (method, lf_f, lf_path, lf_no))
 
 
 if __name__ == '__main__':
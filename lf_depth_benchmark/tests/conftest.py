@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 评估脚本都是平铺的模块（from pfm_io import ...），测试时把上级目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
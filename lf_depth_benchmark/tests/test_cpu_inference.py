@@ -0,0 +1,26 @@
+import argparse
+from types import SimpleNamespace
+
+import pytest
+import torch
+import torch.nn as nn
+
+from cpu_inference import add_cpu_args, inference_context, prepare_net
+
+
+def test_int8_not_offered():
+    parser = add_cpu_args(argparse.ArgumentParser())
+    assert parser.parse_args(["--precision", "bf16"]).precision == "bf16"
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--precision", "int8"])
+
+
+def test_traced_conv_net_matches_eager():
+    torch.manual_seed(0)
+    net = nn.Sequential(nn.Conv2d(1, 4, 3, padding=1), nn.LeakyReLU(0.1), nn.Conv2d(4, 1, 3, padding=2, dilation=2))
+    cfg = SimpleNamespace(precision="fp32", jit="trace", device="cpu")
+    traced = prepare_net(net, cfg)
+    x = torch.randn(2, 1, 16, 16)
+    with inference_context(cfg):
+        torch.testing.assert_close(traced(x), net(x))
+        torch.testing.assert_close(traced(x[:1]), net(x[:1]))  # 新的输入形状重新追踪
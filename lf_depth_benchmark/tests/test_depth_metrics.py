@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from depth_metrics import badpix_key, compute_depth_metrics, compute_depth_metrics_tiled, region_key
+from pfm_io import write_pfm
+
+ETAS = [0.07, 0.01, 0.03, 0.5]  # 故意不排序
+
+
+def naive_mse(gt, pred, scale=100):
+    """原 generate_benchmark 中的 mean_squared_error。"""
+    return np.mean((gt - pred) ** 2) * scale
+
+
+def naive_badpix(gt, pred, eta):
+    """原 generate_benchmark 中的 bad_pixel_ratio：NaN 不计为坏像素，但计入分母。"""
+    return np.sum(np.abs(gt - pred) > eta) / gt.size * 100
+
+
+def _pair(shape, seed=0, nan_fraction=0.0):
+    rng = np.random.default_rng(seed)
+    gt = rng.uniform(-2, 2, shape).astype(np.float32)
+    pred = (gt + rng.normal(0, 0.05, shape)).astype(np.float32)
+    if nan_fraction:
+        pred[rng.random(shape) < nan_fraction] = np.nan
+    return gt, pred
+
+
+def _check(metrics, gt, pred, prefix=None):
+    key = (lambda name: name) if prefix is None else (lambda name: region_key(prefix, name))
+    np.testing.assert_allclose(metrics[key("mse")], naive_mse(gt, pred), rtol=1e-5)
+    for eta in ETAS:
+        assert metrics[key(badpix_key(eta))] == pytest.approx(naive_badpix(gt, pred, eta), abs=1e-9)
+
+
+@pytest.mark.parametrize("shape", [(64, 48), (3, 32, 40)])
+def test_matches_naive_formulas(shape):
+    gt, pred = _pair(shape)
+    _check(compute_depth_metrics(gt, pred, ETAS), gt, pred)
+
+
+def test_nan_handling():
+    gt, pred = _pair((50, 70), seed=1, nan_fraction=0.05)
+    metrics = compute_depth_metrics(gt, pred, ETAS)
+    assert np.isnan(metrics["mse"]) and np.isnan(naive_mse(gt, pred))
+    for eta in ETAS:
+        assert metrics[badpix_key(eta)] == pytest.approx(naive_badpix(gt, pred, eta), abs=1e-9)
+
+
+@pytest.mark.parametrize("shape", [(64, 48), (3, 32, 40)])
+def test_region_metrics_match_naive_on_masked_pixels(shape):
+    gt, pred = _pair(shape, seed=2)
+    rng = np.random.default_rng(3)
+    masks = {"a": rng.random(shape) < 0.3, "b": rng.random(shape) < 0.8}
+    metrics = compute_depth_metrics(gt, pred, ETAS, masks=masks)
+    _check(metrics, gt, pred)
+    for name, mask in masks.items():
+        _check(metrics, gt[mask], pred[mask], prefix=name)
+
+
+def _assert_bitwise_equal(tiled, whole):
+    assert tiled.keys() == whole.keys()
+    for key, value in whole.items():
+        if key == "badpix_curve":
+            np.testing.assert_array_equal(tiled[key][0], value[0])
+            np.testing.assert_array_equal(tiled[key][1], value[1])
+        else:
+            np.testing.assert_array_equal(tiled[key], value)  # NaN 与 NaN 视为相等，其余须逐位相同
+
+
+@pytest.mark.parametrize("shape", [(101, 37), (4, 29, 23)])
+@pytest.mark.parametrize("block_rows", [1, 7, 17, 64, 1000])
+def test_tiled_equals_whole_image(shape, block_rows):
+    gt, pred = _pair(shape, seed=4, nan_fraction=0.02)
+    rng = np.random.default_rng(5)
+    masks = {"a": rng.random(shape) < 0.4, "b": np.zeros(shape, bool)}
+    whole = compute_depth_metrics(gt, pred, ETAS, curve_etas=True, masks=masks)
+    tiled = compute_depth_metrics_tiled(gt, pred, ETAS, curve_etas=True, block_rows=block_rows, masks=masks)
+    _assert_bitwise_equal(tiled, whole)
+
+    gt[np.isnan(pred)] = 0
+    pred[np.isnan(pred)] = 0  # 没有 NaN 时 MSE 等为有限值
+    _assert_bitwise_equal(compute_depth_metrics_tiled(gt, pred, ETAS, block_rows=block_rows, masks=masks),
+                          compute_depth_metrics(gt, pred, ETAS, masks=masks))
+
+
+def test_tiled_pfm_crop_equals_cropped_whole_image(tmp_path):
+    gt, pred = _pair((90, 70), seed=6, nan_fraction=0.01)
+    gt_path, pred_path = str(tmp_path / "gt.pfm"), str(tmp_path / "pred.pfm")
+    write_pfm(gt, gt_path)
+    write_pfm(pred, pred_path)
+    crop = 11
+    whole = compute_depth_metrics(gt[crop:-crop, crop:-crop], pred[crop:-crop, crop:-crop], ETAS)
+    _assert_bitwise_equal(compute_depth_metrics_tiled(gt_path, pred_path, ETAS, block_rows=13, crop_size=crop), whole)
@@ -0,0 +1,52 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+import inference_cache
+from inference_cache import InferenceCache
+from pfm_io import write_pfm
+
+SIZE = 1000  # 每个条目的大致字节数
+
+
+def _cache(tmp_path, max_bytes):
+    checkpoint = tmp_path / "model.pth"
+    checkpoint.write_bytes(b"weights")
+    cfg = SimpleNamespace(model_name="OACC-Net", angRes=7, patchsize=128)
+    return InferenceCache(str(tmp_path / "cache"), str(checkpoint), cfg, max_bytes=max_bytes)
+
+
+def _put(cache, tmp_path, i, mtime):
+    pfm = str(tmp_path / f"out{i}.pfm")
+    write_pfm(np.full((15, 15), i, np.float32), pfm)
+    key = cache.key(f"lf{i}")
+    cache.put(key, pfm)
+    os.utime(cache.path(key), (mtime, mtime))
+    return key
+
+
+def test_scans_only_when_over_limit(tmp_path, monkeypatch):
+    scans = []
+    walk = os.walk
+    monkeypatch.setattr(inference_cache.os, "walk", lambda *a, **k: scans.append(1) or walk(*a, **k))
+    cache = _cache(tmp_path, max_bytes=10 * SIZE)
+    keys = [_put(cache, tmp_path, i, mtime=1000 + i) for i in range(9)]
+    assert len(scans) == 1  # 只有启动时的一次扫描
+    # 命中会更新最近使用时间，最旧的条目因此保留
+    assert cache.fetch(keys[0], str(tmp_path / "hit.pfm"))
+
+    keys += [_put(cache, tmp_path, i, mtime=1000 + i) for i in range(9, 11)]  # 第 11 个超过上限
+    assert len(scans) == 2
+    remaining = [key for key in keys if os.path.exists(cache.path(key))]
+    sizes = sum(os.path.getsize(cache.path(key)) for key in remaining)
+    assert sizes <= 10 * SIZE * inference_cache.EVICT_TO and sizes == cache._total
+    assert keys[0] in remaining and keys[1] not in remaining and keys[-1] in remaining
+
+
+def test_total_seeded_from_existing_entries(tmp_path):
+    cache = _cache(tmp_path, max_bytes=100 * SIZE)
+    _put(cache, tmp_path, 0, mtime=1000)
+    _put(cache, tmp_path, 0, mtime=1000)  # 覆盖同一键不重复计数
+    size = os.path.getsize(cache.path(cache.key("lf0")))
+    assert cache._total == size and _cache(tmp_path, max_bytes=100 * SIZE)._total == size
@@ -0,0 +1,33 @@
+import threading
+import time
+
+import pytest
+
+from lf_pipeline import prefetch_iter
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_prefetch_depth_bounds_loads(depth):
+    lock = threading.Lock()
+    state = {"started": 0, "running": 0, "max_running": 0, "in_flight_during_first": None}
+
+    def loader(job):
+        with lock:
+            state["started"] += 1
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        if job == 0:
+            # 线程足够多，主线程等待第一个结果期间，已提交的加载都会开始
+            time.sleep(0.2)
+            with lock:
+                state["in_flight_during_first"] = state["started"]
+        else:
+            time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+        return job * 2
+
+    results = list(prefetch_iter(range(10), loader, depth=depth, num_workers=8))
+    assert results == [(job, job * 2) for job in range(10)]
+    assert state["in_flight_during_first"] == depth
+    assert state["max_running"] <= depth
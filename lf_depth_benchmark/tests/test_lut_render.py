@@ -0,0 +1,32 @@
+import io
+
+import numpy as np
+import pytest
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import imageio.v2 as imageio
+from matplotlib import colormaps
+
+from lut_render import apply_lut, get_lut
+
+
+@pytest.mark.parametrize("cmap", ["hot", "viridis"])
+def test_lut_matches_matplotlib(cmap):
+    expected = colormaps[cmap](np.linspace(0, 1, 256), bytes=True)[:, :3]
+    np.testing.assert_array_equal(get_lut(cmap), expected)
+
+
+@pytest.mark.parametrize("cmap", ["hot", "viridis"])
+def test_apply_lut_matches_imshow(cmap):
+    values = np.linspace(0, 1, 256, dtype=np.float32)[None, :].repeat(4, axis=0)
+    fig = plt.figure(figsize=(2.56, 0.04), dpi=100)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis("off")
+    ax.imshow(values, cmap=cmap, vmin=0, vmax=1, interpolation="nearest", aspect="auto")
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100)
+    plt.close(fig)
+    rendered = imageio.imread(buf.getvalue())[2, :, :3]
+    np.testing.assert_array_equal(apply_lut(values, cmap)[0], rendered)
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+import lfbench
+from lf_fixtures import generate_fixture
+
+
+def _run(base_dir, out_dir, workers, share=True):
+    cfg = lfbench.load_config("v3", overrides=[
+        ("base_dir", base_dir), ("output_dir", out_dir), ("pipeline", ["discover", "load", "score", "report"]),
+        ("stages.score.workers", workers), ("stages.score.cache", False), ("stages.load.share", share),
+        ("stages.score.regions", ["edges", "smooth"]), ("stages.report.bootstrap", 200)])
+    os.makedirs(out_dir)
+    results = lfbench.run_pipeline(cfg).results
+    reports = {name: open(os.path.join(out_dir, name)).read()
+               for name in sorted(os.listdir(out_dir)) if name.endswith("_results.md")}
+    return results, reports
+
+
+@pytest.mark.parametrize("share", [True, False])
+def test_parallel_equals_serial(tmp_path, share):
+    base_dir = str(tmp_path / "data")
+    generate_fixture(base_dir, n_methods=3, n_datasets=2, n_scenes=3, height=48, width=40)
+    serial = _run(base_dir, str(tmp_path / "serial"), 1, share)
+    parallel = _run(base_dir, str(tmp_path / "parallel"), 3, share)
+    assert parallel[0] == serial[0]
+    assert list(parallel[1]) == list(serial[1]) and len(serial[1]) == 2
+    assert parallel[1] == serial[1]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from pfm_io import read_pfm, read_pfm_rows, read_pfm_tile, write_pfm
+
+
+@pytest.fixture
+def pfm_path(tmp_path):
+    data = np.arange(5 * 7, dtype=np.float32).reshape(5, 7)
+    path = str(tmp_path / "a.pfm")
+    write_pfm(data, path)
+    return path, data
+
+
+def test_round_trip(pfm_path):
+    path, data = pfm_path
+    np.testing.assert_array_equal(read_pfm(path), data)
+    np.testing.assert_array_equal(read_pfm(path, mmap=True), data)
+
+
+@pytest.mark.parametrize("y, x, h, w", [(1, 2, 3, 4), (0, 0, 5, 7), (3, 5, 10, 10), (-2, -3, 4, 5), (2, 0, 2, None)])
+def test_tile_matches_clipped_slice(pfm_path, y, x, h, w):
+    path, data = pfm_path
+    y1, x1 = y + h, data.shape[1] if w is None else x + w
+    expected = data[max(0, y):max(0, y1), max(0, x):max(0, x1)]
+    np.testing.assert_array_equal(read_pfm_tile(path, y, x, h, w), expected)
+
+
+@pytest.mark.parametrize("y, x, h, w", [(5, 0, 2, 3), (9, 0, 2, 3), (0, 7, 2, 3), (-4, 0, 2, 3), (0, -5, 2, 3),
+                                        (1, 1, 0, 3)])
+def test_tile_outside_image_is_empty(pfm_path, y, x, h, w):
+    path, _ = pfm_path
+    assert read_pfm_tile(path, y, x, h, w).size == 0
+
+
+def test_negative_size_rejected(pfm_path):
+    path, _ = pfm_path
+    with pytest.raises(ValueError):
+        read_pfm_tile(path, 0, 0, -1, 2)
+
+
+def test_rows(pfm_path):
+    path, data = pfm_path
+    np.testing.assert_array_equal(read_pfm_rows(path, 1, 4), data[1:4])
+    np.testing.assert_array_equal(read_pfm_rows(path, 3, 9), data[3:])
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+import lfbench
+from lf_fixtures import generate_fixture
+from pfm_io import read_pfm
+from preview_pyramid import block_mean_pyramid, load_preview
+
+
+def test_block_mean_pyramid():
+    data = np.arange(64 * 48, dtype=np.float32).reshape(64, 48)
+    levels = block_mean_pyramid(data, min_size=6)
+    assert [level.shape for level in levels] == [(32, 24), (16, 12), (8, 6)]
+    np.testing.assert_allclose(levels[2], data.reshape(8, 8, 6, 8).mean(axis=(1, 3)))
+
+
+def test_every_exported_map_has_pyramid(tmp_path):
+    base_dir, out_dir = str(tmp_path / "data"), str(tmp_path / "out")
+    generate_fixture(base_dir, n_methods=3, n_datasets=1, n_scenes=2, height=64, width=64)
+    methods = sorted(lfbench.get_methods_and_datasets(base_dir)[0])
+    # 预览金字塔覆盖所有导出 PNG 的方法，而不只是对比图中的方法
+    cfg = lfbench.load_config("v3", overrides=[
+        ("base_dir", base_dir), ("output_dir", out_dir), ("pipeline", ["discover", "load", "visualise"]),
+        ("stages.visualise.pyramid", True), ("stages.visualise.comparison", False),
+        ("stages.visualise.methods", methods[:1]), ("stages.visualise.workers", 1)])
+    os.makedirs(out_dir)
+    lfbench.run_pipeline(cfg)
+
+    path = os.path.join(out_dir, "pyramid", "HCI_LF1.npz")
+    gt = read_pfm(os.path.join(base_dir, "GTLF", "HCI", "LF1.pfm"))
+    for method in methods:
+        assert os.path.exists(os.path.join(out_dir, "png", method, "HCI", "LF1_disp.png"))
+        pred = read_pfm(os.path.join(base_dir, method, "HCI", "LF1.pfm"))
+        preview, value_range = load_preview(path, method, "error", max_size=32)
+        np.testing.assert_allclose(preview, block_mean_pyramid(np.abs(gt - pred), max_levels=1)[0], rtol=1e-5)
+        assert value_range == (np.nanmin(np.abs(gt - pred)), np.nanmax(np.abs(gt - pred)))
+    assert load_preview(path, "GTLF", "disp", max_size=16)[0].shape == (16, 16)
+
+    mtime = os.path.getmtime(path)
+    lfbench.run_pipeline(cfg)
+    assert os.path.getmtime(path) == mtime
+
+
+def test_cropped_gt_matches_method_maps(tmp_path):
+    base_dir, out_dir = str(tmp_path / "data"), str(tmp_path / "out")
+    crop = 22
+    generate_fixture(base_dir, n_methods=2, n_datasets=1, n_scenes=1, height=64, width=64, gt_crop=crop)
+    cfg = lfbench.load_config("v1", overrides=[
+        ("base_dir", base_dir), ("output_dir", out_dir), ("pipeline", ["discover", "load", "visualise"]),
+        ("stages.visualise.pyramid", True), ("stages.visualise.comparison", False),
+        ("stages.visualise.workers", 1)])
+    os.makedirs(out_dir)
+    ctx = lfbench.run_pipeline(cfg)
+
+    path = os.path.join(out_dir, "pyramid", "HCI_LF0.npz")
+    gt = read_pfm(os.path.join(base_dir, "GT", "HCI", "LF0.pfm"))[crop:-crop, crop:-crop]
+    assert load_preview(path, "GT", "disp", max_size=32)[0].shape == (32, 32)
+    for method in ctx.methods:
+        pred = read_pfm(os.path.join(base_dir, method, "HCI", "LF0.pfm"))
+        np.testing.assert_allclose(load_preview(path, method, "disp", max_size=32)[0],
+                                   block_mean_pyramid(pred, max_levels=1)[0], rtol=1e-5)
+        preview = load_preview(path, method, "error", max_size=32)[0]
+        np.testing.assert_allclose(preview, block_mean_pyramid(np.abs(gt - pred), max_levels=1)[0], rtol=1e-5)
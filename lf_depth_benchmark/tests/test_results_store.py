@@ -0,0 +1,138 @@
+import os
+import sqlite3
+
+import imageio.v2 as imageio
+import numpy as np
+
+import lfbench
+from depth_metrics import badpix_key, region_key
+from lf_fixtures import generate_fixture
+from lfbench import save_results_to_markdown
+from pfm_io import write_pfm
+from region_masks import MaskStore
+from results_store import ResultsStore, metric_params
+
+
+def _files(tmp_path):
+    pred, gt = str(tmp_path / "pred.pfm"), str(tmp_path / "gt.pfm")
+    write_pfm(np.zeros((4, 4), np.float32), pred)
+    write_pfm(np.ones((4, 4), np.float32), gt)
+    return pred, gt
+
+
+def test_changed_params_miss(tmp_path):
+    pred, gt = _files(tmp_path)
+    params = metric_params([0.07], crop_size=None, scale=100)
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        store.put("M", "D", "LF0.pfm", params, pred, gt, {"mse": 100.0})
+        assert store.get("M", "D", "LF0.pfm", params, pred, gt) == {"mse": 100.0}
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.07], None, scale=1), pred, gt) is None
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.03], None, 100), pred, gt) is None
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.07], 22, 100), pred, gt) is None
+        assert store.load_results(metric_params([0.07], None, scale=1)) == {}
+        assert store.load_results(params)["M"]["D"]["LF0.pfm"] == {"mse": 100.0}
+
+
+def test_changed_file_misses(tmp_path):
+    pred, gt = _files(tmp_path)
+    params = metric_params([0.07])
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        store.put("M", "D", "LF0.pfm", params, pred, gt, {"mse": 1.0})
+    write_pfm(np.zeros((5, 5), np.float32), pred)
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        assert store.get("M", "D", "LF0.pfm", params, pred, gt) is None
+
+
+def test_outdated_schema_rebuilt(tmp_path):
+    pred, gt = _files(tmp_path)
+    db = str(tmp_path / "r.sqlite")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE scene_results (method TEXT, dataset TEXT, scene TEXT, etas TEXT, crop INTEGER, "
+                 "pred_sig TEXT, gt_sig TEXT, metrics TEXT, updated REAL)")
+    conn.commit()
+    conn.close()
+    with ResultsStore(db) as store:
+        store.put("M", "D", "LF0.pfm", metric_params([0.07]), pred, gt, {"mse": 1.0})
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.07]), pred, gt) == {"mse": 1.0}
+
+
+def test_region_config_misses(tmp_path):
+    pred, gt = _files(tmp_path)
+    edge = MaskStore(str(tmp_path / "cache"), ["edges"]).config()
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        store.put("M", "D", "LF0.pfm", metric_params([0.07], regions=edge), pred, gt, {"mse": 1.0})
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.07], regions=edge), pred, gt) == {"mse": 1.0}
+        assert store.get("M", "D", "LF0.pfm", metric_params([0.07]), pred, gt) is None
+        for other in (MaskStore(str(tmp_path / "cache"), ["edges", "smooth"]),
+                      MaskStore(str(tmp_path / "cache"), ["edges"], band=5),
+                      MaskStore(str(tmp_path / "cache"), ["edges"], edge_thresh=0.2)):
+            assert store.get("M", "D", "LF0.pfm", metric_params([0.07], regions=other.config()), pred, gt) is None
+
+
+def test_user_mask_change_misses(tmp_path):
+    pred, gt = _files(tmp_path)
+    mask = tmp_path / "masks" / "D" / "LF0_sky.png"
+    mask.parent.mkdir(parents=True)
+    mask.write_bytes(b"a")
+    mask_store = MaskStore(str(tmp_path / "cache"), [], mask_dir=str(tmp_path / "masks"))
+    params = metric_params([0.07], regions=mask_store.config())
+    paths = list(mask_store.user_mask_paths("D", "LF0.pfm").values())
+    assert paths == [str(mask)]
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        store.put("M", "D", "LF0.pfm", params, pred, gt, {"mse": 1.0}, paths)
+        assert store.get("M", "D", "LF0.pfm", params, pred, gt, paths) == {"mse": 1.0}
+        assert store.get("M", "D", "LF0.pfm", params, pred, gt) is None
+    mask.write_bytes(b"changed")
+    with ResultsStore(str(tmp_path / "r.sqlite")) as store:
+        assert store.get("M", "D", "LF0.pfm", params, pred, gt, paths) is None
+
+
+def test_markdown_only_requested_regions(tmp_path):
+    scene = {"mse": 1.0, badpix_key(0.07): 2.0,
+             region_key("edges", "mse"): 3.0, region_key("edges", badpix_key(0.07)): 4.0}
+    results = {"M": {"D": {"LF0.pfm": scene, "average": scene}}}
+    save_results_to_markdown(results, str(tmp_path), [0.07], regions=[])
+    assert "### Region" not in (tmp_path / "D_results.md").read_text()
+    save_results_to_markdown(results, str(tmp_path), [0.07], regions=["edges"])
+    assert "### Region: edges" in (tmp_path / "D_results.md").read_text()
+
+
+def _refresh_cfg(tmp_path, base_dir, mask_dir):
+    return lfbench.load_config("v3", overrides=[
+        ("base_dir", base_dir), ("output_dir", str(tmp_path / "out")), ("pipeline", ["discover", "load", "score"]),
+        ("stages.score.workers", 1), ("stages.score.mask_dir", mask_dir)])
+
+
+def test_refresh_drops_deleted_files_and_rescores_mask_edits(tmp_path):
+    base_dir, mask_dir = str(tmp_path / "data"), str(tmp_path / "masks")
+    generate_fixture(base_dir, n_methods=2, n_datasets=1, n_scenes=2, height=32, width=32)
+    method = sorted(lfbench.get_methods_and_datasets(base_dir)[0])[0]
+    os.makedirs(os.path.join(mask_dir, "HCI"))
+    mask_path = os.path.join(mask_dir, "HCI", "LF0_roi.png")
+    mask = np.zeros((32, 32), np.uint8)
+    mask[:16] = 255
+    imageio.imwrite(mask_path, mask)
+    cfg = _refresh_cfg(tmp_path, base_dir, mask_dir)
+    os.makedirs(cfg["output_dir"])
+    store = lfbench.open_results_store(cfg)
+    lfbench.run_pipeline(cfg, store)
+    params = lfbench.config_metric_params(cfg)
+    before = store.load_results(params)[method]["HCI"]["LF0.pfm"][region_key("roi", "mse")]
+
+    # 只修改掩码也会重新评估对应场景
+    imageio.imwrite(mask_path, 255 - mask)
+    lfbench.refresh_changed(cfg, store, [mask_path])
+    after = store.load_results(params)[method]["HCI"]["LF0.pfm"][region_key("roi", "mse")]
+    assert after != before
+
+    pred_path = os.path.join(base_dir, method, "HCI", "LF1.pfm")
+    os.remove(pred_path)
+    lfbench.refresh_changed(cfg, store, [pred_path])
+    results = store.load_results(params)
+    assert "LF1.pfm" not in results[method]["HCI"] and "LF0.pfm" in results[method]["HCI"]
+    assert len(store.scenes()) == 3
+
+    os.remove(os.path.join(base_dir, "GTLF", "HCI", "LF0.pfm"))
+    assert lfbench.prune_results_store(cfg, store) == 2  # GT 被删除时所有方法的结果都删除
+    assert [scene for _, _, scene in store.scenes()] == ["LF1.pfm"]
+    store.close()
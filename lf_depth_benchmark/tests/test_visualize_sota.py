@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import imageio.v2 as imageio
+
+import visualize_sota
+from visualize_sota import save_figure
+
+
+def _figure(figsize):
+    # 图像四周是白色：按非白色像素裁剪会把它们裁掉，按元素范围裁剪（bbox_inches='tight'）则不会
+    yy, xx = np.mgrid[0:96, 0:128]
+    image = np.dstack([xx / 128, yy / 96, np.full(xx.shape, 0.5)])
+    image[:6] = 1
+    image[:, :6] = 1
+    fig, axes = plt.subplots(2, 3, figsize=figsize, gridspec_kw={"height_ratios": [96, 40]})
+    for ax in axes.flat:
+        ax.imshow(image)
+        ax.axis("off")
+    fig.tight_layout()
+    return fig
+
+
+@pytest.mark.parametrize("figsize, dpi", [((15, 9), 100), ((13.7, 4.1), 100), ((3.3, 2.2), 300), ((7.77, 3.13), 72)])
+def test_trim_matches_bbox_inches_tight(tmp_path, figsize, dpi):
+    fig = _figure(figsize)
+    save_figure(fig, str(tmp_path / "fast"), formats=("png", "pdf"), dpi=dpi)
+    fig.savefig(tmp_path / "ref.png", dpi=dpi, bbox_inches="tight", pad_inches=0.1)
+    plt.close(fig)
+    fast = imageio.imread(tmp_path / "fast.png")[..., :3].astype(np.int16)
+    ref = imageio.imread(tmp_path / "ref.png")[..., :3].astype(np.int16)
+    assert fast.shape == ref.shape
+    # savefig 按小数像素偏移重新绘制，裁剪只能取整，允许插值带来的微小差异
+    assert np.abs(fast - ref).mean() < 3
+    for axis in (0, 1):
+        fast_content = np.flatnonzero((fast < 250).any(axis=(axis, 2)))
+        ref_content = np.flatnonzero((ref < 250).any(axis=(axis, 2)))
+        assert abs(fast_content[0] - ref_content[0]) <= 1 and abs(fast_content[-1] - ref_content[-1]) <= 1
+    assert (tmp_path / "fast.pdf").read_bytes().startswith(b"%PDF")
+
+
+def test_unknown_format_rejected(tmp_path):
+    fig = _figure((3, 2))
+    with pytest.raises(ValueError):
+        save_figure(fig, str(tmp_path / "x"), formats=("png", "tiff"))
+    plt.close(fig)
+
+
+def _fake_render(scene, options):
+    if scene["lf_index"] == 1:
+        raise RuntimeError("broken scene")
+    return [f"{scene['dataset']}_{scene['lf_index']}.png"]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_render_batch_continues_after_failure(monkeypatch, capsys, num_workers):
+    scenes = [{"dataset": "HCI", "lf_index": i} for i in range(3)]
+    monkeypatch.setattr(visualize_sota, "load_batch_config", lambda path: ({}, scenes))
+    monkeypatch.setattr(visualize_sota, "_render_scene", _fake_render)
+    assert visualize_sota.render_batch(num_workers=num_workers) == ["HCI_0.png", "HCI_2.png"]
+    assert "Failed to render HCI LF1: broken scene" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import json
+import os
+
+import work_queue
+from work_queue import WorkQueue
+
+
+def _stale(queue, job_id):
+    lock_path = queue._path("locks", job_id, ".lock")
+    os.utime(lock_path, (0, 0))
+    return lock_path
+
+
+def _owner(lock_path):
+    with open(lock_path) as f:
+        return json.load(f)["worker"]
+
+
+def test_lost_lock_not_released_or_completed(tmp_path):
+    a, b = WorkQueue(str(tmp_path)), WorkQueue(str(tmp_path))
+    a.enqueue([{"scene": 0}])
+    job_id, _ = a.claim()
+    lock_path = _stale(a, job_id)
+    assert b.claim()[0] == job_id
+    assert _owner(lock_path) == b.worker_id
+
+    a.release(job_id)
+    assert not a.complete(job_id, {"value": "a"})
+    assert _owner(lock_path) == b.worker_id and not a.is_done(job_id)
+
+    assert b.complete(job_id, {"value": "b"})
+    assert not os.path.exists(lock_path)
+    assert a.results()[0][2] == {"value": "b"}
+
+
+def test_reclaim_backs_off_when_refreshed(tmp_path, monkeypatch):
+    a, b = WorkQueue(str(tmp_path)), WorkQueue(str(tmp_path))
+    a.enqueue([{"scene": 0}])
+    job_id, _ = a.claim()
+    lock_path = _stale(a, job_id)
+    rename = os.rename
+
+    def heartbeat_then_rename(src, dst):
+        os.utime(src)  # 持有者的心跳恰好发生在 b 检查之后、rename 之前
+        rename(src, dst)
+
+    monkeypatch.setattr(work_queue.os, "rename", heartbeat_then_rename)
+    assert b.claim() is None
+    monkeypatch.undo()
+    assert _owner(lock_path) == a.worker_id
+    assert not [name for name in os.listdir(os.path.dirname(lock_path)) if ".stale." in name]
+    assert a.complete(job_id, {"value": "a"})
+
+
+def test_complete_never_overwrites_published_result(tmp_path, monkeypatch):
+    a, b = WorkQueue(str(tmp_path)), WorkQueue(str(tmp_path))
+    a.enqueue([{"scene": 0}])
+    job_id, _ = a.claim()
+    _stale(a, job_id)
+    assert b.claim()[0] == job_id
+    assert b.complete(job_id, {"value": "b"})
+
+    monkeypatch.setattr(a, "owns", lambda job_id: True)  # a 的检查恰好发生在 b 回收锁之前
+    assert not a.complete(job_id, {"value": "a"})
+    assert a.results()[0][2] == {"value": "b"}
+    assert os.listdir(os.path.join(str(tmp_path), "results")) == [f"{job_id}.json"]
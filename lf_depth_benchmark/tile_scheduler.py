@@ -0,0 +1,165 @@
+"""
+切块视差估计的自适应调度
+
+原 disparity_estimation 的切块路径固定 stride = patchsize // 2，每个像素约被计算 4 次，
+且 minibatch_test 固定，与可用内存无关。这里：
+- 重叠大小可配置（默认 patchsize // 4，每个像素约被计算 (4/3)^2 ≈ 1.8 次）
+- 用羽化权重（重叠区线性渐变）加权融合，代替 LFintegrate 只取中心区域的拼接方式
+- 根据内存预算自动确定 batch 大小（实测单个 patch 的峰值内存：CUDA 上为显存，Linux CPU 上为常驻内存）
+
+会用到 LFintegrate 丢弃的块边缘输出，视差图与 fixed 方式不同，因此 test_OACCNet 默认仍为 --tiling fixed。
+- 按 range(0, n, batch) 切分，正确处理最后一个不满的 batch（包括总数小于 batch 的情况）
+"""
+import re
+
+import numpy as np
+import torch
+from einops import rearrange
+
+# 无法实测（非 Linux 的 CPU）时，单个 patch 推理所需内存相对输入大小的放大系数。
+# 这只是粗略的经验值，没有针对具体网络标定（多层 64 通道卷积的实测值可达数百倍），
+# 在这类平台上应通过 --mem_budget_mb 0 和 --minibatch_test 直接指定 batch 大小
+DEFAULT_ACTIVATION_FACTOR = 64
+
+# auto_batch_size 的结果按 (网络, 角分辨率, 块大小, 设备, 预算) 缓存，每个光场不必重新探测
+_batch_size_cache = {}
+
+
+def tile_starts(length, patch, stride):
+    """
+    一维切块起点：0, stride, 2 * stride, ...，最后一块与边界对齐，保证覆盖 [0, length)
+
+    参数:
+        length: 图像边长（已保证 >= patch）
+        patch: 块大小
+        stride: 步长
+    """
+    if length <= patch:
+        return [0]
+    starts = list(range(0, length - patch, stride))
+    starts.append(length - patch)
+    return starts
+
+
+def feather_weights(patch, overlap):
+    """
+    二维羽化权重：块中心为 1，向边缘在 overlap 宽度内线性下降（不降到 0），可分离外积
+    """
+    if overlap <= 0:
+        return np.ones((patch, patch), dtype=np.float32)
+    i = np.arange(patch, dtype=np.float32)
+    ramp = np.minimum(1.0, np.minimum(i + 0.5, patch - i - 0.5) / overlap).astype(np.float32)
+    return np.outer(ramp, ramp)
+
+
+def plan_tiles(height, width, patch, overlap):
+    """返回所有块的左上角坐标 [(y, x), ...]。"""
+    stride = max(1, patch - overlap)
+    return [(y, x) for y in tile_starts(height, patch, stride) for x in tile_starts(width, patch, stride)]
+
+
+def _vm_status_bytes(field):
+    try:
+        with open("/proc/self/status") as f:
+            match = re.search(rf"^{field}:\s+(\d+) kB", f.read(), re.MULTILINE)
+    except OSError:
+        return None
+    return int(match.group(1)) * 1024 if match else None
+
+
+def _cpu_peak_bytes(fn):
+    """执行 fn，返回期间常驻内存峰值相对执行前的增量（字节）；不支持 /proc/self/clear_refs 时返回 None。"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # 把峰值 (VmHWM) 重置为当前常驻内存
+    except OSError:
+        return None
+    base = _vm_status_bytes("VmRSS")
+    fn()
+    peak = _vm_status_bytes("VmHWM")
+    return None if base is None or peak is None else peak - base
+
+
+def auto_batch_size(net, ang_res, patch, device, mem_budget_mb, max_batch=64):
+    """
+    根据内存预算确定 batch 大小
+
+    用一个 patch 实测推理的峰值内存增量：CUDA 上为显存，CPU 上为常驻内存（Linux）；
+    都无法实测时按输入大小 * DEFAULT_ACTIVATION_FACTOR 估算。
+    """
+    key = (id(net), ang_res, patch, str(device), mem_budget_mb, max_batch)
+    if key in _batch_size_cache:
+        return _batch_size_cache[key]
+    input_bytes = ang_res * ang_res * patch * patch * 4
+    per_patch = input_bytes * DEFAULT_ACTIVATION_FACTOR
+    if str(device).startswith('cuda') and torch.cuda.is_available():
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        base = torch.cuda.memory_allocated(device)
+        probe = torch.zeros((1, 1, ang_res * patch, ang_res * patch), device=device)
+        with torch.inference_mode():
+            net(probe)
+        torch.cuda.synchronize(device)
+        per_patch = max(input_bytes, torch.cuda.max_memory_allocated(device) - base)
+        del probe
+    elif not str(device).startswith('cuda'):
+        probe = torch.zeros((1, 1, ang_res * patch, ang_res * patch), device=device)
+
+        def run_probe():
+            with torch.inference_mode():
+                net(probe)
+
+        measured = _cpu_peak_bytes(run_probe)
+        if measured is not None:
+            per_patch = max(input_bytes, measured)
+    batch_size = int(max(1, min(max_batch, mem_budget_mb * 1024 * 1024 // per_patch)))
+    _batch_size_cache[key] = batch_size
+    print(f"Tiling: batch size {batch_size} for a {mem_budget_mb} MB budget (~{per_patch / 2 ** 20:.1f} MB per patch)")
+    return batch_size
+
+
+def tiled_disparity(lf, net, device, patch, overlap=None, batch_size=None, mem_budget_mb=1024, context=None):
+    """
+    切块推理并加权融合
+
+    参数:
+        lf: (u, v, H, W) float32 光场灰度
+        net: 输入 (b, 1, u * p, v * p)，输出 (b, 1, p, p) 的视差网络
+        device: 推理设备
+        patch: 块大小
+        overlap: 相邻块的重叠像素数，默认 patch // 4
+        batch_size: 每批块数，None 时按 mem_budget_mb 自动确定
+        context: 推理上下文（如 cpu_inference.inference_context(cfg)），默认 torch.inference_mode()
+    返回:
+        disp: (H, W) float32 视差图
+    """
+    u, v, height, width = lf.shape
+    overlap = patch // 4 if overlap is None else int(overlap)
+    if not 0 <= overlap < patch:
+        raise ValueError(f"overlap must be in [0, {patch}), got {overlap}")
+
+    # 图像小于块大小时镜像填充
+    pad_h, pad_w = max(0, patch - height), max(0, patch - width)
+    if pad_h or pad_w:
+        lf = np.pad(lf, ((0, 0), (0, 0), (0, pad_h), (0, pad_w)), mode="reflect")
+    full_h, full_w = lf.shape[2:]
+
+    tiles = plan_tiles(full_h, full_w, patch, overlap)
+    if batch_size is None:
+        batch_size = auto_batch_size(net, u, patch, device, mem_budget_mb)
+    weights = feather_weights(patch, overlap)
+    disp = np.zeros((full_h, full_w), dtype=np.float32)
+    weight_sum = np.zeros((full_h, full_w), dtype=np.float32)
+
+    with (context if context is not None else torch.inference_mode()):
+        for start in range(0, len(tiles), batch_size):
+            batch_tiles = tiles[start:start + batch_size]  # 最后一批可能不满
+            patches = np.stack([lf[:, :, y:y + patch, x:x + patch] for y, x in batch_tiles])
+            input_data = rearrange(torch.from_numpy(patches), 'b u v h w -> b 1 (u h) (v w)')
+            out = net(input_data.to(device)).float().cpu().numpy()[:, 0]
+            for (y, x), out_patch in zip(batch_tiles, out):
+                disp[y:y + patch, x:x + patch] += out_patch * weights
+                weight_sum[y:y + patch, x:x + patch] += weights
+
+    disp /= weight_sum
+    return disp[:height, :width]
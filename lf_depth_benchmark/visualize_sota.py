@@ -1,5 +1,9 @@
 import os
+import argparse
 import fnmatch
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import numpy as np
 import matplotlib.pyplot as plt
 import cv2
@@ -7,8 +11,12 @@ from glob import glob
 from matplotlib.colors import Normalize
 from matplotlib import cm
 from matplotlib import gridspec
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
 import imageio.v2 as imageio
 
+from lf_pack import LightFieldViews
+
 
 def load_image(image_path):
     """加载图像并转换为float32格式的numpy数组。"""
@@ -28,6 +36,11 @@ def plot_colormap(dataset, lf_index, output_dir, cmap="hot"):
 def extract_epi(images, h, h_scale:int =2):
     """从多个角度的光场图像提取水平方向EPI。"""
     epi = np.stack([img[h, :, :] for img in images], axis=0)
+    return resize_epi(epi, h_scale)
+
+
+def resize_epi(epi, h_scale:int =2):
+    """将EPI在角度方向放大h_scale倍并加绿色边框。"""
     if h_scale <= 1:
         return epi
     # 对epi的h进行resize放大两倍, bilinear插值
@@ -73,7 +86,61 @@ def merge_zoomed_areas(zoomed_areas, target_width, gap=4):
     return merged_areas
 
 
-def plot_gt_images(gt_images, output_path, dpi=300, jpg_quality=85):
+def _crop_to_bbox(rgb, bbox, dpi):
+    """
+    从整张图的光栅中取出 bbox（英寸，原点在左下角）对应的区域，超出画布的部分填白色
+
+    参数:
+        rgb: (H, W, 3) uint8，整张 figure 的光栅
+        bbox: matplotlib Bbox（英寸）
+    """
+    height, width = rgb.shape[:2]
+    # 尺寸的计算和取整方式与 savefig(bbox_inches='tight') 相同（见 FigureCanvasBase.get_width_height），
+    # 并与其一样以左下角对齐
+    out_w, out_h = (bbox.size * dpi + 1e-8).astype(int)
+    x0, y0 = np.round(bbox.p0 * dpi).astype(int)
+    top = height - y0 - out_h
+    out = np.full((out_h, out_w, 3), 255, dtype=np.uint8)
+    src_x0, src_y0 = max(0, x0), max(0, top)
+    src_x1, src_y1 = min(width, x0 + out_w), min(height, top + out_h)
+    if src_x1 > src_x0 and src_y1 > src_y0:
+        out[src_y0 - top:src_y1 - top, src_x0 - x0:src_x1 - x0] = rgb[src_y0:src_y1, src_x0:src_x1]
+    return out
+
+
+def save_figure(fig, output_path, formats=("png", "jpg", "pdf"), dpi=300, jpg_quality=85, pad_inches=0.1):
+    """
+    PNG/JPG 只光栅化一次再分别编码（代替每个格式各调用一次 plt.savefig，每次都会重新绘制整张图）；
+    PDF 仍用 savefig 保存为矢量文件，其中的图像保持原始分辨率。
+
+    裁剪范围与 bbox_inches='tight' 相同：fig.get_tightbbox() 按各元素的范围计算（而不是按非白色像素），
+    再向外扩展 pad_inches。
+
+    参数:
+        fig: matplotlib Figure
+        output_path (str): 输出路径（不含扩展名）
+        formats (tuple): 输出格式，"png" / "jpg" / "pdf"
+    """
+    unknown = set(formats) - {"png", "jpg", "pdf"}
+    if unknown:
+        raise ValueError(f"不支持的输出格式: {sorted(unknown)}")
+    raster_formats = [fmt for fmt in formats if fmt != "pdf"]
+    if raster_formats:
+        fig.set_dpi(dpi)
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        bbox = fig.get_tightbbox(canvas.get_renderer()).padded(pad_inches)
+        image = Image.fromarray(_crop_to_bbox(np.asarray(canvas.buffer_rgba())[..., :3], bbox, dpi))
+        for fmt in raster_formats:
+            if fmt == "png":
+                image.save(output_path + ".png", dpi=(dpi, dpi))
+            else:
+                image.save(output_path + ".jpg", quality=jpg_quality, dpi=(dpi, dpi))
+    if "pdf" in formats:
+        fig.savefig(output_path + ".pdf", format="pdf", bbox_inches="tight", pad_inches=pad_inches)
+
+
+def plot_gt_images(gt_images, output_path, dpi=300, jpg_quality=85, formats=("png", "jpg", "pdf")):
     """
     绘制 GT 图像，将 "中心视点"、"局部放大"、"EPI 图" 这三张图像按照垂直排列保存为 PNG 图像。
     确保行间距与其他方法的布局一致。
@@ -108,15 +175,13 @@ def plot_gt_images(gt_images, output_path, dpi=300, jpg_quality=85):
         ax.axis('off')  # 不显示坐标轴
 
     # 调整布局并保存图像
-    plt.tight_layout()  # 进一步调整整体布局，减少子图边距
-    plt.savefig(output_path + "_gt.png", format='png', dpi=dpi, bbox_inches='tight')
-    # 保存为 JPEG 格式，设置质量为 85
-    plt.savefig(output_path + "_gt.jpg", format='jpg', dpi=dpi, pil_kwargs={"quality": jpg_quality}, bbox_inches='tight')
-    plt.savefig(output_path + "_gt.pdf", format='pdf', bbox_inches='tight')
+    fig.tight_layout()  # 进一步调整整体布局，减少子图边距
+    save_figure(fig, output_path + "_gt", formats, dpi, jpg_quality)
     plt.close(fig)
 
 
-def plot_sota_visual_comparison(method_images, output_path, cmap="hot", dpi=300, jpg_quality=85):
+def plot_sota_visual_comparison(method_images, output_path, cmap="hot", dpi=300, jpg_quality=85,
+                                formats=("png", "jpg", "pdf")):
     """
     绘制视觉对比图，将不同方法的图像按列排列，每列从上到下依次是中心视点、局部放大、EPI 图、误差图。
     确保每个方法的子图宽度一致，高度根据输入图像自适应。
@@ -127,7 +192,7 @@ def plot_sota_visual_comparison(method_images, output_path, cmap="hot", dpi=300,
     """
     # 从字典method_images提取key为GTLF的数据, 并从字典中移除, 单独处理
     gt_images = method_images.pop("GTLF")[:-1]  # 最后一个误差图是全0, 扔掉
-    plot_gt_images(gt_images, output_path, dpi, jpg_quality)
+    plot_gt_images(gt_images, output_path, dpi, jpg_quality, formats)
     # 获取方法数量和每种方法的图像数量
     num_methods = len(method_images)
     num_images_per_method = 4  # 每种方法有4张图片：中心视点、局部放大、EPI 图、误差图
@@ -171,84 +236,177 @@ def plot_sota_visual_comparison(method_images, output_path, cmap="hot", dpi=300,
                 # ax.set_title(method_name, fontsize=16)
 
     # 保存图像（去除多余白边）
-    plt.tight_layout()  # 进一步调整整体布局，减少子图边距
-    plt.savefig(output_path + ".png", format='png', dpi=dpi, bbox_inches='tight')
-    # 保存为 JPEG 格式，设置质量为 85
-    plt.savefig(output_path + ".jpg", format='jpg', dpi=dpi, pil_kwargs={"quality": jpg_quality}, bbox_inches='tight')
-    plt.savefig(output_path + ".pdf", format='pdf', bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()  # 进一步调整整体布局，减少子图边距
+    save_figure(fig, output_path, formats, dpi, jpg_quality)
+    plt.close(fig)
 
 
-def process_light_field(folder, dataset, lf_index, zoom_regions, epi_h:int):
-    """处理单个光场，生成视觉对比图。"""
+def process_light_field(folder, dataset, lf_index, zoom_regions, epi_h, ang_res:int =7, view_cache=None,
+                        output_dir="visual_sota", cmap="hot", dpi=300, jpg_quality=85, formats=("png", "jpg", "pdf")):
+    """
+    处理单个光场，生成视觉对比图。
+
+    每个方法的中心视点只读取一次，误差图和对比图两个阶段共用；局部放大区域直接从中心视点切片。
+    epi_h 也可以是多个行号的列表，此时误差图只计算一次，每条EPI线各生成一张对比图；所有EPI线的行
+    在一次 rows() 调用中读出，中心行的每个视点只解码一次（未打包时不缓存整张视点）。
+    view_cache (dict) 在多次调用间共享 LightFieldViews（打包文件的 memmap 和已解码的中心视点）。
+    """
     methods = ["GTLF", "GC2ASR", "DispEhcASR", "ELFR", "FS-GAF", "HLFASR", "DistgASR"]
-    gt_folder = os.path.join(folder, "GTLF", dataset)
-    gt_path = os.path.join(gt_folder, f"LF{lf_index}_view24_fine.png")
-    ground_truth = load_image(gt_path)
+    center = (ang_res // 2) * ang_res + ang_res // 2  # 7x7时为view24
+    epi_views = range((ang_res // 2) * ang_res, (ang_res // 2 + 1) * ang_res)  # 7x7时为view21~view27
+    epi_rows = [epi_h] if isinstance(epi_h, int) else list(epi_h)
+    if view_cache is None:
+        view_cache = {}
+
+    def get_views(method):
+        key = (folder, method, dataset, lf_index, ang_res)
+        if key not in view_cache:
+            view_cache[key] = LightFieldViews(os.path.join(folder, method, dataset), lf_index, ang_res)
+        return view_cache[key]
+
+    ground_truth = get_views("GTLF").view(center)
 
-    output_dir = "visual_sota"
     os.makedirs(output_dir, exist_ok=True)
 
     # 计算所有方法的误差，并找出最大误差值
     max_error = 0
-    method_images = {}
     error_maps = {}
+    centers = {}
+    epis = {}
 
     for method in methods:
-        method_folder = os.path.join(folder, method, dataset)
-        img_path = os.path.join(method_folder, f"LF{lf_index}_view24_fine.png")
-
-        if not os.path.exists(img_path):
+        views = get_views(method)
+        if not views.exists(center):
             print(f"{method} not found for LF{lf_index}")
             continue
 
-        reconstructed = load_image(img_path)
-        error_map = np.mean(np.abs(reconstructed - ground_truth), axis=-1)
+        centers[method] = views.view(center)
+        epis[method] = views.rows(epi_views, epi_rows)  # (EPI线数, 视点数, w, c)
+        error_map = np.mean(np.abs(centers[method] - ground_truth), axis=-1)
         max_error = max(max_error, np.max(error_map))
         error_maps[method] = error_map
 
-    # 归一化误差图并生成可视化
-    for method in methods:
-        if method not in error_maps:
-            print(f"{method} not found for LF{lf_index}")
-            continue
-
-        method_folder = os.path.join(folder, method, dataset)
-        img_path = os.path.join(method_folder, f"LF{lf_index}_view24_fine.png")
-        reconstructed = load_image(img_path)
-        zoomed_areas = [reconstructed[y:y + h, x:x + w] for (x, y, h, w) in zoom_regions]
-        merged_zoomed_areas = merge_zoomed_areas(zoomed_areas, reconstructed.shape[1])  # 第一个zoom用红色、第二个用蓝色
-        reconstructed_with_boxes = draw_zoom_boxes(reconstructed, zoom_regions, epi_h)
-        normalized_error_map = error_maps[method] / max_error  # 归一化误差图
-        epi_images = [load_image(os.path.join(method_folder, f"LF{lf_index}_view{j}_fine.png")) for j in range(21, 28)]
-        epi = extract_epi(epi_images, epi_h, h_scale=4)
-
-        method_images[method] = [reconstructed_with_boxes, merged_zoomed_areas, epi, normalized_error_map]
-
-    cmap = "hot"  # "bwr"
-    output_path = os.path.join(output_dir, f"{dataset}_LF{lf_index}_epi{epi_h}_comparison")
-    plot_sota_visual_comparison(method_images, output_path, cmap)
+    output_paths = []
+    for k, epi_h in enumerate(epi_rows):
+        # 归一化误差图并生成可视化
+        method_images = {}
+        for method in methods:
+            if method not in error_maps:
+                continue
+
+            reconstructed = centers[method]
+            zoomed_areas = [reconstructed[y:y + h, x:x + w] for (x, y, h, w) in zoom_regions]
+            merged_zoomed_areas = merge_zoomed_areas(zoomed_areas, reconstructed.shape[1])  # 第一个zoom用红色、第二个用蓝色
+            reconstructed_with_boxes = draw_zoom_boxes(reconstructed, zoom_regions, epi_h)
+            normalized_error_map = error_maps[method] / max_error  # 归一化误差图
+            epi = resize_epi(epis[method][k], h_scale=4)
+
+            method_images[method] = [reconstructed_with_boxes, merged_zoomed_areas, epi, normalized_error_map]
+
+        output_path = os.path.join(output_dir, f"{dataset}_LF{lf_index}_epi{epi_h}_comparison")
+        plot_sota_visual_comparison(method_images, output_path, cmap, dpi, jpg_quality, formats)
+        print(f"Visual comparison saved to {output_path}.png, max error is {max_error}")
+        output_paths.append(output_path)
     plot_colormap(dataset, lf_index, output_dir, cmap)
-    print(f"Visual comparison saved to {output_path}.png, max error is {max_error}")
+    return output_paths
+
+
+# 默认选取的光场: [光场编号, [(x, y, h, w) 红框, (x, y, h, w) 蓝框], EPI 行号]
+SELECTED_LFS = {
+    "HCI": [
+        [3, [(30, 30, 40, 80), (200, 100, 30, 80)], 50],
+    ],
+    "HCI_old": [
+        [3, [(30, 30, 40, 80), (200, 100, 30, 80)], 50],
+    ],
+    "Inria_DLFD": [
+        [0, [(30, 30, 40, 80), (200, 100, 30, 80)], 50],
+    ],
+}
+
+
+def load_batch_config(config_path=None):
+    """
+    读取批量渲染配置（JSON），未指定时使用 SELECTED_LFS。配置格式:
+
+        {
+            "folder": "ReconLFs", "output_dir": "visual_sota", "ang_res": 7,
+            "cmap": "hot", "dpi": 300, "jpg_quality": 85, "formats": ["png", "jpg", "pdf"],
+            "scenes": [
+                {"dataset": "HCI", "lf_index": 3, "zoom_regions": [[30, 30, 40, 80], [200, 100, 30, 80]],
+                 "epi_h": [50, 120]}
+            ]
+        }
+
+    返回:
+        options (dict): 除 scenes 外的公共参数
+        scenes (list): 每个光场一项，同一光场的多条 EPI 线合并到一项中
+    """
+    if config_path is None:
+        config = {"scenes": [{"dataset": dataset, "lf_index": lf_index, "zoom_regions": zoom_regions, "epi_h": epi_h}
+                             for dataset, lfs in SELECTED_LFS.items() for lf_index, zoom_regions, epi_h in lfs]}
+    else:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+    merged = {}
+    for scene in config.pop("scenes"):
+        zoom_regions = [tuple(region) for region in scene["zoom_regions"]]
+        if len(zoom_regions) != 2:
+            raise ValueError(f"{scene['dataset']} LF{scene['lf_index']}: zoom_regions 应包含红、蓝两个区域")
+        key = (scene["dataset"], scene["lf_index"], tuple(zoom_regions))
+        epi_h = scene["epi_h"]
+        merged.setdefault(key, []).extend([epi_h] if isinstance(epi_h, int) else epi_h)
+    scenes = [{"dataset": dataset, "lf_index": lf_index, "zoom_regions": list(zoom_regions), "epi_h": epi_rows}
+              for (dataset, lf_index, zoom_regions), epi_rows in merged.items()]
+    return config, scenes
+
+
+def _render_scene(scene, options):
+    """进程池任务：渲染一个光场的所有 EPI 线。"""
+    plt.switch_backend("Agg")
+    return process_light_field(options.get("folder", "ReconLFs"), scene["dataset"], scene["lf_index"],
+                               scene["zoom_regions"], scene["epi_h"], ang_res=options.get("ang_res", 7),
+                               output_dir=options.get("output_dir", "visual_sota"), cmap=options.get("cmap", "hot"),
+                               dpi=options.get("dpi", 300), jpg_quality=options.get("jpg_quality", 85),
+                               formats=tuple(options.get("formats", ("png", "jpg", "pdf"))))
+
+
+def render_batch(config_path=None, num_workers=None):
+    """
+    批量渲染配置中的所有光场：每个光场一个任务，在进程池中以 Agg 后端并行渲染
+
+    参数:
+        config_path (str): JSON 配置文件路径，None 时使用 SELECTED_LFS
+        num_workers (int): 进程数，默认 CPU 核数，1 表示在当前进程中串行渲染
+    """
+    options, scenes = load_batch_config(config_path)
+    num_workers = num_workers or os.cpu_count() or 1
+    outputs = []
+
+    # 串行和并行都逐个光场捕获异常：某个光场失败时报告并继续渲染其余光场
+    def collect(scene, render):
+        try:
+            outputs.extend(render())
+        except Exception as e:
+            print(f"Failed to render {scene['dataset']} LF{scene['lf_index']}: {e}")
+
+    if num_workers <= 1 or len(scenes) <= 1:
+        for scene in scenes:
+            collect(scene, partial(_render_scene, scene, options))
+        return outputs
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(scenes))) as executor:
+        futures = [executor.submit(_render_scene, scene, options) for scene in scenes]
+        for scene, future in zip(scenes, futures):
+            collect(scene, future.result)
+    return outputs
 
 
 if __name__ == '__main__':
     # 示例调用
     # process_light_field("ReconLFs", "HCI", 3, [(30, 30, 40, 80), (200, 100, 30, 80)], 50)
-    selected_lfs = {
-        "HCI": [
-            [3, [(30, 30, 40, 80), (200, 100, 30, 80)], 50],
-            [3, [(30, 30, 40, 80), (200, 100, 30, 80)], 50]
-        ],
-        "HCI_old": [
-            [3, (30, 30, 40, 80), (200, 100, 30, 80), 50],
-            [3, (30, 30, 40, 80), (200, 100, 30, 80), 50]
-        ],
-        "Inria_DLFD": [
-            [0, (30, 30, 40, 80), (200, 100, 30, 80), 50],
-            [0, (30, 30, 40, 80), (200, 100, 30, 80), 50]
-        ],
-    }
-    for dataset, lfs in selected_lfs.items():
-        for lf_index, zoom_regions, epi_h in lfs:
-            process_light_field("ReconLFs", dataset, lf_index, zoom_regions, epi_h)
+    parser = argparse.ArgumentParser(description="批量生成 SOTA 方法视觉对比图")
+    parser.add_argument("--config", type=str, default=None, help="JSON 配置文件，未指定时使用 SELECTED_LFS")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认 CPU 核数")
+    args = parser.parse_args()
+    render_batch(args.config, args.workers)
@@ -0,0 +1,278 @@
+"""
+基于共享文件系统（如 NFS）的分布式任务队列
+
+目录结构（work_dir 位于所有机器都能访问的共享挂载上）：
+    manifest.json           enqueue 时写入的任务清单（顺序与元数据），供 reducer 使用
+    jobs/<job_id>.json      任务描述，enqueue 写入
+    locks/<job_id>.lock     认领锁，O_CREAT | O_EXCL 原子创建；持有者定期更新 mtime 作为心跳
+    results/<job_id>.json   结果分片，先写临时文件再 link 发布，出现即表示任务完成
+
+锁文件中记录持有者的 worker id。锁的 mtime 超过 stale_after 秒未更新视为持有者已失联：先把锁 rename 成
+唯一的墓碑文件（同一个源文件只有一个 rename 能成功），再检查墓碑的持有者和 mtime 与 rename 前一致
+（期间被心跳刷新或已被别的 worker 重新认领时放回原处并放弃），最后删除墓碑并重新用 O_EXCL 认领。
+心跳、提交结果和释放锁之前都会确认锁仍属于自己；失去锁的 worker 停止心跳并丢弃结果。
+确认与发布之间仍有很小的窗口（共享文件系统上无法原子地“检查锁并写入”），因此结果分片用 os.link
+发布：已存在时不覆盖，每个任务的分片只写入一次且内容完整，但在锁被回收的瞬间可能来自刚失去锁的 worker。
+"""
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+
+def _write_json_atomic(path, obj):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _lock_state(path):
+    """返回 (持有者, mtime)；文件不存在时返回 None。"""
+    try:
+        with open(path) as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            owner = json.load(f).get("worker")
+    except FileNotFoundError:
+        return None
+    except ValueError:  # 持有者刚创建文件、尚未写完内容
+        owner = None
+    return owner, mtime
+
+
+def _restore_lock(tombstone, lock_path):
+    # link 不会覆盖已存在的文件：期间已有其他 worker 认领时直接丢弃墓碑
+    try:
+        os.link(tombstone, lock_path)
+    except FileExistsError:
+        pass
+    os.remove(tombstone)
+
+
+class Heartbeat:
+    """后台线程定期更新锁文件的 mtime；锁不再属于 worker_id 时停止。"""
+
+    def __init__(self, lock_path, worker_id, interval):
+        self.lock_path = lock_path
+        self.worker_id = worker_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            state = _lock_state(self.lock_path)
+            if state is None or state[0] != self.worker_id:  # 锁已被当作失联回收
+                print(f"[{self.worker_id}] lost lock {self.lock_path}")
+                return
+            try:
+                os.utime(self.lock_path)
+            except FileNotFoundError:  # 检查之后刚被回收，下一轮确认
+                pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class WorkQueue:
+    """
+    参数:
+        work_dir: 共享工作目录
+        stale_after: 锁超过该秒数未更新视为失联，可被其他 worker 回收
+        heartbeat: 心跳间隔（秒），应明显小于 stale_after
+    """
+
+    def __init__(self, work_dir, stale_after=120.0, heartbeat=10.0):
+        self.work_dir = work_dir
+        self.stale_after = stale_after
+        self.heartbeat = heartbeat
+        # 同一进程中的多个队列实例（如多个线程）也需要不同的 id
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        for sub in ("jobs", "locks", "results"):
+            os.makedirs(os.path.join(work_dir, sub), exist_ok=True)
+
+    def _path(self, sub, job_id, ext):
+        return os.path.join(self.work_dir, sub, job_id + ext)
+
+    @staticmethod
+    def job_id(spec):
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+    def enqueue(self, specs):
+        """写入任务描述（已存在的任务不重复写入），返回 job_id 列表。"""
+        ids = []
+        for spec in specs:
+            job_id = self.job_id(spec)
+            path = self._path("jobs", job_id, ".json")
+            if not os.path.exists(path):
+                _write_json_atomic(path, spec)
+            ids.append(job_id)
+        return ids
+
+    def write_manifest(self, manifest):
+        _write_json_atomic(os.path.join(self.work_dir, "manifest.json"), manifest)
+
+    def read_manifest(self):
+        with open(os.path.join(self.work_dir, "manifest.json")) as f:
+            return json.load(f)
+
+    def job_ids(self):
+        """当前任务列表：有清单时以清单为准（之前 enqueue 的旧任务不再执行），否则为 jobs/ 下的全部任务。"""
+        if os.path.exists(os.path.join(self.work_dir, "manifest.json")):
+            return list(self.read_manifest()["jobs"])
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.work_dir, "jobs")) if name.endswith(".json"))
+
+    def is_done(self, job_id):
+        return os.path.exists(self._path("results", job_id, ".json"))
+
+    def _try_lock(self, job_id):
+        lock_path = self._path("locks", job_id, ".lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({"worker": self.worker_id, "time": time.time()}, f)
+        return True
+
+    def owns(self, job_id):
+        state = _lock_state(self._path("locks", job_id, ".lock"))
+        return state is not None and state[0] == self.worker_id
+
+    def _reclaim_if_stale(self, job_id):
+        lock_path = self._path("locks", job_id, ".lock")
+        state = _lock_state(lock_path)
+        if state is None:
+            return True
+        age = time.time() - state[1]
+        if age < self.stale_after:
+            return False
+        tombstone = f"{lock_path}.stale.{uuid.uuid4().hex}"
+        try:
+            os.rename(lock_path, tombstone)
+        except FileNotFoundError:  # 已被其他 worker 回收
+            return False
+        # 检查与 rename 之间锁可能被心跳刷新，或被回收后由别的 worker 重新认领
+        if _lock_state(tombstone) != state:
+            _restore_lock(tombstone, lock_path)
+            return False
+        os.remove(tombstone)
+        print(f"[{self.worker_id}] reclaimed stale job {job_id} (no heartbeat for {age:.0f}s)")
+        return True
+
+    def claim(self):
+        """
+        认领一个未完成的任务
+
+        返回:
+            (job_id, spec)；没有可认领的任务时返回 None（可能仍有任务正被其他 worker 执行）
+        """
+        ids = self.job_ids()
+        random.shuffle(ids)  # 各 worker 从不同位置开始，减少锁竞争
+        for job_id in ids:
+            if self.is_done(job_id):
+                continue
+            if self._try_lock(job_id) or (self._reclaim_if_stale(job_id) and self._try_lock(job_id)):
+                if self.is_done(job_id):  # 加锁前刚被完成
+                    self.release(job_id)
+                    continue
+                with open(self._path("jobs", job_id, ".json")) as f:
+                    return job_id, json.load(f)
+        return None
+
+    def complete(self, job_id, result):
+        """
+        发布结果分片并释放锁
+
+        返回:
+            是否由本 worker 发布了结果；锁已被其他 worker 回收或结果已存在时不写入并返回 False
+        """
+        if not self.owns(job_id):
+            print(f"[{self.worker_id}] lost lock of job {job_id}, discarding result")
+            return False
+        path = self._path("results", job_id, ".json")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        try:
+            if not self.owns(job_id):  # 写临时文件期间可能失去锁
+                print(f"[{self.worker_id}] lost lock of job {job_id}, discarding result")
+                return False
+            os.link(tmp, path)  # 与 os.replace 不同，不会覆盖其他 worker 已发布的结果
+        except FileExistsError:
+            print(f"[{self.worker_id}] job {job_id} already has a result, discarding")
+            return False
+        finally:
+            os.remove(tmp)
+            self.release(job_id)
+        return True
+
+    def release(self, job_id):
+        """释放自己持有的锁；锁已属于其他 worker 时保持不变。"""
+        lock_path = self._path("locks", job_id, ".lock")
+        if not self.owns(job_id):
+            return
+        # 先 rename 再确认持有者，不会误删在检查之后被别人重新认领的锁
+        tombstone = f"{lock_path}.release.{uuid.uuid4().hex}"
+        try:
+            os.rename(lock_path, tombstone)
+        except FileNotFoundError:
+            return
+        state = _lock_state(tombstone)
+        if state is not None and state[0] == self.worker_id:
+            os.remove(tombstone)
+        else:
+            _restore_lock(tombstone, lock_path)
+
+    def status(self):
+        ids = self.job_ids()
+        done = sum(self.is_done(job_id) for job_id in ids)
+        running = sum(os.path.exists(self._path("locks", job_id, ".lock")) for job_id in ids if not self.is_done(job_id))
+        return {"total": len(ids), "done": done, "running": running, "pending": len(ids) - done - running}
+
+    def results(self):
+        """按 job_ids() 的顺序返回 [(job_id, spec, result), ...]（只包含已完成的任务）。"""
+        shards = []
+        for job_id in self.job_ids():
+            if not self.is_done(job_id):
+                continue
+            with open(self._path("jobs", job_id, ".json")) as f:
+                spec = json.load(f)
+            with open(self._path("results", job_id, ".json")) as f:
+                shards.append((job_id, spec, json.load(f)))
+        return shards
+
+    def run_worker(self, handler, poll_interval=2.0):
+        """
+        循环认领并执行任务，直到所有任务都有结果
+
+        参数:
+            handler: handler(spec) -> 可 JSON 序列化的结果；抛出的异常记录为 {"error": ...}
+        返回:
+            本 worker 完成的任务数
+        """
+        count = 0
+        while True:
+            claimed = self.claim()
+            if claimed is None:
+                if all(self.is_done(job_id) for job_id in self.job_ids()):
+                    return count
+                time.sleep(poll_interval)  # 其余任务正被执行，等待完成或失联后回收
+                continue
+            job_id, spec = claimed
+            with Heartbeat(self._path("locks", job_id, ".lock"), self.worker_id, self.heartbeat):
+                try:
+                    result = handler(spec)
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+            result["worker"] = self.worker_id
+            count += self.complete(job_id, result)